@@ -0,0 +1,230 @@
+"""
+Parallel analytics over the whole catalog.
+
+The rating and year columns are shared with the worker processes of
+a ProcessPoolExecutor instead of being pickled into every task: a
+binary snapshot data file (snapshot.py) is memory-mapped by each
+worker, and any other catalog has its two columns copied, in row
+order, into a multiprocessing.shared_memory block once per report.
+
+The rows are split into chunks; each worker reduces its chunks with
+NumPy to a partial result (count, sum, min, max, histogram bins and
+top/bottom-k candidates), and the parent combines the partials,
+breaking rating ties by title exactly as the sorted indexes do. With
+a pool the median comes from partials too: a fine histogram per chunk
+locates the bins holding the middle rank, and only the distinct
+ratings inside those bins are gathered; in process the parent just
+partitions the selected ratings.
+"""
+import math
+import os
+from bisect import bisect_right
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from multiprocessing import shared_memory
+
+import movie_storage
+from histogram import BINS
+from snapshot import SnapshotCatalog
+
+# Every worker process gets at least this many rows, so a catalog needs
+# twice as many before a pool is started: in process a row costs about
+# 64ns, and starting and stopping a pool about 25-80ms (forked workers)
+ROWS_PER_WORKER = 2_000_000
+# Chunks per worker, so a slow worker does not hold up the others
+CHUNKS_PER_WORKER = 4
+# Bins of the histogram that narrows down the median
+MEDIAN_BINS = 1024
+
+# The SnapshotCatalog or SharedMemory block a worker (or the parent,
+# in process) reads the columns from, and its number of rows
+_mapping = None
+_count = 0
+
+
+def _attach(source):
+    """
+    Pool initializer: map the shared columns once per worker. source
+    is ("snapshot", path, rows) or ("memory", block name, rows).
+    """
+    global _mapping, _count
+    kind, name, _count = source
+    _mapping = SnapshotCatalog(name) if kind == "snapshot" else shared_memory.SharedMemory(name)
+
+
+def _column(field, start, stop):
+    """
+    A zero-copy NumPy view of rows [start, stop) of a shared column.
+    Views only live as long as a task, so the block can always close.
+    """
+    import numpy as np
+    if isinstance(_mapping, SnapshotCatalog):
+        return np.asarray(_mapping.column(field)[start:stop])
+    dtype, offset = (np.float64, 0) if field == "rating" else (np.int16, 8 * _count)
+    itemsize = np.dtype(dtype).itemsize
+    return np.frombuffer(_mapping.buf, dtype=dtype, count=stop - start, offset=offset + itemsize * start)
+
+
+def _columns(start, stop, bounds):
+    """Return (row numbers, ratings) of the rows in [start, stop) within bounds."""
+    import numpy as np
+    ratings = _column("rating", start, stop)
+    years = _column("year", start, stop)
+    min_rating, start_year, end_year = bounds
+    mask = np.ones(stop - start, dtype=bool)
+    if min_rating is not None:
+        mask &= ratings >= min_rating
+    if start_year is not None:
+        mask &= years >= start_year
+    if end_year is not None:
+        mask &= years <= end_year
+    rows = np.flatnonzero(mask)
+    return rows + start, ratings[rows]
+
+
+def _candidates(rows, ratings, k, largest):
+    """Rows that can be among the k largest (or smallest) ratings, ties included."""
+    import numpy as np
+    if k <= 0 or not len(rows):
+        return []
+    if k >= len(rows):
+        return rows.tolist()
+    if largest:
+        threshold = np.partition(ratings, len(ratings) - k)[len(ratings) - k]
+        return rows[ratings >= threshold].tolist()
+    threshold = np.partition(ratings, k - 1)[k - 1]
+    return rows[ratings <= threshold].tolist()
+
+
+def _reduce_chunk(start, stop, bounds, k):
+    """First pass: count, sum, extremes and top/bottom-k candidates of one chunk."""
+    rows, ratings = _columns(start, stop, bounds)
+    if not len(rows):
+        return 0, 0.0, None, None, [], []
+    return (len(rows), float(ratings.sum()), float(ratings.min()), float(ratings.max()),
+            _candidates(rows, ratings, k, True), _candidates(rows, ratings, k, False))
+
+
+def _bin_chunk(start, stop, bounds, edges, median_edges):
+    """Second pass: histogram counts of one chunk on the shared bin edges (and median bin edges, if any)."""
+    import numpy as np
+    _, ratings = _columns(start, stop, bounds)
+    counts = np.histogram(ratings, bins=np.asarray(edges))[0].tolist()
+    if median_edges is None:
+        return counts, None
+    return counts, np.histogram(ratings, bins=np.asarray(median_edges))[0].tolist()
+
+
+def _median_chunk(start, stop, bounds, low, high, closed):
+    """Third pass: the distinct ratings of one chunk in [low, high) ([low, high] if closed) and their counts."""
+    import numpy as np
+    _, ratings = _columns(start, stop, bounds)
+    inside = (ratings >= low) & ((ratings <= high) if closed else (ratings < high))
+    values, counts = np.unique(ratings[inside], return_counts=True)
+    return values.tolist(), counts.tolist()
+
+
+def _median(run, bounds, count, edges, counts):
+    """
+    The exact median of count ratings from their MEDIAN_BINS counts
+    (edges are the bin edges): only the ratings in the bins holding
+    the middle rank(s) are gathered from the chunks.
+    """
+    ranks = (count - 1) // 2, count // 2
+    cumulative = list(accumulate(counts))
+    first, last = (bisect_right(cumulative, rank) for rank in ranks)
+    below = cumulative[first - 1] if first else 0
+    closed = last == len(counts) - 1
+    merged = Counter()
+    for values, value_counts in run(_median_chunk, bounds, edges[first], edges[last + 1], closed):
+        merged.update(dict(zip(values, value_counts)))
+    middle = []
+    seen = below
+    for value in sorted(merged):
+        seen += merged[value]
+        while len(middle) < 2 and seen > ranks[len(middle)]:
+            middle.append(value)
+    return (middle[0] + middle[1]) / 2
+
+
+def _share(movies, path):
+    """
+    Return (source, block): where the workers find the columns of
+    movies, and the shared memory block they were copied to (None
+    when movies is the unchanged snapshot file at path).
+    """
+    count = len(movies)
+    if isinstance(movies, SnapshotCatalog):
+        return ("snapshot", path, count), None
+    block = shared_memory.SharedMemory(create=True, size=max(1, 10 * count))
+    block.buf[:8 * count] = memoryview(movies.column("rating")).cast("B")
+    block.buf[8 * count:10 * count] = memoryview(movies.column("year")).cast("B")
+    return ("memory", block.name, count), block
+
+
+def report(min_rating=None, start_year=None, end_year=None, top=10, bins=BINS, workers=None):
+    """
+    Return count, average, median, min, max, a rating histogram and
+    the top and bottom movies of the catalog (or of the movies within
+    the given bounds), reduced in parallel over shared columns.
+    """
+    global _mapping
+    bounds = (min_rating, start_year, end_year)
+    store = movie_storage.get_store()
+    movies = store.get_movies()
+    source, block = _share(movies, store.path)
+    pool = None
+    try:
+        _attach(source)
+        n = len(movies)
+        workers = max(1, min(workers or os.cpu_count() or 1, n // ROWS_PER_WORKER))
+        step = max(1, -(-n // (workers * CHUNKS_PER_WORKER)))
+        chunks = [(start, min(start + step, n)) for start in range(0, n, step)]
+        if workers > 1:
+            pool = ProcessPoolExecutor(workers, initializer=_attach, initargs=(source,))
+
+        def run(func, *args):
+            """Apply func(start, stop, *args) to every chunk, in the pool if there is one."""
+            if pool is None:
+                return [func(start, stop, *args) for start, stop in chunks]
+            starts, stops = zip(*chunks)
+            return list(pool.map(func, starts, stops, *([arg] * len(chunks) for arg in args)))
+
+        partials = [p for p in run(_reduce_chunk, bounds, top) if p[0]]
+        count = sum(p[0] for p in partials)
+        result = {"count": count, "average": None, "median": None, "min": None, "max": None,
+                  "histogram": None, "top": [], "bottom": []}
+        if not count:
+            return result
+        low, high = min(p[2] for p in partials), max(p[3] for p in partials)
+        import numpy as np
+        edges = np.histogram_bin_edges([low, high], bins=bins).tolist()
+        median_edges = None if pool is None else np.histogram_bin_edges([low, high], bins=MEDIAN_BINS).tolist()
+        binned = run(_bin_chunk, bounds, edges, median_edges)
+        counts = [sum(c) for c in zip(*(b[0] for b in binned))]
+        if pool is None:
+            median = float(np.median(_columns(0, n, bounds)[1]))
+        else:
+            median = _median(run, bounds, count, median_edges, [sum(c) for c in zip(*(b[1] for b in binned))])
+        result.update(average=math.fsum(p[1] for p in partials) / count, median=median,
+                      min=low, max=high, histogram={"edges": edges, "counts": counts})
+        ratings, years = movies.column("rating"), movies.column("year")
+
+        def order(row):
+            return ratings[row], movies.title_at(row)
+        best = sorted((row for p in partials for row in p[4]), key=order, reverse=True)
+        worst = sorted((row for p in partials for row in p[5]), key=order)
+        for name, rows in (("top", best), ("bottom", worst)):
+            result[name] = [{"title": movies.title_at(row), "year": years[row],
+                             "rating": ratings[row]} for row in rows[:top]]
+        return result
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if isinstance(_mapping, shared_memory.SharedMemory):
+            _mapping.close()
+        _mapping = None
+        if block is not None:
+            block.close()
+            block.unlink()
@@ -0,0 +1,67 @@
+"""
+Find where the analytics report (analytics.py) gains from a process pool.
+
+For each catalog size a synthetic catalog is saved as JSON and as a
+binary snapshot, and the report is timed in process and with every
+worker count from 2 to the number of CPUs (ROWS_PER_WORKER is lifted
+for the run). Use the result to set analytics.ROWS_PER_WORKER on the
+machine the reports run on.
+
+    python benchmarks/analytics.py [--sizes 1000000 4000000] [--runs 3]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import analytics  # noqa: E402
+import movie_storage  # noqa: E402
+from catalog import MovieCatalog  # noqa: E402
+
+
+def synthetic_catalog(size):
+    """Return a MovieCatalog with size generated movies."""
+    return MovieCatalog((f"Synthetic Movie {i:07d}", (i * 37 % 101) / 10, 1900 + i % 125)
+                        for i in range(size))
+
+
+def best_time(workers, runs):
+    """Fastest of runs reports with the given number of workers, in seconds."""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        analytics.report(min_rating=2.0, workers=workers)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 4_000_000])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    analytics.ROWS_PER_WORKER = 1
+    cpus = os.cpu_count() or 1
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            movies = synthetic_catalog(size)
+            for fmt, name in (("json", "data.json"), ("snapshot", "data.snap")):
+                movie_storage.DATA_FILE = os.path.join(tmp, name)
+                movie_storage.get_store().save_movies(movies)
+                movie_storage.get_movies()
+                timings = {workers: best_time(workers, args.runs) for workers in range(1, cpus + 1)}
+                results.append({"movies": size, "format": fmt, "cpus": cpus,
+                                "seconds_by_workers": {w: round(t, 4) for w, t in timings.items()},
+                                "fastest_workers": min(timings, key=timings.get)})
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
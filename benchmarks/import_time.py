@@ -0,0 +1,81 @@
+"""
+Startup benchmark: how long `import movies` takes, from `python -X importtime`.
+
+Prints a JSON report with the median total import time and the slowest
+modules, and exits with status 1 when the time exceeds the budget in
+import_time_baseline.json or when one of the heavy optional dependencies
+(matplotlib, rapidfuzz, numpy, colorama) is imported at startup.
+
+    python benchmarks/import_time.py [--runs 7] [--update-baseline]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_time_baseline.json")
+# Headroom over the measured time before --update-baseline's budget is exceeded
+BUDGET_FACTOR = 2.0
+
+
+def measure_once(module):
+    """Return {module name: (self µs, cumulative µs)} for one cold interpreter."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # column header
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="movies")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    runs = [measure_once(args.module) for _ in range(args.runs)]
+    totals = [run[args.module][1] for run in runs]
+    last = runs[-1]
+    with open(BASELINE_FILE, encoding="utf-8") as f:
+        baseline = json.load(f)
+    heavy = sorted(name for name in last if name.split(".")[0] in baseline["forbidden_modules"])
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "median_total_us": int(statistics.median(totals)),
+        "min_total_us": min(totals),
+        "budget_us": baseline["budget_us"],
+        "slowest_modules": [{"module": name, "cumulative_us": cumulative}
+                            for name, (_, cumulative) in sorted(last.items(), key=lambda x: -x[1][1])[1:11]],
+        "forbidden_modules_loaded": heavy,
+    }
+    if args.update_baseline:
+        baseline["budget_us"] = int(report["median_total_us"] * BUDGET_FACTOR)
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=4)
+            f.write("\n")
+        report["budget_us"] = baseline["budget_us"]
+    print(json.dumps(report, indent=4))
+
+    failures = []
+    if report["median_total_us"] > report["budget_us"]:
+        failures.append(f"import took {report['median_total_us']} µs, budget is {report['budget_us']} µs")
+    if heavy:
+        failures.append("heavy modules imported at startup: " + ", ".join(heavy))
+    for failure in failures:
+        print("REGRESSION: " + failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
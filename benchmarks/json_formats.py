@@ -0,0 +1,86 @@
+"""
+Compare the JSON data file options of serialization.py.
+
+For each catalog size a synthetic catalog is saved in every combination
+of style (compact, pretty), codec (orjson, msgspec, json) and
+compression (none, gzip, zstd) that is installed, then loaded back.
+The JSON report lists the bytes on disk and the best save and load
+times of --repeat runs.
+
+    python benchmarks/json_formats.py [--sizes 10000 100000 1000000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import serialization  # noqa: E402
+from snapshot_load import synthetic_catalog  # noqa: E402
+
+COMPRESSIONS = (("none", ""), ("gzip", ".gz"), ("zstd", ".zst"))
+
+
+def available(codec, compression):
+    """True when the codec and compression can run here."""
+    try:
+        serialization.codec_name(codec)
+        if compression == "zstd":
+            serialization._zstandard()
+    except ValueError:
+        return False
+    return True
+
+
+def best_of(repeat, func):
+    """Return the fastest of repeat runs of func, in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            movies = synthetic_catalog(size)
+            for style in serialization.STYLES:
+                for codec in serialization.CODECS:
+                    for compression, suffix in COMPRESSIONS:
+                        if not available(codec, compression):
+                            continue
+                        path = os.path.join(tmp, "data.json" + suffix)
+                        kind = serialization.compression_of(path)
+
+                        def save():
+                            with open(path, "wb") as f:
+                                serialization.write_catalog(f, movies, kind, style, codec)
+
+                        def load():
+                            with open(path, "rb") as f:
+                                serialization.read_catalog(f, kind, codec)
+
+                        save_seconds = best_of(args.repeat, save)
+                        load_seconds = best_of(args.repeat, load)
+                        results.append({"movies": size, "style": style, "codec": codec,
+                                        "compression": compression, "file_bytes": os.path.getsize(path),
+                                        "save_seconds": round(save_seconds, 4),
+                                        "load_seconds": round(load_seconds, 4)})
+                        os.remove(path)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare loading data.json with loading a binary snapshot (snapshot.py).
+
+For each catalog size a synthetic catalog is written in both formats,
+then a fresh interpreter opens each file, reads the movie count and
+looks up one title. The JSON report lists the file size, the load time
+and the peak RSS growth of that interpreter.
+
+    python benchmarks/snapshot_load.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import movie_storage  # noqa: E402
+from catalog import MovieCatalog  # noqa: E402
+
+# Runs in a fresh interpreter: prints load seconds and peak RSS growth in KiB
+PROBE = """
+import resource, sys, time
+sys.path.insert(0, {root!r})
+import movie_storage
+store = movie_storage.open_store({path!r})
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+movies = store.get_movies()
+count = len(movies)
+movies[{probe!r}]
+elapsed = time.perf_counter() - start
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(elapsed, after - before, count)
+"""
+
+
+def synthetic_catalog(size):
+    """Return a MovieCatalog with size generated movies."""
+    return MovieCatalog((f"Synthetic Movie {i:07d}", (i * 37 % 101) / 10, 1900 + i % 125)
+                        for i in range(size))
+
+
+def probe(path, title):
+    """Load path in a fresh interpreter; return (seconds, peak RSS growth KiB)."""
+    code = PROBE.format(root=ROOT, path=path, probe=title)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    elapsed, rss_kib, _ = out.stdout.split()
+    return float(elapsed), int(rss_kib)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            movies = synthetic_catalog(size)
+            title = movies.title_at(size // 2)
+            for fmt, name in (("json", "data.json"), ("snapshot", "data.snap")):
+                path = os.path.join(tmp, name)
+                movie_storage.open_store(path).save_movies(movies)
+                seconds, rss_kib = probe(path, title)
+                results.append({"movies": size, "format": fmt, "file_bytes": os.path.getsize(path),
+                                "load_seconds": round(seconds, 4), "peak_rss_growth_kib": rss_kib})
+                os.remove(path)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
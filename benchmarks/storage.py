@@ -0,0 +1,270 @@
+"""
+Latency and memory benchmark for storage operations and CLI commands.
+
+For each catalog size a synthetic catalog is written to a temporary
+data file, then every operation is timed repeatedly (at least
+--min-runs times, up to --max-runs or until --budget seconds are
+spent). Storage operations run in-process through a MovieStore; CLI
+operations run `movies.py <command>` in a fresh interpreter.
+
+The JSON report gives latency percentiles in milliseconds and peak
+memory per operation: the tracemalloc peak of one traced run for
+storage operations, the peak RSS of the child process for CLI ones.
+Results are compared with storage_baseline.json and the script exits
+with status 1 when an operation got more than TOLERANCE times slower
+or bigger.
+
+    python benchmarks/storage.py [--sizes 1000 10000 100000] [--format json]
+    python benchmarks/storage.py --sizes 1000000 --ops load stats search
+    python benchmarks/storage.py --update-baseline
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import movie_storage  # noqa: E402
+from catalog import MovieCatalog  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "storage_baseline.json")
+# A result regresses when it exceeds the baseline by this factor...
+TOLERANCE = 1.5
+# ...and by at least this much, so sub-millisecond noise never fails a run
+MIN_SLACK_MS = 1.0
+MIN_SLACK_KIB = 1024
+
+FILE_NAMES = {"json": "data.json", "snapshot": "data.snap", "sqlite": "data.db"}
+WORDS = ("Silent Dark Last Golden Broken Lost Midnight Red Wild Secret Iron Little "
+         "River Night City Star King Road Garden Storm Mirror Heart Ghost Empire "
+         "Journey Return Shadow Winter Summer Dream Fire Ocean Promise Hunter").split()
+SEARCH_TERMS = ("silent rivr", "the golden king", "midnight gardn", "no such film at all")
+
+
+def synthetic_catalog(size, seed=0):
+    """Return a MovieCatalog of size movies with word-based titles."""
+    rng = random.Random(seed)
+    return MovieCatalog(
+        (f"{' '.join(rng.sample(WORDS, rng.randint(1, 3)))} {i}",
+         round(rng.uniform(0, 10), 1), rng.randint(1920, 2024))
+        for i in range(size))
+
+
+def percentiles(samples):
+    """Summarize latency samples (seconds) in milliseconds."""
+    ms = sorted(s * 1000 for s in samples)
+    cuts = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+    return {"runs": len(ms), "min_ms": round(ms[0], 3), "p50_ms": round(statistics.median(ms), 3),
+            "p90_ms": round(cuts[89], 3), "p99_ms": round(cuts[98], 3),
+            "max_ms": round(ms[-1], 3), "mean_ms": round(statistics.fmean(ms), 3)}
+
+
+class StorageBench:
+    """In-process storage operations against one data file."""
+
+    def __init__(self, path, movies):
+        self.path = path
+        self.titles = list(movies)
+        self.rng = random.Random(1)
+        self.store = movie_storage.open_store(path)
+        self.store.get_movies()
+        self.added = 0
+
+    def load(self):
+        movie_storage.open_store(self.path).get_movies()
+
+    def get(self):
+        self.store.get_movie(self.rng.choice(self.titles))
+
+    def add(self):
+        self.added += 1
+        self.store.add_movie(f"Benchmark Movie {self.added}", 2000, 5.0)
+
+    def update(self):
+        self.store.update_movie(self.rng.choice(self.titles), round(self.rng.uniform(0, 10), 1))
+
+    def delete(self):
+        # Deletes the movies add() created, so the catalog size stays put
+        if self.added:
+            self.store.delete_movie(f"Benchmark Movie {self.added}")
+            self.added -= 1
+        else:
+            title = self.titles.pop()
+            self.store.delete_movie(title)
+
+    def stats(self):
+        self.store.rating_stats()
+
+    def top(self):
+        for _ in self.store.sorted_movies("rating", reverse=True, limit=20):
+            pass
+
+    def filter(self):
+        for _ in self.store.filter_movies(8.0, 1990, 2000):
+            pass
+
+    def sort(self):
+        for _ in self.store.sorted_movies("rating", reverse=True):
+            pass
+
+    def search(self):
+        self.store.search_movies(self.rng.choice(SEARCH_TERMS))
+
+    def search_cold(self):
+        # A fresh store pays for building the title index
+        store = movie_storage.open_store(self.path)
+        store.get_movies()
+        start = time.perf_counter()
+        store.search_movies(SEARCH_TERMS[0])
+        return time.perf_counter() - start
+
+
+# "top" runs before "filter" and "sort" build the sorted indexes
+STORAGE_OPS = ("load", "get", "add", "update", "delete", "stats", "top", "filter", "sort", "search", "search_cold")
+CLI_OPS = {
+    "cli_stats": ["stats"],
+    "cli_filter": ["filter", "--min-rating", "8", "--start-year", "1990", "--end-year", "2000"],
+    "cli_top": ["sort", "rating", "--limit", "20"],
+    "cli_search": ["search", SEARCH_TERMS[0]],
+}
+
+
+# Runs a command and prints its seconds, peak RSS (KiB) and exit code. Linux
+# carries the peak RSS of the process that called exec into the new program,
+# so the CLI is started from this small process rather than from the
+# benchmark itself, whose catalogs would otherwise count as the CLI's memory.
+LAUNCHER = """
+import os, subprocess, sys, time
+start = time.perf_counter()
+child = subprocess.Popen(sys.argv[1:], stdout=subprocess.DEVNULL)
+_, status, usage = os.wait4(child.pid, 0)
+print(time.perf_counter() - start, usage.ru_maxrss, os.waitstatus_to_exitcode(status))
+"""
+
+
+def run_cli(directory, args):
+    """Run movies.py in directory; return (seconds, peak RSS KiB)."""
+    command = [sys.executable, os.path.join(ROOT, "movies.py"), *args]
+    out = subprocess.run([sys.executable, "-c", LAUNCHER, *command],
+                         cwd=directory, capture_output=True, text=True, check=True)
+    elapsed, rss_kib, returncode = out.stdout.split()
+    if int(returncode):
+        raise RuntimeError(f"movies.py {' '.join(args)} exited with {returncode}")
+    return float(elapsed), int(rss_kib)
+
+
+def repeat(func, args):
+    """Time func until the run limits or the time budget are reached."""
+    samples = []
+    deadline = time.perf_counter() + args.budget
+    while len(samples) < args.max_runs and (len(samples) < args.min_runs or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        measured = func()
+        samples.append(measured if measured is not None else time.perf_counter() - start)
+    return samples
+
+
+def traced_peak_kib(func):
+    """Peak Python allocations of one run of func, in KiB."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def bench_size(size, fmt, ops, args):
+    """Benchmark the selected operations on one synthetic catalog."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, FILE_NAMES[fmt])
+        movies = synthetic_catalog(size)
+        movie_storage.open_store(path).save_movies(movies)
+        bench = StorageBench(path, movies)
+        del movies
+        for op in ops:
+            if op in CLI_OPS:
+                peaks = []
+
+                def func(op=op):
+                    elapsed, rss_kib = run_cli(tmp, CLI_OPS[op])
+                    peaks.append(rss_kib)
+                    return elapsed
+                samples = repeat(func, args)
+                peak_kib = max(peaks)
+            else:
+                func = getattr(bench, op)
+                samples = repeat(func, args)
+                peak_kib = traced_peak_kib(func)
+            results.append({"movies": size, "format": fmt, "op": op,
+                            **percentiles(samples), "peak_memory_kib": peak_kib})
+            print(f"{size:>9} {op:<12} p50 {results[-1]['p50_ms']:>10.3f} ms", file=sys.stderr)
+    return results
+
+
+def result_key(result):
+    return f"{result['format']}/{result['movies']}/{result['op']}"
+
+
+def compare(results, baseline):
+    """Return a message for every result that regressed against the baseline."""
+    failures = []
+    for result in results:
+        base = baseline.get(result_key(result))
+        if base is None:
+            continue
+        p50, base_p50 = result["p50_ms"], base["p50_ms"]
+        if p50 > base_p50 * TOLERANCE and p50 - base_p50 > MIN_SLACK_MS:
+            failures.append(f"{result_key(result)}: p50 {p50} ms, baseline {base_p50} ms")
+        peak, base_peak = result["peak_memory_kib"], base["peak_memory_kib"]
+        if peak > base_peak * TOLERANCE and peak - base_peak > MIN_SLACK_KIB:
+            failures.append(f"{result_key(result)}: peak memory {peak} KiB, baseline {base_peak} KiB")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--format", choices=FILE_NAMES, default="json")
+    parser.add_argument("--ops", nargs="+", choices=STORAGE_OPS + tuple(CLI_OPS),
+                        default=STORAGE_OPS + tuple(CLI_OPS))
+    parser.add_argument("--min-runs", type=int, default=5)
+    parser.add_argument("--max-runs", type=int, default=200)
+    parser.add_argument("--budget", type=float, default=2.0, help="seconds per operation (default: 2)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        results.extend(bench_size(size, args.format, args.ops, args))
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding="utf-8") as f:
+            baseline = json.load(f)
+    if args.update_baseline:
+        for result in results:
+            baseline[result_key(result)] = {"p50_ms": result["p50_ms"],
+                                            "peak_memory_kib": result["peak_memory_kib"]}
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=4)
+            f.write("\n")
+    print(json.dumps(results, indent=4))
+
+    failures = compare(results, baseline)
+    for failure in failures:
+        print("REGRESSION: " + failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Columnar in-memory representation of the movies.
+
+Instead of one small dictionary per movie, MovieCatalog keeps three
+parallel columns: an interned title list, an array('d') of ratings
+and an array('h') of years, plus a title -> row dictionary. That
+is a few dozen bytes per movie instead of a few hundred, and the
+numeric columns can be handed to NumPy without copying.
+
+It is a read-only Mapping for existing callers: movies[title]
+returns a fresh {"rating": ..., "year": ...} dictionary, so changes
+must go through set(), set_rating() and discard().
+"""
+import sys
+from array import array
+from collections.abc import ItemsView, Mapping, ValuesView
+
+# The years the year column (signed 16-bit) can hold
+YEAR_MIN, YEAR_MAX = -32768, 32767
+
+
+def _rating(value):
+    """Return a rating as a float; ValueError if it is not a number."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid rating {value!r}.") from None
+
+
+def _year(value):
+    """
+    Return a year as an int the year column can hold; ValueError
+    otherwise. Integral floats and numeric strings are accepted.
+    """
+    try:
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError
+        year = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"Invalid year {value!r}.") from None
+    if not YEAR_MIN <= year <= YEAR_MAX:
+        raise ValueError(f"Year {year} is out of range.")
+    return year
+
+
+class _CatalogItems(ItemsView):
+    """Items view iterating the columns directly instead of per-key lookups."""
+
+    def __iter__(self):
+        catalog = self._mapping
+        for title, rating, year in zip(catalog._titles, catalog._ratings, catalog._years):
+            yield title, {"rating": rating, "year": year}
+
+
+class _CatalogValues(ValuesView):
+    """Values view iterating the columns directly."""
+
+    def __iter__(self):
+        catalog = self._mapping
+        for rating, year in zip(catalog._ratings, catalog._years):
+            yield {"rating": rating, "year": year}
+
+
+class MovieCatalog(Mapping):
+    """
+    Movies stored as parallel title/rating/year columns.
+
+    Rows are kept dense: deleting a movie moves the last row into
+    its slot, so iteration order is insertion order until the
+    first delete.
+    """
+
+    def __init__(self, rows=()):
+        self._titles = []
+        self._ratings = array('d')
+        self._years = array('h')
+        self._rows = {}
+        for title, rating, year in rows:
+            self.set(title, rating, year)
+
+    @classmethod
+    def from_dict(cls, movies):
+        """Build a catalog from a {title: {"rating", "year"}} mapping."""
+        if isinstance(movies, cls):
+            return movies
+        return cls((title, info["rating"], info["year"]) for title, info in movies.items())
+
+    def __getitem__(self, title):
+        row = self._rows[title]
+        return {"rating": self._ratings[row], "year": self._years[row]}
+
+    def __contains__(self, title):
+        return title in self._rows
+
+    def __iter__(self):
+        return iter(self._titles)
+
+    def __len__(self):
+        return len(self._titles)
+
+    def items(self):
+        return _CatalogItems(self)
+
+    def values(self):
+        return _CatalogValues(self)
+
+    def rows(self):
+        """Yield (title, rating, year) tuples."""
+        return zip(self._titles, self._ratings, self._years)
+
+    @property
+    def titles(self):
+        """The title column (read-only), aligned with column()."""
+        return self._titles
+
+    def column(self, field):
+        """Return the "rating" or "year" column (read-only)."""
+        if field == "rating":
+            return self._ratings
+        if field == "year":
+            return self._years
+        raise KeyError(field)
+
+    def title_at(self, row):
+        """Return the title stored in a row."""
+        return self._titles[row]
+
+    def set(self, title, rating, year):
+        """
+        Add a movie, or replace the rating and year of an existing one.
+        A value the columns cannot hold as it is gets converted, or
+        ValueError is raised with every column left as it was.
+        """
+        row = self._rows.get(title)
+        if row is None:
+            title = sys.intern(title)
+            try:
+                self._years.append(year)
+            except (TypeError, OverflowError):
+                self._years.append(_year(year))
+            try:
+                self._ratings.append(rating)
+            except TypeError:
+                try:
+                    self._ratings.append(_rating(rating))
+                except ValueError:
+                    self._years.pop()
+                    raise
+            self._rows[title] = len(self._titles)
+            self._titles.append(title)
+        else:
+            year = _year(year)
+            self._ratings[row] = _rating(rating)
+            self._years[row] = year
+
+    def set_rating(self, title, rating):
+        """Change the rating of an existing movie; KeyError if it is missing."""
+        self._ratings[self._rows[title]] = _rating(rating)
+
+    def discard(self, title):
+        """Remove a movie if present, filling its row with the last one."""
+        row = self._rows.pop(title, None)
+        if row is None:
+            return
+        last = len(self._titles) - 1
+        if row != last:
+            moved = self._titles[last]
+            self._titles[row] = moved
+            self._ratings[row] = self._ratings[last]
+            self._years[row] = self._years[last]
+            self._rows[moved] = row
+        self._titles.pop()
+        self._ratings.pop()
+        self._years.pop()
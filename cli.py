@@ -0,0 +1,336 @@
+"""
+Non-interactive subcommands for scripted use of the movie database.
+
+Every command runs one storage operation without prompts and writes
+JSON to stdout: a single object for point operations and stats, one
+object per line (JSON Lines) for listings. Errors go to stderr with
+a non-zero exit status.
+"""
+import argparse
+import json
+import os
+import sys
+
+import instrument
+import movie_io
+import movie_storage
+import queries
+import render
+from movie_query import compile_query
+from validation import parse_rating, parse_title, parse_year
+
+
+def emit(obj):
+    """Write one JSON document on its own line."""
+    with instrument.phase("render"):
+        sys.stdout.write(json.dumps(obj, ensure_ascii=False) + "\n")
+
+
+def emit_movies(pairs):
+    """Stream (title, info) pairs as JSON Lines."""
+    render.json_lines(movie_io.movie_record(title, info) for title, info in pairs)
+
+
+def list_command(args):
+    """Print every movie."""
+    emit_movies(queries.iter_all(args.limit, args.offset))
+    return 0
+
+
+def add_command(args):
+    """Add (or replace) a movie."""
+    movie_storage.add_movie(args.title, args.year, args.rating)
+    emit({"title": args.title, "year": args.year, "rating": args.rating})
+    return 0
+
+
+def delete_command(args):
+    """Delete a movie."""
+    movie_storage.delete_movie(args.title)
+    emit({"deleted": args.title})
+    return 0
+
+
+def update_command(args):
+    """Update the rating of an existing movie."""
+    if movie_storage.get_movie(args.title) is None:
+        raise KeyError(f"Movie '{args.title}' does not exist.")
+    movie_storage.update_movie(args.title, args.rating)
+    emit(movie_io.movie_record(args.title, movie_storage.get_movie(args.title)))
+    return 0
+
+
+def stats_command(args):
+    """Print count, average, median, best and worst."""
+    emit(movie_storage.rating_stats())
+    return 0
+
+
+def search_command(args):
+    """Print the exact match, or the closest fuzzy matches."""
+    _, matches = queries.search(args.term, limit=args.limit, score_cutoff=args.cutoff)
+    emit({"query": args.term,
+          "matches": [dict(movie_io.movie_record(t, info), score=round(score, 2))
+                      for t, info, score in matches]})
+    return 0
+
+
+def sort_command(args):
+    """Print movies ordered by rating or year."""
+    emit_movies(queries.iter_sorted(args.key, args.order == "desc", args.limit, args.offset))
+    return 0
+
+
+def filter_command(args):
+    """Print movies within the rating and year bounds."""
+    emit_movies(queries.iter_filtered(args.min_rating, args.start_year, args.end_year,
+                                      args.limit, args.offset))
+    return 0
+
+
+def query_command(args):
+    """Print the movies selected by a query expression, with its fields."""
+    query = compile_query(args.expression)
+    render.json_lines(query.project(title, info) for title, info in movie_storage.query_movies(query))
+    return 0
+
+
+def changes_command(args):
+    """Print the changes made after a catalog version, one per line."""
+    render.json_lines(movie_storage.changes_since(args.since))
+    return 0
+
+
+def version_command(args):
+    """Print the catalog version."""
+    emit({"version": movie_storage.catalog_version()})
+    return 0
+
+
+def histogram_command(args):
+    """Save a rating histogram image."""
+    from histogram import save_rating_histogram
+    ratings = list(queries.iter_ratings())
+    rendered = save_rating_histogram(ratings, args.file)
+    emit({"file": args.file, "count": len(ratings), "rendered": rendered})
+    return 0
+
+
+def import_command(args):
+    """Bulk-import movies from a CSV or JSON Lines file."""
+    imported, errors = movie_io.import_movies(args.file, args.format)
+    for line_num, message in errors:
+        print(f"line {line_num}: {message}", file=sys.stderr)
+    emit({"imported": imported, "skipped": len(errors)})
+    return 0
+
+
+def export_command(args):
+    """Stream all movies to a CSV or JSON Lines file."""
+    count = movie_io.export_movies(args.file, args.format)
+    print(f"Exported {count} movies.", file=sys.stderr)
+    return 0
+
+
+def match_command(args):
+    """Fuzzy-match a file of titles (one per line) against the catalog."""
+    with movie_io.open_text(args.file, "r") as f:
+        terms = [line.strip() for line in f if line.strip()]
+    results = movie_storage.batch_search_movies(terms, limit=args.limit, score_cutoff=args.cutoff)
+    for term, matches in zip(terms, results):
+        emit({"query": term,
+              "matches": [{"title": t, "score": round(score, 2)} for t, score in matches]})
+    return 0
+
+
+def convert_command(args):
+    """Copy the catalog between JSON, binary snapshot and SQLite files."""
+    if args.style:
+        import serialization
+        serialization.STYLE = args.style
+    count = movie_storage.convert(args.source, args.target)
+    emit({"source": args.source, "target": args.target, "count": count})
+    return 0
+
+
+def report_command(args):
+    """Print a full-catalog report computed by the parallel analytics engine."""
+    import analytics
+    emit(analytics.report(args.min_rating, args.start_year, args.end_year,
+                          top=args.top, bins=args.bins, workers=args.workers))
+    return 0
+
+
+def serve_command(args):
+    """Serve the HTTP/JSON API until interrupted."""
+    import server
+
+    def ready(listener):
+        host, port = listener.sockets[0].getsockname()[:2]
+        print(f"Serving the movie API on http://{host}:{port}/", file=sys.stderr)
+    server.run(args.host, args.port, ready)
+    return 0
+
+
+def argument(parse):
+    """Adapt a validation.parse_* function to an argparse type."""
+    def convert(value):
+        try:
+            return parse(value)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+    convert.__name__ = parse.__name__.replace("parse_", "")
+    return convert
+
+
+def count_arg(value):
+    """argparse type for a non-negative integer."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"expected a non-negative integer, got '{value}'")
+    return number
+
+
+def add_paging(parser):
+    """Add --limit/--offset to a listing command."""
+    parser.add_argument("--limit", type=count_arg, help="print at most this many movies")
+    parser.add_argument("--offset", type=count_arg, default=0, help="skip this many movies first")
+
+
+def build_parser():
+    """Build the command-line parser; no subcommand starts the menu."""
+    parser = argparse.ArgumentParser(description="My Movies Database")
+    parser.add_argument("--profile", choices=instrument.MODES,
+                        help="time every action: print a summary at exit, or JSON Lines per action")
+    parser.add_argument("--profile-out", metavar="FILE", help="file for the profile output (default: stderr)")
+    parser.add_argument("--cprofile", metavar="FILE", help="save cProfile statistics of all actions to FILE")
+    subparsers = parser.add_subparsers(dest="command")
+    title_arg, rating_arg, year_arg = argument(parse_title), argument(parse_rating), argument(parse_year)
+
+    list_parser = subparsers.add_parser("list", help="list all movies")
+    add_paging(list_parser)
+    list_parser.set_defaults(func=list_command)
+
+    add_parser = subparsers.add_parser("add", help="add a movie")
+    add_parser.add_argument("title", type=title_arg)
+    add_parser.add_argument("--year", type=year_arg, required=True)
+    add_parser.add_argument("--rating", type=rating_arg, required=True)
+    add_parser.set_defaults(func=add_command)
+
+    delete_parser = subparsers.add_parser("delete", help="delete a movie")
+    delete_parser.add_argument("title", type=title_arg)
+    delete_parser.set_defaults(func=delete_command)
+
+    update_parser = subparsers.add_parser("update", help="update a movie's rating")
+    update_parser.add_argument("title", type=title_arg)
+    update_parser.add_argument("--rating", type=rating_arg, required=True)
+    update_parser.set_defaults(func=update_command)
+
+    stats_parser = subparsers.add_parser("stats", help="show rating statistics")
+    stats_parser.set_defaults(func=stats_command)
+
+    search_parser = subparsers.add_parser("search", help="fuzzy-search movie titles")
+    search_parser.add_argument("term", type=title_arg)
+    search_parser.add_argument("--limit", type=count_arg, default=5, help="maximum matches (default: 5)")
+    search_parser.add_argument("--cutoff", type=float, default=50, help="minimum score (default: 50)")
+    search_parser.set_defaults(func=search_command)
+
+    sort_parser = subparsers.add_parser("sort", help="list movies sorted by rating or year")
+    sort_parser.add_argument("key", choices=("rating", "year"))
+    sort_parser.add_argument("--order", choices=("asc", "desc"), default="desc", help="default: desc")
+    add_paging(sort_parser)
+    sort_parser.set_defaults(func=sort_command)
+
+    filter_parser = subparsers.add_parser("filter", help="list movies by minimum rating and year range")
+    filter_parser.add_argument("--min-rating", type=rating_arg)
+    filter_parser.add_argument("--start-year", type=year_arg)
+    filter_parser.add_argument("--end-year", type=year_arg)
+    add_paging(filter_parser)
+    filter_parser.set_defaults(func=filter_command)
+
+    query_parser = subparsers.add_parser(
+        "query", help='list movies matching an expression, e.g. \'rating>=8 and title~"god" sort year\'')
+    query_parser.add_argument("expression", help="query expression (see movie_query.py)")
+    query_parser.set_defaults(func=query_command)
+
+    version_parser = subparsers.add_parser("version", help="print the catalog version (its change count)")
+    version_parser.set_defaults(func=version_command)
+
+    changes_parser = subparsers.add_parser("changes", help="list the changes made after a catalog version")
+    changes_parser.add_argument("--since", type=count_arg, default=0, help="catalog version (default: 0)")
+    changes_parser.set_defaults(func=changes_command)
+
+    histogram_parser = subparsers.add_parser("histogram", help="save a rating histogram image")
+    histogram_parser.add_argument("file", help="image file to write, e.g. ratings.png")
+    histogram_parser.set_defaults(func=histogram_command)
+
+    import_parser = subparsers.add_parser("import", help="import movies from CSV or JSON Lines")
+    import_parser.add_argument("file", help="file to read, or - for stdin")
+    import_parser.add_argument("--format", choices=movie_io.FORMATS, help="default: from the file extension")
+    import_parser.set_defaults(func=import_command)
+
+    export_parser = subparsers.add_parser("export", help="export movies to CSV or JSON Lines")
+    export_parser.add_argument("file", help="file to write, or - for stdout")
+    export_parser.add_argument("--format", choices=movie_io.FORMATS, help="default: from the file extension")
+    export_parser.set_defaults(func=export_command)
+
+    convert_parser = subparsers.add_parser(
+        "convert", help="copy the catalog to another format (.json, .json.gz, .snap, .db)")
+    convert_parser.add_argument("source", help="data file to read")
+    convert_parser.add_argument("target", help="data file to write; the format follows its extension")
+    convert_parser.add_argument("--style", choices=("compact", "pretty"),
+                                help="layout of a JSON target (default: serialization.STYLE)")
+    convert_parser.set_defaults(func=convert_command)
+
+    match_parser = subparsers.add_parser("match", help="fuzzy-match a list of titles against the catalog")
+    match_parser.add_argument("file", help="file with one title per line, or - for stdin")
+    match_parser.add_argument("--limit", type=count_arg, default=5, help="matches per title (default: 5)")
+    match_parser.add_argument("--cutoff", type=float, default=50, help="minimum score (default: 50)")
+    match_parser.set_defaults(func=match_command)
+
+    report_parser = subparsers.add_parser(
+        "report", help="rating report (stats, histogram, top/bottom movies) computed in parallel")
+    report_parser.add_argument("--min-rating", type=rating_arg)
+    report_parser.add_argument("--start-year", type=year_arg)
+    report_parser.add_argument("--end-year", type=year_arg)
+    report_parser.add_argument("--top", type=count_arg, default=10, help="top and bottom movies (default: 10)")
+    report_parser.add_argument("--bins", type=int, default=20, help="histogram bins (default: 20)")
+    report_parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    report_parser.set_defaults(func=report_command)
+
+    serve_parser = subparsers.add_parser("serve", help="serve the catalog as a local HTTP/JSON API")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="default: 127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765, help="default: 8765")
+    serve_parser.set_defaults(func=serve_command)
+    return parser
+
+
+def run(argv=None, interactive=None):
+    """Run a subcommand, or the interactive menu when none is given."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    instrument.enable_from_env(args.profile, args.profile_out, args.cprofile)
+    if args.command is None:
+        if interactive is None:
+            parser.error("a command is required")
+        interactive()
+        return 0
+    try:
+        with instrument.action(args.command):
+            return args.func(args)
+    except BrokenPipeError:
+        # The reader (e.g. `head`) stopped early; silence the final flush
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except movie_storage.ChangeFeedGap as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except KeyError as e:
+        print(f"Error: {e.args[0]}", file=sys.stderr)
+        return 1
+    except (OSError, ValueError, NotImplementedError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
@@ -0,0 +1,75 @@
+"""
+Headless rating histogram rendering shared by the menu and the CLI.
+
+Ratings are binned with numpy.histogram and drawn on a single reused
+Agg figure, so no GUI backend is loaded and repeated calls do not
+leak figures. Each image gets a sidecar "<file>.key" holding a hash
+of the binned data; when it still matches, rendering is skipped.
+"""
+import hashlib
+import os
+
+import instrument
+
+BINS = 20
+
+# Figure and axes reused by every render, created on first use
+_figure = None
+_axes = None
+
+
+def _get_axes():
+    """Return the shared Agg figure and axes, creating them once."""
+    global _figure, _axes
+    if _figure is None:
+        # matplotlib takes hundreds of milliseconds to import; only pay for it here
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        _figure = Figure(figsize=(10, 8))
+        FigureCanvasAgg(_figure)
+        _axes = _figure.add_subplot()
+    return _figure, _axes
+
+
+def bin_ratings(ratings, bins=BINS):
+    """Return (counts, edges) for an iterable of ratings."""
+    import numpy as np
+    values = np.fromiter(ratings, dtype=np.float64)
+    return np.histogram(values, bins=bins)
+
+
+def histogram_key(counts, edges):
+    """Hash of the binned data: equal keys draw identical images."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(counts.astype("<i8").tobytes())
+    digest.update(edges.astype("<f8").tobytes())
+    return digest.hexdigest()
+
+
+def save_rating_histogram(ratings, filename):
+    """
+    Plot a histogram of the given ratings and save it to filename.
+    Returns False without drawing when filename already shows
+    the same histogram, True when the image was (re)rendered.
+    """
+    counts, edges = bin_ratings(ratings)
+    key = histogram_key(counts, edges)
+    key_file = filename + ".key"
+    if os.path.exists(filename) and os.path.exists(key_file):
+        with open(key_file, encoding="utf-8") as f:
+            if f.read().strip() == key:
+                return False
+
+    with instrument.phase("render"):
+        figure, ax = _get_axes()
+        ax.clear()
+        ax.bar(edges[:-1], counts, width=edges[1:] - edges[:-1], align="edge",
+               edgecolor='black', alpha=0.7)
+        ax.set_title("Movie Ratings Histogram")
+        ax.set_xlabel("Rating")
+        ax.set_ylabel("Frequency")
+        ax.grid(True)
+        figure.savefig(filename)
+    with open(key_file, "w", encoding="utf-8") as f:
+        f.write(key + "\n")
+    return True
@@ -0,0 +1,232 @@
+"""
+Opt-in timing instrumentation for menu actions and CLI commands.
+
+Enable it with the MOVIES_PROFILE environment variable or the
+--profile option ("summary" or "jsonl"). Each action then records its
+wall time split into phases:
+
+    load     reading the data file (MovieStore._load, SQLite loads)
+    render   formatting and printing results, drawing images
+    input    waiting for the user at a prompt (menu only)
+    compute  everything else
+
+together with the data-file bytes read and written and, per
+movie_storage function, the number of calls, time and bytes. "summary"
+prints a table to stderr at exit; "jsonl" writes one JSON object per
+action to MOVIES_PROFILE_OUT (or --profile-out, default stderr) as soon
+as the action ends. MOVIES_CPROFILE (or --cprofile) names a file that
+receives cProfile statistics for all actions, readable with pstats.
+
+While disabled, phase() returns a shared no-op context manager and the
+movie_storage functions are left unwrapped.
+"""
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+import types
+from contextlib import contextmanager, nullcontext
+
+MODES = ("summary", "jsonl")
+PHASES = ("load", "compute", "render", "input")
+# movie_storage functions whose calls are counted
+STORAGE_CALLS = ("get_movies", "get_movie", "save_movies", "add_movie", "delete_movie",
+                 "update_movie", "filter_movies", "sorted_movies", "iter_movies",
+                 "add_movies", "update_ratings", "delete_movies", "search_movies",
+                 "batch_search_movies", "rating_stats")
+
+enabled = False
+_mode = None
+_out_path = None
+_profiler = None
+_profile_path = None
+_records = []
+_current = None      # record of the action in progress
+_phases = []         # stack of [phase name, start, time spent in nested phases]
+_calls = []          # stack of movie_storage call records in progress
+_NULL = nullcontext()
+
+
+def enable(mode, out_path=None, profile_path=None):
+    """Turn instrumentation on; called once at startup."""
+    global enabled, _mode, _out_path, _profiler, _profile_path
+    if mode not in MODES:
+        raise ValueError(f"Unknown profile mode '{mode}', expected one of {', '.join(MODES)}.")
+    enabled = True
+    _mode = mode
+    _out_path = out_path
+    if profile_path:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profile_path = profile_path
+    _wrap_storage()
+    atexit.register(_finish)
+
+
+def enable_from_env(mode=None, out_path=None, profile_path=None):
+    """Enable from explicit options, falling back to the MOVIES_PROFILE* variables."""
+    mode = mode or os.environ.get("MOVIES_PROFILE")
+    profile_path = profile_path or os.environ.get("MOVIES_CPROFILE")
+    if profile_path and not mode:
+        mode = "summary"
+    if mode and not enabled:
+        enable(mode, out_path or os.environ.get("MOVIES_PROFILE_OUT"), profile_path)
+
+
+def _wrap_storage():
+    """Replace the movie_storage functions with counting wrappers."""
+    import movie_storage
+    for name in STORAGE_CALLS:
+        func = getattr(movie_storage, name)
+        if not hasattr(func, "__wrapped__"):
+            setattr(movie_storage, name, _counted(name, func))
+
+
+def _counted(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _call(name):
+            result = func(*args, **kwargs)
+        if isinstance(result, types.GeneratorType):
+            return _counted_iter(name, result)
+        return result
+    return wrapper
+
+
+def _counted_iter(name, iterator):
+    """Attribute the work done while a returned iterator is consumed to its call."""
+    while True:
+        with _call(name, new=False):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+@contextmanager
+def _call(name, new=True):
+    if _current is None:
+        yield
+        return
+    calls = _current["calls"]
+    stats = calls.get(name)
+    if stats is None:
+        stats = calls[name] = {"calls": 0, "ms": 0.0, "bytes_read": 0, "bytes_written": 0}
+    if new:
+        stats["calls"] += 1
+    _calls.append(stats)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats["ms"] += (time.perf_counter() - start) * 1000
+        # Suspended iterators can leave frames out of order; remove by identity
+        for i in range(len(_calls) - 1, -1, -1):
+            if _calls[i] is stats:
+                del _calls[i]
+                break
+
+
+def phase(name):
+    """Context manager timing one phase of the current action."""
+    if _current is None:
+        return _NULL
+    return _timed_phase(name)
+
+
+@contextmanager
+def _timed_phase(name):
+    frame = [name, time.perf_counter(), 0.0]
+    _phases.append(frame)
+    try:
+        yield
+    finally:
+        _phases.pop()
+        elapsed = time.perf_counter() - frame[1]
+        # Nested phases count only towards the innermost one
+        _current[name + "_ms"] += (elapsed - frame[2]) * 1000
+        if _phases:
+            _phases[-1][2] += elapsed
+
+
+def count_bytes(read=0, written=0):
+    """Add data-file bytes read or written to the current action and storage call."""
+    if _current is None:
+        return
+    _current["bytes_read"] += read
+    _current["bytes_written"] += written
+    if _calls:
+        _calls[-1]["bytes_read"] += read
+        _calls[-1]["bytes_written"] += written
+
+
+@contextmanager
+def action(name):
+    """Record one menu action or CLI command."""
+    global _current
+    if not enabled or _current is not None:
+        yield
+        return
+    record = {"action": name, "wall_ms": 0.0, **{p + "_ms": 0.0 for p in PHASES},
+              "bytes_read": 0, "bytes_written": 0, "calls": {}}
+    _current = record
+    if _profiler is not None:
+        _profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record["wall_ms"] = (time.perf_counter() - start) * 1000
+        if _profiler is not None:
+            _profiler.disable()
+        _current = None
+        record["compute_ms"] = record["wall_ms"] - sum(record[p + "_ms"] for p in PHASES if p != "compute")
+        for key, value in record.items():
+            if key.endswith("_ms"):
+                record[key] = round(value, 3)
+        for stats in record["calls"].values():
+            stats["ms"] = round(stats["ms"], 3)
+        _records.append(record)
+        if _mode == "jsonl":
+            _write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _write(text):
+    if _out_path:
+        with open(_out_path, "a", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stderr.write(text)
+
+
+def summary():
+    """Return the recorded actions aggregated per action name."""
+    totals = {}
+    for record in _records:
+        total = totals.setdefault(record["action"], {
+            "runs": 0, "wall_ms": 0.0, **{p + "_ms": 0.0 for p in PHASES},
+            "bytes_read": 0, "bytes_written": 0})
+        total["runs"] += 1
+        for key in total:
+            if key != "runs":
+                total[key] += record[key]
+    return totals
+
+
+def _finish():
+    """Print the summary and save the cProfile statistics at exit."""
+    if _profiler is not None:
+        _profiler.dump_stats(_profile_path)
+    if _mode != "summary" or not _records:
+        return
+    columns = ("runs", "wall_ms") + tuple(p + "_ms" for p in PHASES) + ("bytes_read", "bytes_written")
+    totals = summary()
+    width = max(len(name) for name in ("action", *totals)) + 2
+    lines = ["action".ljust(width) + "".join(c.rjust(14) for c in columns)]
+    for name, total in totals.items():
+        lines.append(name.ljust(width) + "".join(
+            f"{total[c]:14.1f}" if c.endswith("_ms") else f"{total[c]:14d}" for c in columns))
+    _write("\n".join(lines) + "\n")
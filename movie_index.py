@@ -0,0 +1,105 @@
+"""Sorted secondary indexes over one numeric field of the movies."""
+import heapq
+from bisect import bisect_left, bisect_right
+
+# From this many movies on, top_titles() selects candidates with NumPy
+NUMPY_TOP_MIN = 50_000
+
+
+class SortedIndex:
+    """
+    Keeps (value, title) pairs of one field in sorted order.
+
+    Two parallel lists are kept: the sort keys, which make every
+    entry unique so it can be found and removed, and the bare
+    values, which let range bounds be found with bisect.
+    A range query costs O(log n + k) and a sorted listing needs
+    no sort at all; inserts and removals cost O(log n) searches
+    plus a list shift.
+    """
+
+    def __init__(self, field, movies):
+        self.field = field
+        self._keys = sorted(zip(movies.column(field), movies.titles))
+        self._values = [value for value, _ in self._keys]
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def values(self):
+        """The indexed values in ascending order (read-only)."""
+        return self._values
+
+    def title_at(self, position):
+        """Return the title at a position in value order (negative from the end)."""
+        return self._keys[position][1]
+
+    def add(self, title, value):
+        """Insert a movie's value."""
+        key = (value, title)
+        i = bisect_left(self._keys, key)
+        self._keys.insert(i, key)
+        self._values.insert(i, value)
+
+    def remove(self, title, value):
+        """Remove a movie's value; it must be present."""
+        i = bisect_left(self._keys, (value, title))
+        del self._keys[i]
+        del self._values[i]
+
+    def bounds(self, low=None, high=None):
+        """Return the [start, stop) slice of entries with low <= value <= high."""
+        start = 0 if low is None else bisect_left(self._values, low)
+        stop = len(self._values) if high is None else bisect_right(self._values, high)
+        return start, max(start, stop)
+
+    def titles_between(self, start, stop, reverse=False):
+        """Return the titles at positions [start, stop) of value order (or of reversed order)."""
+        n = len(self._keys)
+        if reverse:
+            start, stop = n - stop, n - start
+        keys = self._keys[max(start, 0):max(stop, 0)]
+        if reverse:
+            keys.reverse()
+        return [title for _, title in keys]
+
+    def titles(self, low=None, high=None, reverse=False):
+        """Yield the titles with low <= value <= high in value order."""
+        start, stop = self.bounds(low, high)
+        keys = self._keys
+        if reverse:
+            for i in range(stop - 1, start - 1, -1):
+                yield keys[i][1]
+        else:
+            for i in range(start, stop):
+                yield keys[i][1]
+
+
+def top_titles(movies, field, k, reverse=False):
+    """
+    Return the k titles with the smallest (or, reversed, largest)
+    values of field, in the same order a SortedIndex lists them,
+    without sorting the whole catalog: O(n log k) with heapq, or an
+    O(n) NumPy partition on large catalogs.
+    """
+    column = movies.column(field)
+    n = len(column)
+    if k <= 0:
+        return []
+    if k >= n:
+        return [title for _, title in sorted(zip(column, movies.titles), reverse=reverse)]
+    if n < NUMPY_TOP_MIN:
+        select = heapq.nlargest if reverse else heapq.nsmallest
+        return [title for _, title in select(k, zip(column, movies.titles))]
+    import numpy as np
+    values = np.asarray(memoryview(column))
+    if reverse:
+        threshold = np.partition(values, n - k)[n - k]
+        rows = np.flatnonzero(values >= threshold)
+    else:
+        threshold = np.partition(values, k - 1)[k - 1]
+        rows = np.flatnonzero(values <= threshold)
+    # Ties at the threshold are ordered by title, as in the index
+    candidates = sorted(((column[row], movies.title_at(row)) for row in rows.tolist()), reverse=reverse)
+    return [title for _, title in candidates[:k]]
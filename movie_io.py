@@ -0,0 +1,115 @@
+"""
+Streaming bulk import and export of movies as CSV or JSON Lines.
+
+Rows flow through generators from the file, through validation,
+into a single storage batch, so only one row is held at a time
+on the way in and nothing is materialized on the way out.
+"""
+import csv
+import json
+import os
+import sys
+
+import movie_storage
+from validation import parse_rating, parse_title, parse_year
+
+FORMATS = ("csv", "jsonl")
+FIELDS = ("title", "year", "rating")
+
+
+def movie_record(title, info):
+    """Flatten a (title, info) pair into one {"title", "year", "rating"} row."""
+    return {"title": title, "year": info["year"], "rating": info["rating"]}
+
+
+def detect_format(path, fmt=None):
+    """Return fmt, or guess it from the file extension."""
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of '{path}'; use --format csv or jsonl.")
+
+
+def open_text(path, mode):
+    """Open path for text I/O, with '-' meaning stdin/stdout."""
+    if path == "-":
+        stream = sys.stdin if "r" in mode else sys.stdout
+        return open(stream.fileno(), mode, encoding="utf-8", newline="", closefd=False)
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def read_rows(f, fmt):
+    """Yield (line number, raw row dict) pairs from an open file."""
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_num, line in enumerate(f, start=1):
+            if line.strip():
+                try:
+                    yield line_num, json.loads(line)
+                except ValueError:
+                    yield line_num, None
+
+
+def validate_rows(rows, errors):
+    """
+    Yield (title, year, rating) tuples for the valid rows.
+    Invalid rows are skipped and reported as (line number, message)
+    pairs appended to errors.
+    """
+    for line_num, row in rows:
+        if not isinstance(row, dict):
+            errors.append((line_num, "Invalid JSON line."))
+            continue
+        try:
+            title = parse_title(row.get("title") or "")
+            year = parse_year(row.get("year", ""))
+            rating = parse_rating(row.get("rating", ""))
+        except ValueError as e:
+            errors.append((line_num, str(e)))
+            continue
+        yield title, year, rating
+
+
+def import_movies(path, fmt=None):
+    """
+    Import all valid rows of a CSV/JSONL file in one storage batch.
+    Returns (number imported, list of (line number, error) pairs).
+    """
+    fmt = detect_format(path, fmt)
+    errors = []
+    imported = 0
+
+    def counted(movies):
+        nonlocal imported
+        for movie in movies:
+            imported += 1
+            yield movie
+
+    with open_text(path, "r") as f:
+        movie_storage.add_movies(counted(validate_rows(read_rows(f, fmt), errors)))
+    return imported, errors
+
+
+def export_movies(path, fmt=None):
+    """Stream every movie to a CSV/JSONL file; returns the row count."""
+    fmt = detect_format(path, fmt)
+    count = 0
+    with open_text(path, "w") as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            for title, info in movie_storage.iter_movies():
+                writer.writerow((title, info["year"], info["rating"]))
+                count += 1
+        else:
+            for title, info in movie_storage.iter_movies():
+                f.write(json.dumps(movie_record(title, info), ensure_ascii=False) + "\n")
+                count += 1
+    return count
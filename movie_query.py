@@ -0,0 +1,293 @@
+"""
+A small query language over the movies.
+
+    rating>=8 and year between 1990 and 2000 and title~"godfather"
+    (year < 1980 or rating = 10) and not title~"part" sort rating desc limit 5 fields title,rating
+
+Conditions compare title, rating or year with = != < <= > >=, test a
+range with "between ... and ...", or match a case-insensitive
+substring of the title with ~; they combine with and, or, not and
+parentheses. Optional trailing clauses sort (by title, rating or year,
+asc or desc), limit/offset the results and pick the fields returned.
+
+compile_query() parses a query once into a Query holding a compiled
+Python predicate, the rating and year ranges implied by its top-level
+"and" terms (which backends use to read candidates from their sorted
+indexes), and an SQL translation for SQLite. Compiled queries are
+cached, so scripts repeating a query do not parse it again.
+"""
+import heapq
+import re
+from functools import lru_cache
+from itertools import islice
+
+FIELDS = ("title", "year", "rating")
+COMPARISONS = ("=", "==", "!=", "<", "<=", ">", ">=")
+# Position of each field in the (title, rating, year) rows queries run over
+ROW_POSITION = {"title": 0, "rating": 1, "year": 2}
+KEYWORDS = ("and", "or", "not", "between", "sort", "asc", "desc", "limit", "offset", "fields")
+TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<number>\d+(?:\.\d*)?|\.\d+)
+      | (?P<word>[A-Za-z_]\w*)
+      | (?P<op>>=|<=|!=|==|=|<|>|~|\(|\)|,)
+    )""", re.VERBOSE)
+# Compiled queries kept by compile_query()
+CACHE_SIZE = 256
+
+
+class QueryError(ValueError):
+    """A query that cannot be parsed or does not type-check."""
+
+
+def _tokens(text):
+    """Split a query into (kind, value, position) tokens."""
+    pos, tokens = 0, []
+    while pos < len(text):
+        if text[pos:].isspace():
+            break
+        match = TOKEN.match(text, pos)
+        if match is None:
+            raise QueryError(f"Unexpected character at position {pos}: {text[pos]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        elif kind == "word" and value.lower() in KEYWORDS + FIELDS:
+            value = value.lower()
+        tokens.append((kind, value, match.start(kind)))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser producing a nested tuple AST."""
+
+    def __init__(self, text):
+        self.tokens = _tokens(text)
+        self.i = 0
+
+    def peek(self, value=None):
+        if self.i >= len(self.tokens):
+            return None
+        token = self.tokens[self.i]
+        if value is not None and not (token[0] in ("word", "op") and token[1] == value):
+            return None
+        return token
+
+    def take(self, value=None, kind=None, what=None):
+        token = self.peek(value)
+        if token is None or (kind is not None and token[0] != kind):
+            found = f"{self.tokens[self.i][1]!r}" if self.i < len(self.tokens) else "end of query"
+            raise QueryError(f"Expected {what or value or kind}, found {found}")
+        self.i += 1
+        return token
+
+    def parse(self):
+        node = None
+        if self.peek() and not any(self.peek(clause) for clause in ("sort", "limit", "offset", "fields")):
+            node = self.expr()
+        sort = reverse = limit = None
+        offset = 0
+        fields = FIELDS
+        if self.peek("sort"):
+            self.take("sort")
+            sort = self.field()
+            reverse = bool(self.peek("desc"))
+            if self.peek("asc") or self.peek("desc"):
+                self.i += 1
+        if self.peek("limit"):
+            self.take("limit")
+            limit = self.count()
+        if self.peek("offset"):
+            self.take("offset")
+            offset = self.count()
+        if self.peek("fields"):
+            self.take("fields")
+            fields = [self.field()]
+            while self.peek(","):
+                self.take(",")
+                fields.append(self.field())
+            fields = tuple(fields)
+        if self.peek():
+            raise QueryError(f"Unexpected {self.peek()[1]!r} at position {self.peek()[2]}")
+        return node, sort, reverse, limit, offset, fields
+
+    def field(self):
+        token = self.peek()
+        if token is None or token[0] != "word" or token[1] not in FIELDS:
+            return self.take(kind="field", what="a field (title, year or rating)")
+        self.i += 1
+        return token[1]
+
+    def count(self):
+        value = self.take(kind="number", what="a number")[1]
+        if not value.isdigit():
+            raise QueryError(f"Expected a whole number, found {value!r}")
+        return int(value)
+
+    def expr(self):
+        node = self.conjunction()
+        while self.peek("or"):
+            self.take("or")
+            node = ("or", node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.peek("and"):
+            self.take("and")
+            node = ("and", node, self.negation())
+        return node
+
+    def negation(self):
+        if self.peek("not"):
+            self.take("not")
+            return ("not", self.negation())
+        if self.peek("("):
+            self.take("(")
+            node = self.expr()
+            self.take(")", what="')'")
+            return node
+        return self.condition()
+
+    def condition(self):
+        field = self.field()
+        if self.peek("between"):
+            self.take("between")
+            low = self.literal(field)
+            self.take("and")
+            return ("between", field, low, self.literal(field))
+        if self.peek("~"):
+            if field != "title":
+                raise QueryError("~ only applies to title")
+            self.take("~")
+            return ("contains", field, self.take(kind="string", what="a quoted string")[1].lower())
+        token = self.peek()
+        if token is None or token[1] not in COMPARISONS:
+            raise QueryError(f"Expected a comparison after {field}")
+        self.i += 1
+        op = "==" if token[1] == "=" else token[1]
+        return ("compare", field, op, self.literal(field))
+
+    def literal(self, field):
+        if field == "title":
+            return self.take(kind="string", what="a quoted title")[1]
+        value = self.take(kind="number", what=f"a number for {field}")[1]
+        if field == "year":
+            if not value.isdigit():
+                raise QueryError(f"Year must be a whole number, found {value!r}")
+            return int(value)
+        return float(value)
+
+
+def _python(node):
+    """Translate an AST node into a Python expression over title, rating, year."""
+    kind = node[0]
+    if kind in ("and", "or"):
+        return f"({_python(node[1])} {kind} {_python(node[2])})"
+    if kind == "not":
+        return f"(not {_python(node[1])})"
+    if kind == "between":
+        return f"({node[2]!r} <= {node[1]} <= {node[3]!r})"
+    if kind == "contains":
+        return f"({node[2]!r} in title.lower())"
+    return f"({node[1]} {node[2]} {node[3]!r})"
+
+
+def _sql(node, params):
+    """Translate an AST node into an SQL condition, appending its parameters."""
+    kind = node[0]
+    if kind in ("and", "or"):
+        return f"({_sql(node[1], params)} {kind.upper()} {_sql(node[2], params)})"
+    if kind == "not":
+        return f"(NOT {_sql(node[1], params)})"
+    if kind == "between":
+        params.extend(node[2:])
+        return f"({node[1]} BETWEEN ? AND ?)"
+    if kind == "contains":
+        params.append(node[2])
+        return "(title_contains(title, ?))"
+    params.append(node[3])
+    return f"({node[1]} {'=' if node[2] == '==' else node[2]} ?)"
+
+
+def _ranges(node, ranges):
+    """Narrow {field: [low, high]} with the bounds every match must satisfy."""
+    kind = node[0]
+    if kind == "and":
+        _ranges(node[1], ranges)
+        _ranges(node[2], ranges)
+    elif kind == "between" and node[1] != "title":
+        _narrow(ranges, node[1], node[2], node[3])
+    elif kind == "compare" and node[1] != "title":
+        op, value = node[2], node[3]
+        # Bounds are inclusive; the predicate still excludes the endpoint of < and >
+        if op in (">", ">="):
+            _narrow(ranges, node[1], value, None)
+        elif op in ("<", "<="):
+            _narrow(ranges, node[1], None, value)
+        elif op == "==":
+            _narrow(ranges, node[1], value, value)
+
+
+def _narrow(ranges, field, low, high):
+    current = ranges.setdefault(field, [None, None])
+    if low is not None and (current[0] is None or low > current[0]):
+        current[0] = low
+    if high is not None and (current[1] is None or high < current[1]):
+        current[1] = high
+
+
+class Query:
+    """A compiled query; run it with movie_storage.query_movies()."""
+
+    def __init__(self, text):
+        self.text = text
+        node, self.sort, self.reverse, self.limit, self.offset, self.fields = _Parser(text).parse()
+        self.node = node
+        self.predicate = eval(f"lambda title, rating, year: {_python(node) if node else 'True'}")  # noqa: S307
+        self.ranges = {}
+        if node is not None:
+            _ranges(node, self.ranges)
+        self.where_params = []
+        self.where = _sql(node, self.where_params) if node else "1"
+
+    def __repr__(self):
+        return f"Query({self.text!r})"
+
+    def finish(self, rows, ordered=False):
+        """
+        Filter (title, rating, year) rows with the predicate, sort them
+        (unless they arrive ordered) and apply offset and limit. A
+        limited sort keeps only the top offset + limit rows in a heap.
+        """
+        predicate = self.predicate
+        rows = (row for row in rows if predicate(*row))
+        if self.sort is not None and not ordered:
+            position = ROW_POSITION[self.sort]
+            if self.sort == "title":
+                sort_key = lambda row: row[0]  # noqa: E731
+            else:
+                # Ties in (value, title) order, like the sorted indexes
+                sort_key = lambda row: (row[position], row[0])  # noqa: E731
+            if self.limit is not None:
+                select = heapq.nlargest if self.reverse else heapq.nsmallest
+                rows = iter(select(self.offset + self.limit, rows, key=sort_key))
+            else:
+                rows = iter(sorted(rows, key=sort_key, reverse=self.reverse))
+        stop = None if self.limit is None else self.offset + self.limit
+        return islice(rows, self.offset, stop)
+
+    def project(self, title, info):
+        """Return the selected fields of one movie as a dictionary."""
+        record = {"title": title, "year": info["year"], "rating": info["rating"]}
+        return {field: record[field] for field in self.fields}
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_query(text):
+    """Parse and compile a query, reusing the result for repeated texts."""
+    return Query(text)
+
@@ -0,0 +1,55 @@
+"""Running rating statistics kept up to date by the storage layer."""
+import math
+
+
+def summarize(count, total, median, best, worst):
+    """Build the dictionary returned by rating_stats()."""
+    return {
+        "count": count,
+        "average": total / count if count else None,
+        "median": median,
+        "best": best,
+        "worst": worst,
+    }
+
+
+def median_of(sorted_ratings):
+    """Exact median of an already sorted sequence (None if empty)."""
+    n = len(sorted_ratings)
+    if not n:
+        return None
+    mid = n // 2
+    if n % 2:
+        return sorted_ratings[mid]
+    return (sorted_ratings[mid - 1] + sorted_ratings[mid]) / 2
+
+
+class RatingStats:
+    """
+    Count and sum of all ratings, updated on every mutation.
+
+    The median, best and worst movie are read off the sorted
+    rating index, which already works as an order-statistic
+    structure: every statistic costs O(1) once it is built.
+    """
+
+    def __init__(self, by_rating):
+        self.by_rating = by_rating
+        self.count = len(by_rating.values)
+        self.total = math.fsum(by_rating.values)
+
+    def add(self, rating):
+        self.count += 1
+        self.total += rating
+
+    def remove(self, rating):
+        self.count -= 1
+        self.total -= rating
+
+    def summary(self):
+        """Return count, average, median and the best and worst titles."""
+        index = self.by_rating
+        if not self.count:
+            return summarize(0, 0, None, None, None)
+        return summarize(self.count, self.total, median_of(index.values),
+                         index.title_at(-1), index.title_at(0))
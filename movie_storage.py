@@ -1,17 +1,998 @@
 import json
+import math
 import os
+import stat
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import islice
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single writer assumed
+    fcntl = None
+
+import instrument
+import serialization
+from catalog import MovieCatalog
+from movie_index import SortedIndex, top_titles
+from movie_stats import RatingStats, median_of, summarize
 
 # Path to the JSON file for persistent storage
 DATA_FILE = "data.json"
 
+# Journal mode: mutations are appended to DATA_FILE + ".log" instead of
+# rewriting the whole JSON file, which is compacted past the threshold
+JOURNAL_MODE = False
+JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024
+
+# The change feed (DATA_FILE + ".changes") is cut back to its newest
+# half of this size once it grows past it
+FEED_MAX_BYTES = 8 * 1024 * 1024
+FEED_READ_BYTES = 64 * 1024
+# A batch with more changes than this is recorded as one reset
+FEED_BATCH_MAX_CHANGES = 10_000
+# A batch keeps the sorted and fuzzy title indexes up to date for this many
+# changes, then drops them to be rebuilt once (cheaper for bulk changes)
+BATCH_INDEX_MAX_CHANGES = 1_000
+
+# Data files with one of these extensions are stored in SQLite
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+# Data files with one of these extensions are binary snapshots (see snapshot.py)
+SNAPSHOT_SUFFIXES = (".snap",)
+# Data "files" with one of these extensions are sharded directories (see sharded_storage.py)
+SHARDED_SUFFIXES = (".shards",)
+
+# A sorted page of at most 1/TOP_K_FRACTION of the catalog is picked as a
+# top-k selection rather than by building the sorted index
+TOP_K_FRACTION = 16
+# A limited query sorted by an indexed field walks that index in order
+# unless another index range is more than this many times narrower
+ORDERED_SCAN_FACTOR = 8
+
+
+# What MovieStore compares to notice that a file changed
+FileStat = namedtuple("FileStat", "inode mtime_ns size")
+
+
+class ChangeFeedGap(LookupError):
+    """The change feed no longer reaches back to a version: reload everything."""
+
+
+class ChangeFeedUnavailable(NotImplementedError):
+    """The backend has no catalog-wide change feed."""
+
+
+@contextmanager
+def atomic_write(path, mode='w', encoding='utf-8'):
+    """
+    Open a temporary file next to path for writing and move it over
+    path only once it is completely written and synced, so a crash
+    leaves either the old file or the new one, never a torn one.
+    The new file keeps the permissions of the one it replaces.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with open(fd, mode, encoding=None if 'b' in mode else encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file readable by its owner only
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _sync_directory(directory)
+
+
+def _file_mode(path):
+    """The permissions of path, or those open() gives a new file under the current umask."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _sync_directory(directory):
+    """Sync a directory so a rename in it survives a crash (not possible on Windows)."""
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _json_signature(signature):
+    """A file signature as it is stored in (and read back from) the change feed."""
+    return None if signature is None else [None if part is None else list(part) for part in signature]
+
+
+class StorageBackend:
+    """
+    Interface every movie storage backend implements.
+
+    Subclasses provide get_movies, add_movie, delete_movie and
+    update_movie. The query helpers below fall back to scanning
+    get_movies() and can be overridden by backends that answer
+    them faster, e.g. with an indexed SQL query.
+    """
+
+    # Fuzzy title index and the movies dictionary it was built from
+    _search = None
+    _search_source = None
+    # Catalog version of the movies get_movies() returns, when known
+    _feed_version = None
+
+    def get_movies(self):
+        """Return all movies as {title: {"rating": ..., "year": ...}}."""
+        raise NotImplementedError
+
+    def get_movie(self, title):
+        """Return the info of one movie, or None if it is missing."""
+        return self.get_movies().get(title)
+
+    def save_movies(self, movies):
+        """Replace the whole database with a {title: info} mapping."""
+        raise NotImplementedError
+
+    def add_movie(self, title, year, rating):
+        """Add (or replace) a movie."""
+        raise NotImplementedError
+
+    def delete_movie(self, title):
+        """Delete a movie; KeyError if it is missing."""
+        raise NotImplementedError
+
+    def update_movie(self, title, rating):
+        """Update the rating of an existing movie."""
+        raise NotImplementedError
+
+    def catalog_version(self):
+        """Return the version of the catalog: the number of its last recorded change."""
+        raise NotImplementedError
+
+    @property
+    def cache_version(self):
+        """The catalog version the movies returned by get_movies() reflect (None if unknown)."""
+        return self._feed_version
+
+    def changes_since(self, version):
+        """
+        Return the changes recorded after version, oldest first, as
+        {"version", "op", "title", "old", "new"} dictionaries where op
+        is "add", "update" or "delete" and old/new are the movie's
+        {"rating", "year"} before and after (None if absent). An
+        {"version", "op": "reset"} change means the whole catalog was
+        replaced. ChangeFeedGap if the feed no longer reaches back to
+        version.
+        """
+        raise NotImplementedError
+
+    def iter_movies(self):
+        """Yield every (title, info) pair without copying the catalog."""
+        yield from self.get_movies().items()
+
+    @contextmanager
+    def batch(self):
+        """
+        Group any mix of mutations so they are loaded once and
+        written once when the outermost batch exits. If the block
+        raises, none of its changes are written.
+        """
+        yield self
+
+    def add_movies(self, movies):
+        """Add many (title, year, rating) tuples in one batch."""
+        with self.batch():
+            for title, year, rating in movies:
+                self.add_movie(title, year, rating)
+
+    def update_ratings(self, ratings):
+        """Apply a {title: rating} mapping in one batch."""
+        with self.batch():
+            for title, rating in ratings.items():
+                self.update_movie(title, rating)
+
+    def delete_movies(self, titles):
+        """Delete many movies in one batch; KeyError if any is missing."""
+        with self.batch():
+            for title in titles:
+                self.delete_movie(title)
+
+    def filter_movies(self, min_rating=None, start_year=None, end_year=None):
+        """Yield (title, info) pairs matching all of the given bounds."""
+        for title, info in self.get_movies().items():
+            if min_rating is not None and info['rating'] < min_rating:
+                continue
+            if start_year is not None and info['year'] < start_year:
+                continue
+            if end_year is not None and info['year'] > end_year:
+                continue
+            yield title, info
+
+    def sorted_movies(self, key, reverse=False, limit=None, offset=0):
+        """
+        Yield (title, info) pairs ordered by "rating" or "year",
+        skipping the first offset and stopping after limit. With a
+        limit only the top offset + limit movies are selected.
+        """
+        movies = self.get_movies()
+        if limit is None:
+            pairs = sorted(movies.items(), key=lambda x: (x[1][key], x[0]), reverse=reverse)
+            yield from islice(pairs, offset, None)
+            return
+        for title in top_titles(movies, key, offset + limit, reverse)[offset:]:
+            yield title, movies[title]
+
+    def query_movies(self, query):
+        """
+        Yield the (title, info) pairs selected by a compiled
+        movie_query.Query, in its order and page.
+        """
+        for title, rating, year in query.finish(self.get_movies().rows()):
+            yield title, {"rating": rating, "year": year}
+
+    def _title_index(self):
+        """Return the fuzzy title index, rebuilding it if the catalog was replaced."""
+        movies = self.get_movies()
+        if self._search is None or self._search_source is not movies:
+            from search_index import TitleSearchIndex
+            self._search = TitleSearchIndex(movies)
+            self._search_source = movies
+        return self._search
+
+    def _reindex_title(self, title, present):
+        """Keep an already built title index in step with one mutation."""
+        if self._search is not None and self._search_source is self._movies:
+            if present:
+                self._search.add(title)
+            else:
+                self._search.remove(title)
+
+    def _replay(self, change):
+        """Apply one add/update/delete change from a change feed to the cached movies."""
+        title, new = change["title"], change["new"]
+        present = title in self._movies
+        if new is None:
+            self._movies.discard(title)
+        else:
+            self._movies.set(title, new["rating"], new["year"])
+        if present != (new is not None):
+            self._reindex_title(title, new is not None)
+
+    def search_movies(self, term, limit=5, score_cutoff=50):
+        """Return up to limit (title, score) fuzzy matches for term."""
+        return self._title_index().search(term, limit, score_cutoff)
+
+    def batch_search_movies(self, terms, limit=5, score_cutoff=50):
+        """Return one list of (title, score) matches per term, scored in parallel."""
+        return self._title_index().batch_search(terms, limit, score_cutoff)
+
+    def rating_stats(self):
+        """
+        Return {"count", "average", "median", "best", "worst"}
+        for the ratings, where best/worst are movie titles.
+        """
+        movies = self.get_movies()
+        if not movies:
+            return summarize(0, 0, None, None, None)
+        ratings = sorted(info['rating'] for info in movies.values())
+        # Ties by title, as in the sorted rating index
+        best = max(movies, key=lambda t: (movies[t]['rating'], t))
+        worst = min(movies, key=lambda t: (movies[t]['rating'], t))
+        return summarize(len(ratings), sum(ratings), median_of(ratings), best, worst)
+
+
+class MovieStore(StorageBackend):
+    """
+    Keeps the movies of one JSON file in memory.
+
+    The file is parsed once and served from memory afterwards.
+    Before every read the file's modification time and size are
+    compared with the ones seen at load time, so changes made by
+    another process (or by hand) are picked up automatically.
+
+    With journal=True every add/update/delete is appended as one
+    JSON line to a write-ahead log next to the data file instead
+    of rewriting the whole file. The log is replayed on load and
+    folded back into the data file once it grows past
+    compact_bytes (or when compact() is called). A leftover log is
+    always replayed, so switching journal mode off loses nothing.
+
+    Sorted indexes on rating and year, and the running rating
+    statistics, are built on first use and kept up to date by
+    every mutation; a batch of more than BATCH_INDEX_MAX_CHANGES
+    drops them instead, to be rebuilt once when next needed.
+
+    Saves go through a temporary file and os.replace, so the data
+    file is never left half-written. Every read-modify-write cycle
+    (a single mutation or a whole batch) holds an exclusive fcntl
+    lock on path + ".lock" and starts by re-checking the file
+    version (mtime and size), reloading if another process wrote
+    in the meantime. Reads take no lock: they only compare the
+    version with the cached one. While the store writes its own
+    changes (e.g. from a worker thread, as the HTTP server does),
+    reads from other threads are served from the cache, which
+    already holds them.
+
+    Every committed change is also appended to a change feed,
+    path + ".changes", one JSON line per change numbered by the
+    catalog version (see changes_since()). The last line of each
+    append records the file signature it produced, so a store whose
+    files were changed by another writer replays just the new
+    changes into its cache, indexes and statistics instead of
+    reloading, and a writer that finds files changed behind the
+    feed's back (e.g. edited by hand) records a reset first.
+    Compaction, which rewrites the files without changing the
+    catalog, records just their new signature.
+    """
+
+    def __init__(self, path, journal=False, compact_bytes=JOURNAL_COMPACT_BYTES):
+        self.path = path
+        self.log_path = path + ".log"
+        self.journal = journal
+        self.compact_bytes = compact_bytes
+        self._movies = None
+        self._signature = None
+        self._batch_depth = 0
+        self._committing = False
+        self._pending = []
+        self._dirty = False
+        self._indexes = {}
+        self._stats = None
+        self.lock_path = path + ".lock"
+        self._lock_file = None
+        self._lock_depth = 0
+        self.feed_path = path + ".changes"
+        # Changes made since the last commit, and the feed version of the cache
+        self._changes = []
+        self._feed_version = None
+
+    @contextmanager
+    def _locked(self):
+        """Hold the writer lock for a read-modify-write cycle (reentrant)."""
+        if self._lock_depth == 0 and fcntl is not None:
+            self._lock_file = open(self.lock_path, 'a')
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if self._lock_depth == 0 and self._lock_file is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                self._lock_file.close()
+                self._lock_file = None
+
+    @property
+    def version(self):
+        """The on-disk version (inode, mtime and size of the data file and journal)."""
+        return self._file_signature()
+
+    @staticmethod
+    def _stat(path):
+        """
+        Return the FileStat of a file, or None if it is missing.
+        Atomic saves replace the file, so the inode changes on every save.
+        """
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return FileStat(st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _file_signature(self):
+        """Return the signatures of the data file and its journal."""
+        return self._stat(self.path), self._stat(self.log_path)
+
+    def _load(self):
+        """Parse the data file and replay the journal into the cache."""
+        with instrument.phase("load"):
+            movies = None
+            while movies is None:
+                signature = self._file_signature()
+                movies = self._read_files(signature)
+        self._movies = movies
+        self._signature = signature
+        self._indexes = {}
+        self._stats = None
+        # The cache matches the feed's last version only if that recorded these files
+        tail = self._read_feed(math.inf)
+        self._feed_version = None
+        if not tail:
+            self._feed_version = 0
+        elif tail[-1].get("signature") == _json_signature(signature):
+            self._feed_version = tail[-1]["version"]
+
+    def _read_files(self, signature):
+        """
+        Read the data file and replay the journal, as found with
+        signature; None if a writer compacted the journal away in the
+        meantime (reads take no lock), to be read again.
+        """
+        data_sig, log_sig = signature
+        if data_sig is None:
+            # Initialize an empty database if none exists
+            movies = MovieCatalog()
+        else:
+            movies = self._read_data()
+            instrument.count_bytes(read=data_sig.size)
+        if log_sig is None:
+            return movies
+        movies = self._mutable(movies)
+        try:
+            f = open(self.log_path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return None
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn last line from an interrupted append
+                    continue
+                self._apply(movies, entry)
+        instrument.count_bytes(read=log_sig.size)
+        return movies
+
+    def _read_data(self):
+        """Read the data file into a catalog."""
+        with open(self.path, 'rb') as f:
+            return serialization.read_catalog(f, serialization.compression_of(self.path))
+
+    def _write_data(self, movies):
+        """Write a catalog to the data file atomically (see serialization.py for the format)."""
+        with atomic_write(self.path, 'wb') as f:
+            serialization.write_catalog(f, movies, serialization.compression_of(self.path))
+
+    @staticmethod
+    def _mutable(movies):
+        """Return a catalog that can be changed in place (formats read-only on disk override this)."""
+        return movies
+
+    @staticmethod
+    def _apply(movies, entry):
+        """
+        Apply one journal entry to a movies dictionary.
+        Replaying is idempotent, so a log that was already
+        folded into the data file can safely be applied twice.
+        """
+        op, title = entry["op"], entry["title"]
+        if op == "add":
+            movies.set(title, entry["rating"], entry["year"])
+        elif op == "delete":
+            movies.discard(title)
+        elif op == "update":
+            if title in movies:
+                movies.set_rating(title, entry["rating"])
+
+    def invalidate(self):
+        """Drop the cache so the next read parses the file again."""
+        self._movies = None
+        self._signature = None
+        self._indexes = {}
+        self._stats = None
+        self._changes = []
+        self._feed_version = None
+
+    def _rating_stats(self):
+        """Return the running rating statistics, building them if needed."""
+        if self._stats is None or self._stats.by_rating is not self._indexes.get("rating"):
+            self._stats = RatingStats(self._index("rating"))
+        return self._stats
+
+    def _index(self, field):
+        """Return the sorted index on field, building it if needed."""
+        movies = self.get_movies()
+        index = self._indexes.get(field)
+        if index is None:
+            index = self._indexes[field] = SortedIndex(field, movies)
+        return index
+
+    def get_movies(self):
+        """
+        Returns the cached MovieCatalog, reloading it first
+        if the data file changed since it was last read.
+
+        The catalog is shared with the cache and read-only
+        as a mapping; changes go through the store.
+        """
+        if self._movies is None:
+            self._load()
+        elif self._committing:
+            # Writing this cache out; the writer lock keeps other processes away
+            pass
+        elif self._file_signature() != self._signature and not self._catch_up():
+            self._load()
+        return self._movies
+
+    def _catch_up(self):
+        """
+        Replay the feed's changes since the cached version into the
+        cache; False (for a full reload) if they do not lead exactly
+        to the files on disk.
+
+        Like every read this takes no lock: the feed is only appended
+        to, and a writer that has replaced the files but not yet
+        recorded its changes leaves a signature mismatch, which falls
+        back to the reload.
+        """
+        if self._feed_version is None or self._batch_depth:
+            return False
+        signature = self._file_signature()
+        entries = self._read_feed(self._feed_version)
+        try:
+            changes = self._read_changes(self._feed_version, entries)
+        except ChangeFeedGap:
+            return False
+        if (not entries or entries[-1].get("signature") != _json_signature(signature)
+                or any(change["op"] == "reset" for change in changes)):
+            return False
+        for change in changes:
+            new = change["new"]
+            entry = ({"op": "add", "title": change["title"], **new} if new
+                     else {"op": "delete", "title": change["title"]})
+            self._update_cache(entry)
+        self._signature = signature
+        self._feed_version = entries[-1]["version"]
+        return True
+
+    def save_movies(self, movies):
+        """Write all movies to the data file and make them the cache."""
+        with self._locked():
+            self._save(MovieCatalog.from_dict(movies))
+            self._changes = []
+            self._record_changes([{"op": "reset"}], None)
+
+    def _save(self, movies):
+        """Write a catalog to the data file, fold in the journal and cache it."""
+        with self._locked():
+            self._write_data(movies)
+            # Everything in the journal is now part of the data file
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+        if movies is not self._movies:
+            self._indexes = {}
+        self._movies = movies
+        self._signature = self._file_signature()
+        instrument.count_bytes(written=self._signature[0].size)
+
+    def compact(self):
+        """Fold the journal into the data file."""
+        with self._locked():
+            movies = self.get_movies()
+            previous = self._signature
+            self._save(movies)
+            self._record_rewrite(previous)
+
+    @contextmanager
+    def batch(self):
+        """
+        Group mutations into a single write: one journal append
+        in journal mode, otherwise one rewrite of the data file.
+        If the block raises, the cache is dropped and nothing
+        from the batch reaches the disk. The writer lock is held
+        for the whole batch.
+        """
+        with self._locked():
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._pending = []
+                    self._dirty = False
+                    self.invalidate()
+                raise
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._dirty:
+                entries, self._pending = self._pending, []
+                self._dirty = False
+                self._commit(entries)
+
+    def _commit(self, entries):
+        """
+        Persist mutations already applied to the cache: append them
+        to the journal in journal mode, otherwise rewrite the file.
+        Inside a batch they are only collected until it exits.
+        """
+        if self._batch_depth:
+            # Outside journal mode the final rewrite covers everything,
+            # so the entries themselves need not be kept
+            if self.journal:
+                self._pending.extend(entries)
+            self._dirty = True
+            return
+        previous = self._signature
+        changes, self._changes = self._changes, []
+        if changes is None:
+            changes = [{"op": "reset"}]
+        self._committing = True
+        try:
+            if self.journal:
+                self._append_journal(entries)
+            else:
+                self._save(self._movies)
+            self._record_changes(changes, previous)
+            if self.journal and self._signature[1].size >= self.compact_bytes:
+                self.compact()
+        finally:
+            self._committing = False
+
+    def _append_journal(self, entries):
+        """Append entries to the journal and sync it."""
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+        log_size = self._signature[1].size if self._signature[1] else 0
+        self._signature = self._file_signature()
+        instrument.count_bytes(written=self._signature[1].size - log_size)
+
+    def _mutate(self, entry):
+        """Apply one mutation to the cache and the indexes, then commit it."""
+        change = self._update_cache(entry)
+        if self._changes is not None:
+            self._changes.append(change)
+            if len(self._changes) > FEED_BATCH_MAX_CHANGES:
+                # Readers reload after a bulk change anyway; None records a reset
+                self._changes = None
+        self._commit([entry])
+
+    def _update_cache(self, entry):
+        """
+        Apply one journal entry to the cache, keeping the indexes,
+        statistics and title index in step; return the change made.
+        """
+        movies = self._mutable(self._movies)
+        if movies is not self._movies:
+            self._movies = movies
+            self._indexes = {}
+        title = entry["title"]
+        if self._batch_depth and (self._changes is None or len(self._changes) >= BATCH_INDEX_MAX_CHANGES):
+            # One rebuild after a bulk change beats shifting the lists per row
+            self._indexes = {}
+            self._search = None
+        old = movies.get(title)
+        old_values = {field: old[field] for field in self._indexes} if old else None
+        try:
+            self._apply(movies, entry)
+        except BaseException:
+            # Never serve a cache the mutation may have left half-changed;
+            # in a batch its earlier changes are dropped with it
+            self._pending = []
+            self._dirty = False
+            self.invalidate()
+            raise
+        new = movies.get(title)
+        for field, index in self._indexes.items():
+            if old_values is not None:
+                index.remove(title, old_values[field])
+            if new is not None:
+                index.add(title, new[field])
+        if (old is None) != (new is None):
+            self._reindex_title(title, new is not None)
+        stats = self._stats
+        if stats is not None and stats.by_rating is self._indexes.get("rating"):
+            if old_values is not None:
+                stats.remove(old_values["rating"])
+            if new is not None:
+                stats.add(new["rating"])
+        op = "add" if old is None else "delete" if new is None else "update"
+        return {"op": op, "title": title, "old": old, "new": new}
+
+    # --- change feed ----------------------------------------------------
+
+    def _read_feed(self, since):
+        """
+        Return the feed entries from the newest back to the first
+        one at or below version since (or to the start), oldest
+        first. The file is read and parsed backwards in chunks, so
+        this costs O(changes returned).
+        """
+        try:
+            f = open(self.feed_path, 'rb')
+        except FileNotFoundError:
+            return []
+        entries = []
+        with f:
+            pos = f.seek(0, os.SEEK_END)
+            partial = b""
+            while pos > 0:
+                step = min(FEED_READ_BYTES, pos)
+                pos -= step
+                f.seek(pos)
+                lines = (f.read(step) + partial).split(b"\n")
+                # Unless the start of the file was reached, the first line may be cut
+                partial = lines.pop(0) if pos else b""
+                for line in reversed(lines):
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A blank line, or a torn last line from an interrupted append
+                        continue
+                    entries.append(entry)
+                    if entry["version"] <= since:
+                        pos = 0
+                        break
+        entries.reverse()
+        return entries
+
+    def _read_changes(self, version, entries=None):
+        """
+        The changes after version, from the feed entries read back to
+        it (read here unless given); ChangeFeedGap if the feed does not
+        reach back that far.
+        """
+        if entries is None:
+            entries = self._read_feed(version)
+        current = entries[-1]["version"] if entries else 0
+        # Lines without an op only record a rewrite of the files (see _record_rewrite)
+        changes = [entry for entry in entries if entry["version"] > version and "op" in entry]
+        if version > current or (changes and changes[0]["version"] != version + 1):
+            raise ChangeFeedGap(f"The change feed does not cover version {version}.")
+        return changes
+
+    def _record_changes(self, changes, previous):
+        """
+        Append committed changes to the feed under the next versions
+        (writer lock held). The last line records the files'
+        signature; if the files were not the ones the feed last
+        recorded (previous, the signature the changes were made on),
+        a reset is recorded first.
+        """
+        if not changes:
+            return
+        tail = self._read_feed(math.inf)
+        version = tail[-1]["version"] if tail else 0
+        if previous is not None and tail and tail[-1].get("signature") != _json_signature(previous):
+            changes = [{"op": "reset"}] + changes
+        last = len(changes) - 1
+
+        def lines():
+            for i, change in enumerate(changes):
+                line = {"version": version + 1 + i, **change}
+                if i == last:
+                    line["signature"] = _json_signature(self._signature)
+                yield line
+        self._append_feed(lines())
+        self._feed_version = version + len(changes)
+
+    def _record_rewrite(self, previous):
+        """
+        Record that the files were rewritten without changing the
+        catalog, e.g. by compaction (writer lock held): a line without
+        an op repeats the last version with the new signature, so
+        neither readers nor the next writer take the rewrite for a
+        change made behind the feed's back. If the files the rewrite
+        started from (previous) were not the ones the feed last
+        recorded, a reset is recorded instead.
+        """
+        tail = self._read_feed(math.inf)
+        if tail and tail[-1].get("signature") != _json_signature(previous):
+            self._record_changes([{"op": "reset"}], None)
+            return
+        version = tail[-1]["version"] if tail else 0
+        self._append_feed([{"version": version, "signature": _json_signature(self._signature)}])
+        self._feed_version = version
+
+    def _append_feed(self, lines):
+        """Append lines (dictionaries) to the feed, trimming it past FEED_MAX_BYTES."""
+        with open(self.feed_path, 'a+b') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size:
+                f.seek(size - 1)
+                if f.read(1) != b"\n":
+                    # Never continue a torn line
+                    f.write(b"\n")
+            # Not synced: if a crash loses (part of) this append, the last
+            # recorded signature no longer matches the files and a reset follows
+            for line in lines:
+                f.write(json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n")
+            end = f.tell()
+        instrument.count_bytes(written=end - size)
+        if end > FEED_MAX_BYTES:
+            self._trim_feed()
+
+    def _trim_feed(self):
+        """Drop the oldest changes, keeping the newest FEED_MAX_BYTES // 2 of the feed."""
+        with open(self.feed_path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - FEED_MAX_BYTES // 2))
+            # Start at the first whole line
+            f.readline()
+            newer = f.read()
+        if not newer:
+            # Never lose the last version, whatever the size of its line
+            return
+        with atomic_write(self.feed_path, 'wb') as f:
+            f.write(newer)
+
+    def catalog_version(self):
+        """Return the number of the last change recorded in the feed (0 if none)."""
+        tail = self._read_feed(math.inf)
+        return tail[-1]["version"] if tail else 0
+
+    def changes_since(self, version):
+        """Return the changes after version from the feed file, oldest first."""
+        return [{key: value for key, value in change.items() if key != "signature"}
+                for change in self._read_changes(version)]
+
+    def add_movie(self, title, year, rating):
+        """Add (or replace) a movie and save the database."""
+        with self._locked():
+            self.get_movies()
+            self._mutate({"op": "add", "title": title, "rating": rating, "year": year})
+
+    def delete_movie(self, title):
+        """Delete a movie and save the database; KeyError if it is missing."""
+        with self._locked():
+            if title not in self.get_movies():
+                raise KeyError(f"Movie '{title}' does not exist.")
+            self._mutate({"op": "delete", "title": title})
+
+    def update_movie(self, title, rating):
+        """Update the rating of an existing movie and save the database."""
+        with self._locked():
+            if title in self.get_movies():
+                self._mutate({"op": "update", "title": title, "rating": rating})
+
+    def filter_movies(self, min_rating=None, start_year=None, end_year=None):
+        """
+        Yield (title, info) pairs matching the bounds. The narrower
+        of the year range and the rating range is read from its
+        index, so only candidates inside it are checked.
+        """
+        movies = self.get_movies()
+        if min_rating is None and start_year is None and end_year is None:
+            yield from movies.items()
+            return
+        by_year = self._index("year")
+        by_rating = self._index("rating")
+        year_start, year_stop = by_year.bounds(start_year, end_year)
+        rating_start, rating_stop = by_rating.bounds(min_rating)
+        if year_stop - year_start <= rating_stop - rating_start:
+            for title in by_year.titles(start_year, end_year):
+                info = movies[title]
+                if min_rating is None or info['rating'] >= min_rating:
+                    yield title, info
+        else:
+            for title in by_rating.titles(min_rating):
+                info = movies[title]
+                if ((start_year is None or info['year'] >= start_year)
+                        and (end_year is None or info['year'] <= end_year)):
+                    yield title, info
+
+    def sorted_movies(self, key, reverse=False, limit=None, offset=0):
+        """
+        Yield (title, info) pairs in index order, without sorting.
+        A small page (offset + limit) with no index built yet is
+        selected as a top-k instead of building the index.
+        """
+        movies = self.get_movies()
+        index = self._indexes.get(key)
+        if limit is None:
+            titles = islice(self._index(key).titles(reverse=reverse), offset, None)
+        elif index is None and offset + limit <= len(movies) // TOP_K_FRACTION:
+            titles = top_titles(movies, key, offset + limit, reverse)[offset:]
+        else:
+            titles = self._index(key).titles_between(offset, offset + limit, reverse)
+        for title in titles:
+            yield title, movies[title]
+
+    def query_movies(self, query):
+        """
+        Check only the candidates inside the narrowest rating or year
+        range the query implies, read from its index. A limited query
+        sorted by rating or year instead walks that field's index in
+        order, and stops early, when its range is at most
+        ORDERED_SCAN_FACTOR times wider. Only indexes that are already
+        built are used: building one costs far more than one scan.
+        """
+        movies = self.get_movies()
+        ranges = query.ranges
+        spans = {}
+        for field, (low, high) in ranges.items():
+            if field in self._indexes:
+                start, stop = self._indexes[field].bounds(low, high)
+                spans[field] = stop - start
+        narrowest = min(spans, key=spans.get, default=None)
+        key = query.sort
+        ordered = False
+        if key in self._indexes:
+            span = spans.get(key, len(movies))
+            factor = 1 if query.limit is None else ORDERED_SCAN_FACTOR
+            ordered = narrowest is None or span <= spans[narrowest] * factor
+        if ordered:
+            low, high = ranges.get(key, (None, None))
+            titles = self._index(key).titles(low, high, query.reverse)
+        elif narrowest is not None:
+            titles = self._index(narrowest).titles(*ranges[narrowest])
+        else:
+            yield from super().query_movies(query)
+            return
+        for title, rating, year in query.finish(self._rows(movies, titles), ordered):
+            yield title, {"rating": rating, "year": year}
+
+    @staticmethod
+    def _rows(movies, titles):
+        """Yield the (title, rating, year) rows of the given titles."""
+        for title in titles:
+            info = movies[title]
+            yield title, info['rating'], info['year']
+
+    def rating_stats(self):
+        """Return the rating statistics from the running aggregates in O(1)."""
+        self.get_movies()
+        return self._rating_stats().summary()
+
+
+def open_store(path, journal=False):
+    """
+    Returns the storage backend for a data file: SQLite for
+    SQLITE_SUFFIXES, a memory-mapped binary snapshot for
+    SNAPSHOT_SUFFIXES, a directory of hash-partitioned shards
+    for SHARDED_SUFFIXES, the JSON MovieStore otherwise.
+    """
+    if path.lower().rstrip("/").endswith(SHARDED_SUFFIXES):
+        from sharded_storage import ShardedStore
+        return ShardedStore(path.rstrip("/"), journal=journal)
+    if path.lower().endswith(SQLITE_SUFFIXES):
+        from sqlite_storage import SqliteStore
+        return SqliteStore(path)
+    if path.lower().endswith(SNAPSHOT_SUFFIXES):
+        from snapshot import SnapshotStore
+        return SnapshotStore(path, journal=journal)
+    return MovieStore(path, journal=journal)
+
+
+def convert(src, dst):
+    """
+    Copies every movie from one data file to another, picking
+    each backend from the file extension (JSON, binary snapshot,
+    SQLite or a sharded directory). Returns the number of movies
+    copied.
+    """
+    movies = open_store(src).get_movies()
+    open_store(dst).save_movies(movies)
+    return len(movies)
+
+
+_store = None
+_store_config = None
+
+
+def get_store():
+    """
+    Returns the shared storage backend for DATA_FILE.
+
+    A new backend is opened whenever DATA_FILE or JOURNAL_MODE
+    is changed, so the module-level functions always follow them.
+    """
+    global _store, _store_config
+    config = (DATA_FILE, JOURNAL_MODE)
+    if _store is None or _store_config != config:
+        _store = open_store(DATA_FILE, journal=JOURNAL_MODE)
+        _store_config = config
+    return _store
+
 
 def get_movies():
     """
     Returns a dictionary of dictionaries that
     contains the movies information in the database.
 
-    The function loads the information from the JSON
-    file and returns the data.
+    The data is loaded from the JSON file once and then
+    served from memory until the file changes on disk.
+    The returned dictionary must not be modified directly.
 
     For example, the function may return:
     {
@@ -24,55 +1005,171 @@ def get_movies():
       },
     }
     """
-    if not os.path.exists(DATA_FILE):
-        # Initialize an empty database if none exists
-        return {}
-    with open(DATA_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return get_store().get_movies()
+
+
+def get_movie(title):
+    """
+    Returns the {"rating": ..., "year": ...} dictionary
+    of one movie, or None if it is not in the database.
+    """
+    return get_store().get_movie(title)
 
 
 def save_movies(movies):
     """
     Gets all your movies as an argument and saves them to the JSON file.
     """
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(movies, f, indent=4, ensure_ascii=False)
+    get_store().save_movies(movies)
 
 
 def add_movie(title, year, rating):
     """
     Adds a movie to the movies database.
-    Loads the information from the JSON file, adds the movie,
-    and saves it. The function doesn't need to validate the input.
+    Updates the cached movies and saves them (or appends
+    the change to the journal in journal mode).
+    The function doesn't need to validate the input.
     """
-    movies = get_movies()
-    movies[title] = {
-        "rating": rating,
-        "year": year
-    }
-    save_movies(movies)
+    get_store().add_movie(title, year, rating)
 
 
 def delete_movie(title):
     """
     Deletes a movie from the movies database.
-    Loads the information from the JSON file, deletes the movie,
-    and saves it. The function doesn't need to validate the input.
+    Updates the cached movies and saves them (or appends
+    the change to the journal in journal mode).
+    The function doesn't need to validate the input.
     """
-    movies = get_movies()
-    if title not in movies:
-        raise KeyError(f"Movie '{title}' does not exist.")
-    del movies[title]
-    save_movies(movies)
+    get_store().delete_movie(title)
 
 
 def update_movie(title, rating):
     """
     Updates a movie from the movies database.
-    Loads the information from the JSON file, updates the movie,
-    and saves it. The function doesn't need to validate the input.
+    Updates the cached movies and saves them (or appends
+    the change to the journal in journal mode).
+    The function doesn't need to validate the input.
+    """
+    get_store().update_movie(title, rating)
+
+
+def filter_movies(min_rating=None, start_year=None, end_year=None):
+    """
+    Returns an iterator of (title, info) pairs for the movies
+    rated at least min_rating and released between start_year
+    and end_year (inclusive). None means "no bound".
+    """
+    return get_store().filter_movies(min_rating, start_year, end_year)
+
+
+def sorted_movies(key, reverse=False, limit=None, offset=0):
+    """
+    Returns an iterator of (title, info) pairs ordered
+    by key, which is either "rating" or "year".
+    limit and offset select one page: asking for the top
+    few movies does not sort the whole catalog.
+    """
+    return get_store().sorted_movies(key, reverse, limit, offset)
+
+
+def query_movies(query):
+    """
+    Returns an iterator of (title, info) pairs selected by a
+    compiled movie_query.Query, using the indexes (or SQL) of
+    the backend to avoid checking every movie.
+    """
+    return get_store().query_movies(query)
+
+
+def catalog_version():
+    """
+    Returns the catalog's version: the number of the last change
+    recorded in its change feed, increasing by one per change.
+    """
+    return get_store().catalog_version()
+
+
+def changes_since(version):
+    """
+    Returns the changes made after version, oldest first, so
+    a consumer (an index, a cache, a replica) can catch up in
+    O(changes):
+
+        for change in movie_storage.changes_since(seen):
+            ...  # change["op"], ["title"], ["old"], ["new"]
+            seen = change["version"]
+
+    An "op": "reset" change means the whole catalog was replaced.
+    Raises ChangeFeedGap when the feed no longer reaches back to
+    version; the consumer then has to reload everything.
+    """
+    return get_store().changes_since(version)
+
+
+def iter_movies():
+    """
+    Returns an iterator of (title, info) pairs over all movies,
+    streamed from the backend instead of building a new dictionary.
+    """
+    return get_store().iter_movies()
+
+
+def batch():
+    """
+    Context manager grouping mutations into one load and one write:
+
+        with movie_storage.batch():
+            movie_storage.add_movie("Alien", 1979, 8.5)
+            movie_storage.update_movie("Titanic", 7.9)
+    """
+    return get_store().batch()
+
+
+def add_movies(movies):
+    """
+    Adds many movies, given as (title, year, rating) tuples,
+    with a single write to the database.
+    """
+    get_store().add_movies(movies)
+
+
+def update_ratings(ratings):
+    """
+    Updates the ratings of many movies from a {title: rating}
+    mapping with a single write. Unknown titles are ignored.
+    """
+    get_store().update_ratings(ratings)
+
+
+def delete_movies(titles):
+    """
+    Deletes many movies with a single write.
+    Raises KeyError (and writes nothing) if a title is missing.
+    """
+    get_store().delete_movies(titles)
+
+
+def search_movies(term, limit=5, score_cutoff=50):
+    """
+    Returns up to limit (title, score) pairs of the titles most
+    similar to term, best first, scoring at least score_cutoff.
+    """
+    return get_store().search_movies(term, limit, score_cutoff)
+
+
+def batch_search_movies(terms, limit=5, score_cutoff=50):
+    """
+    Fuzzy-matches many terms against the catalog in one parallel
+    pass. Returns a list holding, for each term, up to limit
+    (title, score) pairs scoring at least score_cutoff.
+    """
+    return get_store().batch_search_movies(terms, limit, score_cutoff)
+
+
+def rating_stats():
+    """
+    Returns a dictionary with the number of movies and the
+    average and median rating, plus the titles of the best
+    and worst rated movies (None values when there are none).
     """
-    movies = get_movies()
-    if title in movies:
-        movies[title]["rating"] = rating
-        save_movies(movies)
+    return get_store().rating_stats()
@@ -1,48 +1,64 @@
-import random
-import matplotlib.pyplot as plt
-from colorama import Fore, init
-from rapidfuzz import process, fuzz
+import sys
+import cli
+import instrument
 import movie_storage
+import queries
+import render
+from histogram import save_rating_histogram
+from movie_query import compile_query
+from render import Fore
+from validation import parse_rating, parse_title, parse_year
 
-# Initialize colorama for colored terminal output
-init(autoreset=True)
+
+def ask(prompt_msg):
+    """input() whose waiting time the profiler keeps out of the action's work."""
+    with instrument.phase("input"):
+        return input(prompt_msg)
 
 
 def prompt_title(prompt_msg):
     """Prompt until the user provides a non-empty movie title."""
     while True:
-        s = input(Fore.MAGENTA + prompt_msg).strip()
-        if s:
-            return s
-        print(Fore.RED + "⚠️ Title cannot be empty.")
+        try:
+            return parse_title(ask(Fore.MAGENTA + prompt_msg))
+        except ValueError as e:
+            print(Fore.RED + f"⚠️ {e}")
 
 
 def prompt_rating():
     """Prompt until a valid float between 0.0 and 10.0 is entered."""
     while True:
-        s = input(Fore.MAGENTA + "Enter rating (0.0–10.0): ").strip()
         try:
-            r = float(s)
-            if 0.0 <= r <= 10.0:
-                return r
-            print(Fore.RED + "⚠️ Rating must be between 0.0 and 10.0.")
-        except ValueError:
-            print(Fore.RED + "⚠️ Invalid rating format.")
+            return parse_rating(ask(Fore.MAGENTA + "Enter rating (0.0–10.0): "))
+        except ValueError as e:
+            print(Fore.RED + f"⚠️ {e}")
 
 
 def prompt_year():
     """Prompt until a valid four-digit year is entered."""
     while True:
-        s = input(Fore.MAGENTA + "Enter release year (YYYY): ").strip()
-        if s.isdigit() and len(s) == 4:
-            return int(s)
-        print(Fore.RED + "⚠️ Year must be a four-digit number.")
+        try:
+            return parse_year(ask(Fore.MAGENTA + "Enter release year (YYYY): "))
+        except ValueError as e:
+            print(Fore.RED + f"⚠️ {e}")
+
+
+def prompt_optional(prompt_msg, parse):
+    """Prompt until the input is blank (None) or accepted by parse."""
+    while True:
+        s = ask(Fore.MAGENTA + prompt_msg).strip()
+        if not s:
+            return None
+        try:
+            return parse(s)
+        except ValueError as e:
+            print(Fore.RED + f"⚠️ {e}")
 
 
 def prompt_choice():
     """Prompt until the user selects a valid menu choice (0-11)."""
     while True:
-        s = input(Fore.MAGENTA + "Enter choice (0-11): ").strip()
+        s = ask(Fore.MAGENTA + "Enter choice (0-11): ").strip()
         try:
             c = int(s)
             if 0 <= c <= 11:
@@ -76,11 +92,9 @@ def display_menu():
 
 def list_movies():
     """List all movies with their year and rating."""
-    movies = movie_storage.get_movies()
-    print(Fore.CYAN + f"\n{len(movies)} movies in total")
-    for mov_title, info in movies.items():
-        print(Fore.GREEN + f"{mov_title} ({info['year']}): {info['rating']}")
-    input(Fore.MAGENTA + "\nPress enter to continue")
+    print(Fore.CYAN + f"\n{queries.count()} movies in total")
+    render.pager(queries.iter_all(), ask)
+    ask(Fore.MAGENTA + "\nPress enter to continue")
 
 
 def add_movie():
@@ -93,7 +107,7 @@ def add_movie():
         print(Fore.GREEN + f"{title_str} ({year_val}) added with rating {rating_val}!")
     except ValueError as e:
         print(Fore.RED + str(e))
-    input(Fore.MAGENTA + "\nPress enter to continue")
+    ask(Fore.MAGENTA + "\nPress enter to continue")
 
 
 def delete_movie():
@@ -104,7 +118,7 @@ def delete_movie():
         print(Fore.GREEN + f"{title_str} successfully deleted.")
     except KeyError:
         print(Fore.RED + f"Movie '{title_str}' not found.")
-    input(Fore.MAGENTA + "\nPress enter to continue")
+    ask(Fore.MAGENTA + "\nPress enter to continue")
 
 
 def update_movie():
@@ -116,158 +130,105 @@ def update_movie():
         print(Fore.GREEN + f"{title_str} rating updated to {rating_val}.")
     except KeyError:
         print(Fore.RED + f"Movie '{title_str}' not found.")
-    input(Fore.MAGENTA + "\nPress enter to continue")
+    ask(Fore.MAGENTA + "\nPress enter to continue")
 
 
 def stats():
     """Display average, median, best and worst movie statistics."""
-    movies = movie_storage.get_movies()
-    ratings = [info['rating'] for info in movies.values()]
-    if not ratings:
+    summary = queries.stats()
+    if not summary["count"]:
         print(Fore.RED + "No movies in the database.")
     else:
-        avg = sum(ratings) / len(ratings)
-        median = sorted(ratings)[len(ratings)//2]
-        best = max(movies, key=lambda t: movies[t]['rating'])
-        worst = min(movies, key=lambda t: movies[t]['rating'])
-        print(Fore.CYAN + f"\nAverage Rating: {avg:.1f}")
-        print(Fore.CYAN + f"Median Rating : {median:.1f}")
-        print(Fore.GREEN + f"Best Movie    : {best} ({movies[best]['year']}) — {movies[best]['rating']}")
-        print(Fore.RED + f"Worst Movie   : {worst} ({movies[worst]['year']}) — {movies[worst]['rating']}")
-    input(Fore.MAGENTA + "\nPress enter to continue")
+        with instrument.phase("render"):
+            print(Fore.CYAN + f"\nAverage Rating: {summary['average']:.1f}")
+            print(Fore.CYAN + f"Median Rating : {summary['median']:.1f}")
+            print(Fore.GREEN + "Best Movie    : " + render.movie_line(*summary["best"], " —"))
+            print(Fore.RED + "Worst Movie   : " + render.movie_line(*summary["worst"], " —"))
+    ask(Fore.MAGENTA + "\nPress enter to continue")
 
 
 def random_movie():
     """Pick and display a random movie."""
-    movies = movie_storage.get_movies()
-    if movies:
-        movie_title = random.choice(list(movies))
-        info = movies[movie_title]
-        print(Fore.GREEN + f"Your movie for tonight: {movie_title} ({info['year']}) — {info['rating']}")
-    input(Fore.MAGENTA + "\nPress enter to continue")
+    movie = queries.random_movie()
+    if movie:
+        print(Fore.GREEN + "Your movie for tonight: " + render.movie_line(*movie, " —"))
+    ask(Fore.MAGENTA + "\nPress enter to continue")
 
 
 def search_movie():
     """Search for movies by fuzzy matching; prompts until non-empty term."""
     term = prompt_title("Enter part of movie name to search: ")
-    movies = movie_storage.get_movies()
-    if term in movies:
-        info = movies[term]
-        print(Fore.GREEN + f"Found: {term} ({info['year']}) — {info['rating']}")
+    exact, matches = queries.search(term, limit=5, score_cutoff=50)
+    if exact:
+        print(Fore.GREEN + "Found: " + render.movie_line(term, matches[0][1], " —"))
+    elif matches:
+        print(Fore.YELLOW + "\nNo exact match. Did you mean:")
+        render.movies(((m, info) for m, info, _ in matches), Fore.CYAN, " —")
     else:
-        matches = process.extract(term, movies.keys(), scorer=fuzz.ratio, limit=5)
-        suggestions = [match for match, score, _ in matches  if score >= 50]
-        if suggestions:
-            print(Fore.YELLOW + "\nNo exact match. Did you mean:")
-            for m in suggestions:
-                info = movies[m]
-                print(Fore.CYAN + f" {m} ({info['year']}) — {info['rating']}")
-        else:
-            print(Fore.RED + "No similar movies found.")
-    input(Fore.MAGENTA + "\nPress enter to continue")
+        print(Fore.RED + "No similar movies found.")
+    ask(Fore.MAGENTA + "\nPress enter to continue")
 
 
 def sort_movies_by_rating():
     """Show movies sorted by descending rating."""
-    movies = movie_storage.get_movies()
-    sorted_list = sorted(movies.items(), key=lambda x: x[1]['rating'], reverse=True)
     print(Fore.CYAN + "\nMovies sorted by rating:")
-    for t, info in sorted_list:
-        print(Fore.GREEN + f"{t} ({info['year']}) — {info['rating']}")
-    input(Fore.MAGENTA + "\nPress enter to continue")
+    render.pager(queries.iter_sorted_paged('rating', reverse=True, page_size=render.PAGE_ROWS),
+                 ask, separator=" —")
+    ask(Fore.MAGENTA + "\nPress enter to continue")
 
 
 def sort_movies_by_year():
     """Show movies sorted by release year, asking latest-first or oldest-first."""
-    movies = movie_storage.get_movies()
     while True:
-        ans = input(Fore.MAGENTA + "Show latest movies first? (y/n): ").strip().lower()
+        ans = ask(Fore.MAGENTA + "Show latest movies first? (y/n): ").strip().lower()
         if ans in ('y', 'n'):
             break
         print(Fore.RED + "⚠️ Please enter 'y' or 'n'.")
     reverse = ans == 'y'
-    sorted_list = sorted(movies.items(), key=lambda x: x[1]['year'], reverse=reverse)
     order_desc = "latest first" if reverse else "oldest first"
     print(Fore.CYAN + f"\nMovies sorted by year ({order_desc}):")
-    for t, info in sorted_list:
-        print(Fore.GREEN + f"{t} ({info['year']}) — {info['rating']}")
-    input(Fore.MAGENTA + "\nPress enter to continue")
+    render.pager(queries.iter_sorted_paged('year', reverse=reverse, page_size=render.PAGE_ROWS),
+                 ask, separator=" —")
+    ask(Fore.MAGENTA + "\nPress enter to continue")
 
 
 def filter_movies():
-    """Filter movies by minimum rating, start year and end year."""
-    movies = movie_storage.get_movies()
+    """Filter movies by a query expression, or by minimum rating, start year and end year."""
+    query = prompt_optional('Enter a query, e.g. rating>=8 and title~"war" sort year desc '
+                            '(leave blank to enter the criteria one by one): ', compile_query)
+    if query is not None:
+        print(Fore.CYAN + "\nFiltered Movies:")
+        if not render.pager(movie_storage.query_movies(query), ask):
+            print(Fore.YELLOW + "No movies match the query.")
+        ask(Fore.MAGENTA + "\nPress enter to continue")
+        return
     # Prompt for criteria
-    while True:
-        input_rating = input(Fore.MAGENTA + "Enter minimum rating (leave blank for no minimum): ").strip()
-        if not input_rating:
-            min_rating = None
-            break
-        try:
-            val = float(input_rating)
-            if 0.0 <= val <= 10.0:
-                min_rating = val
-                break
-            print(Fore.RED + "⚠️ Rating must be between 0.0 and 10.0.")
-        except ValueError:
-            print(Fore.RED + "⚠️ Invalid rating format.")
-    while True:
-        input_start_year = input(Fore.MAGENTA + "Enter start year (leave blank for no start year): ").strip()
-        if not input_start_year:
-            start_year = None
-            break
-        if input_start_year.isdigit() and len(input_start_year) == 4:
-            start_year = int(input_start_year)
-            break
-        print(Fore.RED + "⚠️ Year must be a four-digit number.")
-    while True:
-        input_end_year = input(Fore.MAGENTA + "Enter end year (leave blank for no end year): ").strip()
-        if not input_end_year:
-            end_year = None
-            break
-        if input_end_year.isdigit() and len(input_end_year) == 4:
-            end_year = int(input_end_year)
-            break
-        print(Fore.RED + "⚠️ Year must be a four-digit number.")
-    # Filter logic
-    filtered = []
-    for movie_title, info in movies.items():
-        movie_rating, movie_year = info['rating'], info['year']
-        if min_rating is not None and movie_rating < min_rating:
-            continue
-        if start_year is not None and movie_year < start_year:
-            continue
-        if end_year is not None and movie_year > end_year:
-            continue
-        filtered.append((movie_title, movie_year, movie_rating))
-    # Display results
+    min_rating = prompt_optional("Enter minimum rating (leave blank for no minimum): ", parse_rating)
+    start_year = prompt_optional("Enter start year (leave blank for no start year): ", parse_year)
+    end_year = prompt_optional("Enter end year (leave blank for no end year): ", parse_year)
+    # Filtering runs in the storage backend; results stream as they are found
     print(Fore.CYAN + "\nFiltered Movies:")
-    if filtered:
-        for movie_title, movie_year, movie_rating in filtered:
-            print(Fore.GREEN + f"{movie_title} ({movie_year}): {movie_rating}")
-    else:
+    if not render.pager(queries.iter_filtered(min_rating, start_year, end_year), ask):
         print(Fore.YELLOW + "No movies match the criteria.")
-    input(Fore.MAGENTA + "\nPress enter to continue")
+    ask(Fore.MAGENTA + "\nPress enter to continue")
 
 
 def create_rating_histogram():
     """Generate and save a histogram of movie ratings; prompts until filename provided."""
-    movies = movie_storage.get_movies()
-    ratings = [info['rating'] for info in movies.values()]
+    ratings = list(queries.iter_ratings())
     filename = prompt_title("Enter filename for histogram (e.g., ratings.png): ")
-    plt.figure(figsize=(10, 8))
-    plt.hist(ratings, bins=20, edgecolor='black', alpha=0.7)
-    plt.title("Movie Ratings Histogram")
-    plt.xlabel("Rating")
-    plt.ylabel("Frequency")
-    plt.grid(True)
-    plt.savefig(filename)
-    print(Fore.GREEN + f"Histogram saved to {filename}")
-    input(Fore.MAGENTA + "\nPress enter to continue")
+    if save_rating_histogram(ratings, filename):
+        print(Fore.GREEN + f"Histogram saved to {filename}")
+    else:
+        print(Fore.GREEN + f"Histogram in {filename} is already up to date")
+    ask(Fore.MAGENTA + "\nPress enter to continue")
 
 
 def main():
     """Main loop handling user interaction and menu navigation."""
+    from colorama import init
+    # Initialize colorama for colored terminal output
+    init(autoreset=True)
     while True:
         title()
         display_menu()
@@ -275,29 +236,26 @@ def main():
         if choice == 0:
             print(Fore.CYAN + "Bye!")
             break
-        elif choice == 1:
-            list_movies()
-        elif choice == 2:
-            add_movie()
-        elif choice == 3:
-            delete_movie()
-        elif choice == 4:
-            update_movie()
-        elif choice == 5:
-            stats()
-        elif choice == 6:
-            random_movie()
-        elif choice == 7:
-            search_movie()
-        elif choice == 8:
-            sort_movies_by_rating()
-        elif choice == 9:
-            create_rating_histogram()
-        elif choice == 10:
-            sort_movies_by_year()
-        elif choice == 11:
-            filter_movies()
+        action = MENU_ACTIONS[choice]
+        with instrument.action(action.__name__):
+            action()
+
+
+# Menu choice -> action; the function name labels the action when profiling
+MENU_ACTIONS = {
+    1: list_movies,
+    2: add_movie,
+    3: delete_movie,
+    4: update_movie,
+    5: stats,
+    6: random_movie,
+    7: search_movie,
+    8: sort_movies_by_rating,
+    9: create_rating_histogram,
+    10: sort_movies_by_year,
+    11: filter_movies,
+}
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(cli.run(interactive=main))
@@ -0,0 +1,91 @@
+"""
+Pure query functions behind the menu and the CLI.
+
+They only read from movie_storage and return data (mostly lazy
+iterators of (title, info) pairs), never print, so they can be
+reused, tested and timed without a terminal. Rendering lives in
+render.py.
+"""
+import random
+from itertools import count as counter, islice
+
+import movie_storage
+
+
+def count():
+    """Number of movies in the database."""
+    return len(movie_storage.get_movies())
+
+
+def page(pairs, limit=None, offset=0):
+    """Skip offset items of an iterator and stop after limit (None: no limit)."""
+    return islice(pairs, offset, None if limit is None else offset + limit)
+
+
+def iter_all(limit=None, offset=0):
+    """Iterate (title, info) pairs over every movie."""
+    return page(movie_storage.iter_movies(), limit, offset)
+
+
+def iter_filtered(min_rating=None, start_year=None, end_year=None, limit=None, offset=0):
+    """Iterate the movies rated at least min_rating and released in [start_year, end_year]."""
+    return page(movie_storage.filter_movies(min_rating, start_year, end_year), limit, offset)
+
+
+def iter_sorted(key, reverse=False, limit=None, offset=0):
+    """
+    Iterate the movies ordered by "rating" or "year". With a limit
+    this is a top-k query that does not sort the whole catalog.
+    """
+    return movie_storage.sorted_movies(key, reverse, limit, offset)
+
+
+def iter_sorted_paged(key, reverse=False, page_size=20):
+    """
+    Iterate all movies in sorted order, fetched one top-k page at a
+    time, so the first rows arrive long before a full sort would end.
+    """
+    for offset in counter(0, page_size):
+        rows = list(movie_storage.sorted_movies(key, reverse, page_size, offset))
+        yield from rows
+        if len(rows) < page_size:
+            return
+
+
+def iter_ratings():
+    """Iterate the rating of every movie."""
+    return (info['rating'] for _, info in movie_storage.iter_movies())
+
+
+def random_movie():
+    """Return a random (title, info) pair, or None when there are no movies."""
+    movies = movie_storage.get_movies()
+    if not movies:
+        return None
+    title = movies.title_at(random.randrange(len(movies)))
+    return title, movies[title]
+
+
+def stats():
+    """
+    Return the rating statistics from movie_storage.rating_stats(),
+    with the (title, info) pairs of the best and worst movies.
+    """
+    summary = dict(movie_storage.rating_stats())
+    for key in ("best", "worst"):
+        if summary[key] is not None:
+            summary[key] = (summary[key], movie_storage.get_movie(summary[key]))
+    return summary
+
+
+def search(term, limit=5, score_cutoff=50):
+    """
+    Return (exact, matches) for a title search: the exact movie if
+    there is one, otherwise up to limit fuzzy matches. matches is a
+    list of (title, info, score) tuples, best first.
+    """
+    info = movie_storage.get_movie(term)
+    if info is not None:
+        return True, [(term, info, 100.0)]
+    return False, [(title, movie_storage.get_movie(title), score)
+                   for title, score in movie_storage.search_movies(term, limit, score_cutoff)]
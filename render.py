@@ -0,0 +1,76 @@
+"""
+Console rendering for the interactive menu and the CLI.
+
+Rows are formatted and written in chunks of CHUNK_ROWS lines with a
+single write() per chunk, instead of one print() per movie, so a
+listing of 100k movies streams out at the speed of the terminal. The
+colour is emitted once per chunk (colorama's autoreset resets it after
+every write).
+"""
+import json
+import sys
+from itertools import islice
+
+import instrument
+
+CHUNK_ROWS = 1000
+# Rows per page in the interactive pager
+PAGE_ROWS = 20
+
+
+class _LazyFore:
+    """Stands in for colorama.Fore so scripted subcommands never import colorama."""
+
+    def __getattr__(self, name):
+        from colorama import Fore as fore
+        return getattr(fore, name)
+
+
+Fore = _LazyFore()
+
+
+def movie_line(title, info, separator=":"):
+    """Format one movie as "Title (year): rating" (or with another separator)."""
+    return f"{title} ({info['year']}){separator} {info['rating']}"
+
+
+def write_lines(lines, color="", out=None):
+    """Write an iterable of lines in buffered chunks; return how many were written."""
+    out = out or sys.stdout
+    written = 0
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, CHUNK_ROWS))
+        if not chunk:
+            return written
+        with instrument.phase("render"):
+            out.write(color + "\n".join(chunk) + "\n")
+        written += len(chunk)
+
+
+def movies(pairs, color=None, separator=":", out=None):
+    """Stream (title, info) pairs as one coloured line per movie."""
+    color = Fore.GREEN if color is None else color
+    return write_lines((movie_line(title, info, separator) for title, info in pairs), color, out)
+
+
+def pager(pairs, ask, color=None, separator=":", page_rows=PAGE_ROWS):
+    """
+    Show (title, info) pairs one page at a time, asking through
+    ask(prompt) before each further page; answering "q" stops.
+    Returns the number of movies shown.
+    """
+    pairs = iter(pairs)
+    shown = 0
+    rows = list(islice(pairs, page_rows))
+    while rows:
+        shown += movies(rows, color, separator)
+        rows = list(islice(pairs, page_rows))
+        if rows and ask(Fore.MAGENTA + f"-- {shown} shown; Enter for more, q to stop: ").strip().lower() == "q":
+            break
+    return shown
+
+
+def json_lines(records, out=None):
+    """Stream dictionaries as JSON Lines."""
+    return write_lines((json.dumps(record, ensure_ascii=False) for record in records), out=out)
@@ -0,0 +1,151 @@
+"""Trigram-pruned fuzzy title search on top of rapidfuzz."""
+from array import array
+from collections import Counter
+
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+# Score threshold below which a title is not suggested
+SCORE_CUTOFF = 50
+# Trigrams shared by more titles than this are too common to prune with
+MAX_POSTING = 20_000
+# Past this many posting entries, scoring every title directly is cheaper
+MAX_POSTING_TOTAL = 60_000
+# At most this many best-overlapping titles are scored by rapidfuzz
+MAX_CANDIDATES = 5_000
+# Upper bound on score matrix cells per cdist call in batch_search (float32)
+CDIST_CELLS = 16_000_000
+
+
+def normalize(title):
+    """Lowercase and strip punctuation and extra whitespace."""
+    return " ".join(default_process(title).split())
+
+
+def trigrams(text):
+    """Return the set of padded character trigrams of normalized text."""
+    padded = f"  {text} "
+    return set(map("".join, zip(padded, padded[1:], padded[2:])))
+
+
+class TitleSearchIndex:
+    """
+    Normalized titles plus a trigram inverted index over them.
+
+    A query is first matched against the trigram postings to find
+    the titles sharing the most trigrams with it, and only those
+    candidates are scored with fuzz.ratio. Queries whose trigrams
+    are all very common skip the pruning and score every title.
+
+    Titles are added and removed incrementally as the catalog
+    changes. Postings are append-only arrays of ids (compact, and
+    invisible to the garbage collector); a removed title only
+    leaves a stale id behind, which is skipped when read and
+    dropped when the index is rebuilt after enough removals.
+    """
+
+    def __init__(self, titles=()):
+        self._titles = []      # id -> original title (None once removed)
+        self._normalized = []  # id -> normalized title (None once removed)
+        self._ids = {}         # original title -> live id
+        self._postings = {}    # trigram -> array of ids, possibly stale
+        for title in titles:
+            self.add(title)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, title):
+        """Index a title (no-op if it is already indexed)."""
+        if title in self._ids:
+            return
+        title_id = len(self._titles)
+        text = normalize(title)
+        self._titles.append(title)
+        self._normalized.append(text)
+        self._ids[title] = title_id
+        postings = self._postings
+        for gram in trigrams(text):
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = array("I", (title_id,))
+            else:
+                posting.append(title_id)
+
+    def remove(self, title):
+        """Drop a title from the index (no-op if it is not indexed)."""
+        title_id = self._ids.pop(title, None)
+        if title_id is None:
+            return
+        self._normalized[title_id] = None
+        self._titles[title_id] = None
+        if len(self._titles) > 2 * len(self._ids) + 1000:
+            self._rebuild()
+
+    def _rebuild(self):
+        """Reindex the live titles, dropping stale ids from the postings."""
+        titles = list(self._ids)
+        self.__init__(titles)
+
+    def _candidates(self, text, score_cutoff):
+        """
+        Return {id: normalized title} for the titles worth scoring,
+        or the whole id-indexed list when pruning would not pay off
+        (rapidfuzz skips the None left by removed titles).
+        """
+        postings = [self._postings[gram] for gram in trigrams(text) if gram in self._postings]
+        rare = [p for p in postings if len(p) <= MAX_POSTING]
+        if len(text) < 3 or not rare or sum(map(len, rare)) > MAX_POSTING_TOTAL:
+            return self._normalized
+        overlap = Counter()
+        for posting in rare:
+            overlap.update(posting)
+        # fuzz.ratio can only reach the cutoff if the lengths are close enough
+        ratio = score_cutoff / (200 - score_cutoff)
+        min_len, max_len = len(text) * ratio, len(text) / ratio if ratio else float("inf")
+        candidates = {}
+        normalized = self._normalized
+        for title_id, _ in overlap.most_common():
+            candidate = normalized[title_id]
+            if candidate is not None and min_len <= len(candidate) <= max_len:
+                candidates[title_id] = candidate
+                if len(candidates) >= MAX_CANDIDATES:
+                    break
+        return candidates
+
+    def search(self, term, limit=5, score_cutoff=SCORE_CUTOFF):
+        """Return up to limit (title, score) pairs scoring at least score_cutoff."""
+        text = normalize(term)
+        matches = process.extract(text, self._candidates(text, score_cutoff), scorer=fuzz.ratio,
+                                  processor=None, limit=limit, score_cutoff=score_cutoff)
+        return [(self._titles[title_id], score) for _, score, title_id in matches]
+
+    def batch_search(self, terms, limit=5, score_cutoff=SCORE_CUTOFF, workers=-1):
+        """
+        Score many terms against every title at once with
+        rapidfuzz.process.cdist, spread over all cores by default.
+        Returns one list of (title, score) pairs per term, as search().
+
+        Terms are processed in chunks so the score matrix stays
+        within CDIST_CELLS cells however large the catalog is.
+        """
+        import numpy as np
+
+        live = [title_id for title_id, text in enumerate(self._normalized) if text is not None]
+        choices = [self._normalized[title_id] for title_id in live]
+        queries = [normalize(term) for term in terms]
+        results = []
+        if not choices:
+            return [[] for _ in queries]
+        k = min(limit, len(choices))
+        chunk = max(1, CDIST_CELLS // len(choices))
+        for start in range(0, len(queries), chunk):
+            scores = process.cdist(queries[start:start + chunk], choices, scorer=fuzz.ratio,
+                                   processor=None, score_cutoff=score_cutoff,
+                                   dtype=np.float32, workers=workers)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for row, columns in zip(scores, top):
+                ranked = sorted(columns, key=lambda c: row[c], reverse=True)
+                results.append([(self._titles[live[c]], float(row[c]))
+                                for c in ranked if row[c] >= score_cutoff])
+        return results
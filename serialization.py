@@ -0,0 +1,210 @@
+"""
+Reading and writing JSON data files.
+
+The layout is one object mapping each title to {"rating", "year"}.
+It is written compact by default (no whitespace, for machine use) or,
+with STYLE = "pretty", indented by four spaces for editing by hand;
+either style can be read back. Unless CODEC names one, files are
+encoded with the fastest codec installed (orjson, then msgspec, then
+the standard json module) and decoded with msgspec or, by default,
+json: orjson can only decode into one dictionary per movie, while
+the other two decode straight into compact rows. A data file ending
+in ".gz" is gzip-compressed and one ending in ".zst"
+zstandard-compressed (needs the zstandard package).
+
+Files are written in chunks of WRITE_CHUNK_ROWS movies, so saving
+only ever holds a few hundred movies' worth of dictionaries.
+"""
+import gzip
+import json
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from json.encoder import encode_basestring
+
+from catalog import MovieCatalog
+
+# "compact" or "pretty"
+STYLE = "compact"
+STYLES = ("compact", "pretty")
+# "auto" (the best one installed), "orjson", "msgspec" or "json"
+CODEC = "auto"
+CODECS = ("orjson", "msgspec", "json")
+# The codecs "auto" decodes with, best first
+AUTO_DECODERS = ("msgspec", "json")
+# Data file suffixes that select a compression
+COMPRESSIONS = {".gz": "gzip", ".zst": "zstd"}
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+WRITE_CHUNK_ROWS = 256
+
+
+def compression_of(path):
+    """Return "gzip", "zstd" or None for a data file path."""
+    for suffix, compression in COMPRESSIONS.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+
+@lru_cache(maxsize=None)
+def _available(codec):
+    if codec == "json":
+        return True
+    try:
+        __import__(codec)
+    except ImportError:
+        return False
+    return True
+
+
+def codec_name(codec=None, decoding=False):
+    """Resolve a codec name ("auto" or None: CODEC) to an installed codec; ValueError if missing."""
+    codec = codec or CODEC
+    if codec == "auto":
+        return next(name for name in (AUTO_DECODERS if decoding else CODECS) if _available(name))
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec '{codec}', expected one of {', '.join(CODECS)}")
+    if not _available(codec):
+        raise ValueError(f"The {codec} codec is not installed")
+    return codec
+
+
+# --- compression ------------------------------------------------------------
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd-compressed data files need the zstandard package") from None
+    return zstandard
+
+
+def _read_bytes(f, compression):
+    """Read and decompress a whole binary file object."""
+    if compression == "gzip":
+        with gzip.GzipFile(fileobj=f, mode='rb') as stream:
+            return stream.read()
+    if compression == "zstd":
+        with _zstandard().ZstdDecompressor().stream_reader(f, closefd=False) as stream:
+            return stream.read()
+    return f.read()
+
+
+@contextmanager
+def _writer(f, compression):
+    """Yield a binary stream compressing into f (f itself when uncompressed)."""
+    if compression == "gzip":
+        # mtime=0 keeps saves of the same catalog byte-identical
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=GZIP_LEVEL, mtime=0) as stream:
+            yield stream
+    elif compression == "zstd":
+        with _zstandard().ZstdCompressor(level=ZSTD_LEVEL).stream_writer(f, closefd=False) as stream:
+            yield stream
+    else:
+        yield f
+
+
+# --- decoding ---------------------------------------------------------------
+
+def _catalog_pairs_hook(pairs):
+    """
+    json object_pairs_hook turning the inner {"rating", "year"}
+    objects into tuples and the outer object into a MovieCatalog,
+    so no per-movie dictionary is ever built while loading. Other
+    fields of a movie are dropped, as the catalog only keeps these two.
+    """
+    if pairs and isinstance(pairs[0][1], tuple):
+        return MovieCatalog((title, rating, year) for title, (rating, year) in pairs)
+    info = dict(pairs)
+    if "rating" in info and "year" in info:
+        return info["rating"], info["year"]
+    return info
+
+
+@lru_cache(maxsize=None)
+def _msgspec_decoder():
+    """A msgspec decoder straight into {title: movie struct}."""
+    import msgspec
+
+    class Movie(msgspec.Struct):
+        rating: float
+        year: int
+    return msgspec.json.Decoder(dict[str, Movie])
+
+
+def decode(data, codec=None):
+    """Decode the bytes of a JSON data file into a MovieCatalog."""
+    codec = codec_name(codec, decoding=True)
+    if codec == "orjson":
+        import orjson
+        movies = orjson.loads(data)
+        return MovieCatalog((title, info["rating"], info["year"]) for title, info in movies.items())
+    if codec == "msgspec":
+        movies = _msgspec_decoder().decode(data)
+        return MovieCatalog((title, movie.rating, movie.year) for title, movie in movies.items())
+    movies = json.loads(data, object_pairs_hook=_catalog_pairs_hook)
+    # An empty object decodes to a plain empty dictionary
+    return MovieCatalog.from_dict(movies)
+
+
+def read_catalog(f, compression=None, codec=None):
+    """Parse a binary JSON data file object into a MovieCatalog."""
+    return decode(_read_bytes(f, compression), codec)
+
+
+# --- encoding ---------------------------------------------------------------
+
+def _chunks(movies):
+    """Yield lists of up to WRITE_CHUNK_ROWS (title, rating, year) rows."""
+    rows = iter(movies.rows())
+    while True:
+        chunk = list(islice(rows, WRITE_CHUNK_ROWS))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _pretty(chunk):
+    return ",\n".join(f'    {encode_basestring(title)}: {{\n'
+                      f'        "rating": {rating!r},\n'
+                      f'        "year": {year}\n'
+                      f'    }}' for title, rating, year in chunk).encode("utf-8")
+
+
+def _compact(chunk):
+    return ",".join(f'{encode_basestring(title)}:{{"rating":{rating!r},"year":{year}}}'
+                    for title, rating, year in chunk).encode("utf-8")
+
+
+def _encoder(codec):
+    """Return a function encoding a chunk of rows as the members of a compact object."""
+    if codec == "json":
+        return _compact
+    if codec == "orjson":
+        from orjson import dumps
+    else:
+        from msgspec.json import encode as dumps
+    # Both encode non-ASCII titles as UTF-8, like ensure_ascii=False
+    return lambda chunk: dumps({title: {"rating": rating, "year": year} for title, rating, year in chunk})[1:-1]
+
+
+def write_catalog(f, movies, compression=None, style=None, codec=None):
+    """
+    Write a catalog to a binary file object in the given (or the
+    configured) style, chunk by chunk.
+    """
+    style = style or STYLE
+    if style not in STYLES:
+        raise ValueError(f"Unknown style '{style}', expected one of {', '.join(STYLES)}")
+    if style == "pretty":
+        encode, lead, separator, trail = _pretty, b"\n", b",\n", b"\n"
+    else:
+        encode, lead, separator, trail = _encoder(codec_name(codec)), b"", b",", b""
+    with _writer(f, compression) as out:
+        out.write(b"{")
+        wrote = False
+        for chunk in _chunks(movies):
+            out.write((separator if wrote else lead) + encode(chunk))
+            wrote = True
+        out.write(trail + b"}" if wrote else b"}")
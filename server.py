@@ -0,0 +1,356 @@
+"""
+Local HTTP/JSON API over movie_storage, built on asyncio streams.
+
+    GET    /movies                  ?sort=rating|year &order=asc|desc &limit &offset
+    GET    /movies/<title>
+    GET    /search?q=<term>         &limit &cutoff
+    GET    /filter                  ?min_rating &start_year &end_year &limit &offset
+    GET    /query?q=<expression>    (see movie_query.py)
+    GET    /stats
+    GET    /changes?since=<version> (410 once the change feed no longer reaches back,
+                                     501 for a sharded catalog)
+    POST   /movies                  {"title", "year", "rating"}
+    PATCH  /movies/<title>          {"rating"}
+    DELETE /movies/<title>
+
+The catalog stays resident in the process, so reads are answered
+from memory (the store only re-reads data.json if another process
+changed it). Reads run directly on the event loop; mutations are
+queued to a single writer task, which applies everything queued so
+far in one movie_storage.batch(), i.e. one write for a burst of
+concurrent requests. The batch runs in a worker thread: only while
+it changes the cached catalog does it hold the lock reads take, so
+reads go on (already seeing the burst) while it is written to disk.
+Listings return at most DEFAULT_LIMIT movies unless a limit is given.
+
+    python movies.py serve [--host 127.0.0.1] [--port 8765]
+"""
+import asyncio
+import json
+import threading
+from itertools import islice
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import movie_io
+import movie_storage
+import queries
+from movie_query import compile_query
+from validation import parse_rating, parse_title, parse_year
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_LIMIT = 100
+MAX_BODY_BYTES = 1024 * 1024
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           410: "Gone", 413: "Payload Too Large", 500: "Internal Server Error", 501: "Not Implemented"}
+
+
+class HTTPError(Exception):
+    """An error answered with the given status code and message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _param(params, name, parse=None, default=None):
+    """Return one query parameter, converted by parse; HTTPError 400 if invalid."""
+    values = params.get(name)
+    if not values:
+        return default
+    try:
+        return parse(values[0]) if parse else values[0]
+    except ValueError as e:
+        raise HTTPError(400, f"{name}: {e}")
+
+
+def _count(value):
+    """Parse a non-negative integer parameter."""
+    number = int(value)
+    if number < 0:
+        raise ValueError("must not be negative")
+    return number
+
+
+def _field(body, name, *types):
+    """Return a field of a JSON body; HTTPError 400 unless it has one of types (KeyError if missing)."""
+    value = body[name]
+    if isinstance(value, bool) or not isinstance(value, types):
+        raise HTTPError(400, f"{name}: expected {' or '.join(t.__name__ for t in types)}")
+    return value
+
+
+def _records(pairs):
+    return [movie_io.movie_record(title, info) for title, info in pairs]
+
+
+class MovieServer:
+    """Routes requests to queries.py (reads) and the writer task (mutations)."""
+
+    def __init__(self):
+        self._writes = None
+        self._writer = None
+        # Held by reads, and by the writer thread while it changes the cache
+        self._cache_lock = threading.Lock()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Load the catalog, start the writer task and listen; returns the asyncio server."""
+        movie_storage.get_movies()
+        self._writes = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop())
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def close(self):
+        """Stop the writer task."""
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+
+    # --- writes -------------------------------------------------------
+
+    async def _write(self, mutation):
+        """Queue a mutation for the writer task and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        await self._writes.put((mutation, future))
+        return await future
+
+    async def _write_loop(self):
+        """Apply queued mutations in batches, one storage write per batch."""
+        while True:
+            pending = [await self._writes.get()]
+            while not self._writes.empty():
+                pending.append(self._writes.get_nowait())
+            outcomes = await asyncio.to_thread(self._apply, [mutation for mutation, _ in pending])
+            for (_, future), (ok, value) in zip(pending, outcomes):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _apply(self, mutations):
+        """
+        Run mutations in one batch (in the writer thread); return an
+        (ok, result or exception) pair for each.
+        """
+        outcomes = []
+        try:
+            with movie_storage.batch():
+                with self._cache_lock:
+                    for mutation in mutations:
+                        try:
+                            outcomes.append((True, mutation()))
+                        except (KeyError, ValueError) as e:
+                            outcomes.append((False, e))
+                # Leaving the batch writes it, without holding up reads
+        except Exception as e:
+            # Nothing from this batch was written
+            outcomes = [(False, e)] * len(mutations)
+        return outcomes
+
+    # --- routes -------------------------------------------------------
+
+    async def route(self, method, path, params, body):
+        """Return (status, JSON-serializable object) for one request."""
+        parts = [unquote(part) for part in path.strip("/").split("/", 1)]
+        resource = parts[0]
+        title = parts[1] if len(parts) > 1 else None
+        if resource == "movies" and title is None:
+            if method == "GET":
+                return 200, self._read(self.list_movies, params)
+            if method == "POST":
+                return 201, await self.add_movie(body)
+        elif resource == "movies":
+            if method == "GET":
+                return 200, self._read(self.get_movie, title)
+            if method == "PATCH":
+                return 200, await self.update_movie(title, body)
+            if method == "DELETE":
+                return 200, await self.delete_movie(title)
+        elif resource in ("search", "filter", "query", "stats", "changes") and title is None:
+            if method == "GET":
+                return 200, self._read(getattr(self, resource), params)
+        else:
+            raise HTTPError(404, f"No such resource: {path}")
+        raise HTTPError(405, f"{method} is not allowed on {path}")
+
+    def _read(self, handler, *args):
+        """Run a read handler while no mutation is changing the cached catalog."""
+        with self._cache_lock:
+            return handler(*args)
+
+    def list_movies(self, params):
+        limit = _param(params, "limit", _count, DEFAULT_LIMIT)
+        offset = _param(params, "offset", _count, 0)
+        key = _param(params, "sort")
+        if key is None:
+            pairs = queries.iter_all(limit, offset)
+        elif key in ("rating", "year"):
+            order = _param(params, "order", default="desc")
+            pairs = queries.iter_sorted(key, order == "desc", limit, offset)
+        else:
+            raise HTTPError(400, "sort: expected 'rating' or 'year'")
+        return {"total": queries.count(), "movies": _records(pairs)}
+
+    def get_movie(self, title):
+        info = movie_storage.get_movie(title)
+        if info is None:
+            raise HTTPError(404, f"Movie '{title}' does not exist.")
+        return movie_io.movie_record(title, info)
+
+    def search(self, params):
+        term = _param(params, "q", parse_title)
+        if term is None:
+            raise HTTPError(400, "q: a search term is required")
+        exact, matches = queries.search(term, _param(params, "limit", _count, 5),
+                                        _param(params, "cutoff", float, 50))
+        return {"query": term, "exact": exact,
+                "matches": [dict(movie_io.movie_record(t, info), score=round(score, 2))
+                            for t, info, score in matches]}
+
+    def filter(self, params):
+        pairs = queries.iter_filtered(_param(params, "min_rating", parse_rating),
+                                      _param(params, "start_year", parse_year),
+                                      _param(params, "end_year", parse_year),
+                                      _param(params, "limit", _count, DEFAULT_LIMIT),
+                                      _param(params, "offset", _count, 0))
+        return {"movies": _records(pairs)}
+
+    def query(self, params):
+        text = _param(params, "q")
+        if text is None:
+            raise HTTPError(400, "q: a query expression is required")
+        query = compile_query(text)
+        pairs = movie_storage.query_movies(query)
+        if query.limit is None:
+            pairs = islice(pairs, DEFAULT_LIMIT)
+        return {"query": text, "movies": [query.project(title, info) for title, info in pairs]}
+
+    def stats(self, params):
+        return movie_storage.rating_stats()
+
+    def changes(self, params):
+        since = _param(params, "since", _count)
+        if since is None:
+            raise HTTPError(400, "since: a catalog version is required")
+        try:
+            changes = movie_storage.changes_since(since)
+        except movie_storage.ChangeFeedGap as e:
+            raise HTTPError(410, str(e))
+        except movie_storage.ChangeFeedUnavailable as e:
+            raise HTTPError(501, str(e))
+        version = changes[-1]["version"] if changes else since
+        return {"version": version, "changes": changes}
+
+    async def add_movie(self, body):
+        try:
+            title = parse_title(_field(body, "title", str))
+            year = parse_year(_field(body, "year", int, str))
+            rating = parse_rating(_field(body, "rating", int, float, str))
+        except KeyError as e:
+            raise HTTPError(400, f"Missing field {e}")
+        await self._write(lambda: movie_storage.add_movie(title, year, rating))
+        return {"title": title, "year": year, "rating": rating}
+
+    async def update_movie(self, title, body):
+        if "rating" not in body:
+            raise HTTPError(400, "Missing field 'rating'")
+        rating = parse_rating(_field(body, "rating", int, float, str))
+
+        def update():
+            if movie_storage.get_movie(title) is None:
+                raise KeyError(f"Movie '{title}' does not exist.")
+            movie_storage.update_movie(title, rating)
+            return movie_io.movie_record(title, movie_storage.get_movie(title))
+        return await self._write(update)
+
+    async def delete_movie(self, title):
+        await self._write(lambda: movie_storage.delete_movie(title))
+        return {"deleted": title}
+
+    # --- HTTP ---------------------------------------------------------
+
+    async def _read_request(self, reader):
+        """Parse one HTTP/1.1 request; None at end of stream."""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, version = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        keep_alive = (headers.get("connection", "").lower() != "close"
+                      if version == "HTTP/1.1" else headers.get("connection", "").lower() == "keep-alive")
+        return method, target, body, keep_alive
+
+    async def _handle(self, reader, writer):
+        """Serve the requests of one connection."""
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, target, raw_body, keep_alive = request
+                    url = urlsplit(target)
+                    body = json.loads(raw_body) if raw_body else {}
+                    if not isinstance(body, dict):
+                        raise HTTPError(400, "Expected a JSON object")
+                    status, payload = await self.route(method, url.path, parse_qs(url.query), body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except KeyError as e:
+                    status, payload = 404, {"error": e.args[0] if e.args else "Not found"}
+                except ValueError as e:
+                    status, payload = 400, {"error": str(e)}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                             f"Content-Type: application/json; charset=utf-8\r\n"
+                             f"Content-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                             + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+    """Run the API server until cancelled; ready(server) is called once it listens."""
+    app = MovieServer()
+    server = await app.start(host, port)
+    if ready is not None:
+        ready(server)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await app.close()
+
+
+def run(host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+    """Blocking entry point used by `movies.py serve`."""
+    try:
+        asyncio.run(serve(host, port, ready))
+    except KeyboardInterrupt:
+        pass
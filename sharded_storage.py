@@ -0,0 +1,294 @@
+"""
+Sharded storage: the movies hash-partitioned across several data files.
+
+A sharded catalog is a directory (DATA_FILE ending in ".shards")
+holding a manifest.json and N shard files, each an ordinary data file
+(JSON by default, or a snapshot or SQLite database) with its own
+backend, cache, journal and lock. A title always lives in shard
+crc32(title) % N, so point operations load, lock and write one shard
+only.
+
+Scans (filter_movies, sorted_movies, rating_stats) fan out across the
+shards: in a process pool once the shard files are large enough, where
+each worker keeps the shards it has loaded resident, otherwise in
+process. Per-shard results are merged in the parent, sorted output with
+a k-way heapq.merge.
+"""
+import heapq
+import json
+import math
+import os
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+
+from catalog import MovieCatalog
+from movie_index import NUMPY_TOP_MIN, top_titles
+from movie_stats import median_of, summarize
+from movie_storage import ChangeFeedGap, ChangeFeedUnavailable, StorageBackend, atomic_write, open_store
+
+MANIFEST = "manifest.json"
+# Layout of newly created sharded catalogs; existing ones follow their manifest
+SHARD_COUNT = 8
+SHARD_SUFFIX = ".json"
+# Scans use the process pool once the shard files hold this many bytes
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+# Worker processes for scans (None: one per CPU)
+SHARD_WORKERS = None
+
+# Adopt whatever catalog a shard returns next (it was changed through this store)
+_ADOPT = object()
+
+
+def shard_of(title, count):
+    """Return the shard number of a title (stable across processes)."""
+    return zlib.crc32(title.encode("utf-8")) % count
+
+
+# --- scan workers (run in the pool, or in process for small catalogs) ---
+
+_worker_stores = {}
+
+
+def _shard_store(path):
+    """Return this process's resident store for a shard file."""
+    store = _worker_stores.get(path)
+    if store is None:
+        store = _worker_stores[path] = open_store(path)
+    return store
+
+
+def _scan_filter(path, min_rating, start_year, end_year):
+    movies = _shard_store(path).filter_movies(min_rating, start_year, end_year)
+    return [(title, info["rating"], info["year"]) for title, info in movies]
+
+
+def _scan_sorted(path, key, reverse, limit):
+    """The shard's (value, title, rating, year) rows in (value, title) order, at most limit."""
+    store = _shard_store(path)
+    movies = store.get_movies()
+    if limit is None:
+        titles = (title for _, title in sorted(zip(movies.column(key), movies.titles), reverse=reverse))
+    else:
+        titles = top_titles(movies, key, limit, reverse)
+    rows = []
+    for title in titles:
+        info = movies[title]
+        rows.append((info[key], title, info["rating"], info["year"]))
+    return rows
+
+
+def _scan_stats(path):
+    """Count, sum, ratings column and (rating, title) extremes of one shard."""
+    movies = _shard_store(path).get_movies()
+    if not movies:
+        return 0, 0.0, b"", None, None
+    ratings = movies.column("rating")
+    return (len(movies), math.fsum(ratings), bytes(memoryview(ratings)),
+            min(zip(ratings, movies.titles)), max(zip(ratings, movies.titles)))
+
+
+class ShardedStore(StorageBackend):
+    """Routes point operations to one shard and fans scans out to all of them."""
+
+    def __init__(self, path, journal=False):
+        self.path = path
+        manifest_path = os.path.join(path, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        else:
+            manifest = {"shards": SHARD_COUNT, "suffix": SHARD_SUFFIX}
+            os.makedirs(path, exist_ok=True)
+            # Processes creating the catalog at once must never read a half-written manifest
+            with atomic_write(manifest_path) as f:
+                json.dump(manifest, f, indent=4)
+        self.paths = [os.path.join(path, f"shard-{i:03d}{manifest['suffix']}")
+                      for i in range(manifest["shards"])]
+        self.shards = [open_store(shard_path, journal=journal) for shard_path in self.paths]
+        self._movies = None
+        self._sources = None
+        self._batch_depth = 0
+        self._pool = None
+
+    def shard(self, title):
+        """Return the backend holding title."""
+        return self.shards[shard_of(title, len(self.shards))]
+
+    # --- whole-catalog view -------------------------------------------
+
+    def get_movies(self):
+        """
+        Return all shards merged into one MovieCatalog. It is kept
+        in step with changes made through this store, follows a shard
+        changed by someone else through the shard's change feed, and
+        is rebuilt when a shard had to be reloaded.
+        """
+        current = [(shard.get_movies(), shard.cache_version) for shard in self.shards]
+        if self._movies is None or not all(self._follow(shard, source, now)
+                                           for shard, source, now in zip(self.shards, self._sources, current)):
+            merged = MovieCatalog()
+            for movies, _ in current:
+                for title, rating, year in movies.rows():
+                    merged.set(title, rating, year)
+            self._movies = merged
+        self._sources = current
+        return self._movies
+
+    def _follow(self, shard, source, now):
+        """
+        Bring the merged catalog from a shard's earlier (movies,
+        version) to its current one; False if it must be rebuilt.
+        """
+        if source is _ADOPT:
+            return True
+        (movies, version), (current, current_version) = source, now
+        if movies is not current or version is None or current_version is None:
+            return False
+        if version == current_version:
+            return True
+        try:
+            changes = shard.changes_since(version)
+        except ChangeFeedGap:
+            return False
+        for change in changes:
+            if change["version"] > current_version:
+                break
+            if change["op"] == "reset":
+                return False
+            self._replay(change)
+        return True
+
+    def _changed(self, title):
+        """Mirror a point change of title's shard into the merged catalog."""
+        if self._movies is None:
+            return
+        i = shard_of(title, len(self.shards))
+        info = self.shards[i].get_movie(title)
+        if info is None:
+            membership_changed = title in self._movies
+            self._movies.discard(title)
+        else:
+            membership_changed = title not in self._movies
+            self._movies.set(title, info["rating"], info["year"])
+        if membership_changed:
+            self._reindex_title(title, info is not None)
+        self._sources[i] = _ADOPT
+
+    def save_movies(self, movies):
+        """Partition movies across the shards and write every shard."""
+        parts = [MovieCatalog() for _ in self.shards]
+        count = len(self.shards)
+        for title, info in movies.items():
+            parts[shard_of(title, count)].set(title, info["rating"], info["year"])
+        for shard, part in zip(self.shards, parts):
+            shard.save_movies(part)
+        self._movies = None
+
+    def iter_movies(self):
+        """Yield every (title, info) pair, shard after shard."""
+        for shard in self.shards:
+            yield from shard.iter_movies()
+
+    # --- point operations: one shard each ---------------------------------
+
+    def get_movie(self, title):
+        return self.shard(title).get_movie(title)
+
+    def add_movie(self, title, year, rating):
+        self.shard(title).add_movie(title, year, rating)
+        self._changed(title)
+
+    def delete_movie(self, title):
+        self.shard(title).delete_movie(title)
+        self._changed(title)
+
+    def update_movie(self, title, rating):
+        self.shard(title).update_movie(title, rating)
+        self._changed(title)
+
+    def catalog_version(self):
+        """
+        ChangeFeedUnavailable: every shard numbers its own changes under
+        its own lock, so there is no catalog-wide order to version.
+        Follow the shards' feeds instead (self.shards[i].changes_since()).
+        """
+        raise ChangeFeedUnavailable("A sharded catalog has no catalog-wide version; each shard has its own.")
+
+    def changes_since(self, version):
+        """ChangeFeedUnavailable, as for catalog_version()."""
+        raise ChangeFeedUnavailable("A sharded catalog has no catalog-wide change feed; each shard keeps its own.")
+
+    @contextmanager
+    def batch(self):
+        """Batch every shard; only the shards that were changed are written."""
+        with ExitStack() as stack:
+            for shard in self.shards:
+                stack.enter_context(shard.batch())
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._movies = None
+                raise
+            finally:
+                self._batch_depth -= 1
+
+    # --- scans: fanned out across the shards --------------------------------
+
+    def _fan_out(self, func, *args):
+        """Run func(shard path, *args) for every shard; return the results in shard order."""
+        if self._batch_depth or sum(self._file_sizes()) < PARALLEL_MIN_BYTES:
+            # Uncommitted batch changes only exist in this process
+            return [self._local(func, shard, path, *args) for shard, path in zip(self.shards, self.paths)]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(SHARD_WORKERS)
+        return list(self._pool.map(func, self.paths, *([arg] * len(self.paths) for arg in args)))
+
+    @staticmethod
+    def _local(func, shard, path, *args):
+        _worker_stores[path] = shard
+        return func(path, *args)
+
+    def _file_sizes(self):
+        for path in self.paths:
+            try:
+                yield os.path.getsize(path)
+            except FileNotFoundError:
+                yield 0
+
+    def filter_movies(self, min_rating=None, start_year=None, end_year=None):
+        """Yield the matching movies, filtered shard by shard."""
+        for rows in self._fan_out(_scan_filter, min_rating, start_year, end_year):
+            for title, rating, year in rows:
+                yield title, {"rating": rating, "year": year}
+
+    def sorted_movies(self, key, reverse=False, limit=None, offset=0):
+        """Merge the shards' sorted (or top offset + limit) rows with heapq.merge."""
+        per_shard = None if limit is None else offset + limit
+        runs = self._fan_out(_scan_sorted, key, reverse, per_shard)
+        merged = heapq.merge(*runs, key=lambda row: (row[0], row[1]), reverse=reverse)
+        stop = None if limit is None else offset + limit
+        for _, title, rating, year in islice(merged, offset, stop):
+            yield title, {"rating": rating, "year": year}
+
+    def rating_stats(self):
+        """Combine per-shard counts, sums, extremes and ratings into the statistics."""
+        parts = self._fan_out(_scan_stats)
+        count = sum(part[0] for part in parts)
+        if not count:
+            return summarize(0, 0, None, None, None)
+        ratings = array("d")
+        for part in parts:
+            ratings.frombytes(part[2])
+        if count < NUMPY_TOP_MIN:
+            median = median_of(sorted(ratings))
+        else:
+            import numpy as np
+            median = float(np.median(np.frombuffer(ratings, dtype=np.float64)))
+        total = math.fsum(part[1] for part in parts)
+        worst = min(part[3] for part in parts if part[0])
+        best = max(part[4] for part in parts if part[0])
+        return summarize(count, total, median, best[1], worst[1])
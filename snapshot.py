@@ -0,0 +1,193 @@
+"""
+Binary snapshot format for the movies, loaded through mmap.
+
+Layout (little-endian, every block 8-byte aligned):
+
+    header   b"MVSNAP01" + uint64 count
+    ratings  float64[count]
+    offsets  uint64[count + 1]   start of each title in the blob
+    years    int16[count]        padded to a multiple of 8 bytes
+                                 (uint16 in older files: the same bytes
+                                 for every year up to 32767)
+    blob     UTF-8 titles, concatenated in sorted (byte) order
+
+Opening a snapshot only maps the file: the rating and year columns
+are zero-copy memoryviews, and a title lookup is a binary search
+that touches just the pages it reads.
+"""
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import ItemsView, Mapping, ValuesView
+
+from catalog import MovieCatalog
+from movie_storage import MovieStore, atomic_write
+
+MAGIC = b"MVSNAP01"
+HEADER = struct.Struct("<8sQ")
+
+
+def _padded(size):
+    """Round a byte size up to the next multiple of 8."""
+    return (size + 7) & ~7
+
+
+def write_snapshot(path, rows):
+    """
+    Write (title, rating, year) rows as a snapshot file.
+    The file is written next to path and renamed over it,
+    so readers (and existing mmaps) never see a half-written snapshot.
+    """
+    encoded = sorted((title.encode("utf-8"), rating, year) for title, rating, year in rows)
+    count = len(encoded)
+    ratings = array('d', (rating for _, rating, _ in encoded))
+    years = array('h', (year for _, _, year in encoded))
+    offsets = array('Q', [0])
+    total = 0
+    for title, _, _ in encoded:
+        total += len(title)
+        offsets.append(total)
+    if sys.byteorder != "little":
+        for column in (ratings, years, offsets):
+            column.byteswap()
+    with atomic_write(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, count))
+        f.write(ratings.tobytes())
+        f.write(offsets.tobytes())
+        f.write(years.tobytes())
+        f.write(b"\0" * (_padded(2 * count) - 2 * count))
+        for title, _, _ in encoded:
+            f.write(title)
+
+
+class _SnapshotItems(ItemsView):
+    """Items view reading the columns in row order."""
+
+    def __iter__(self):
+        snapshot = self._mapping
+        for title, rating, year in snapshot.rows():
+            yield title, {"rating": rating, "year": year}
+
+
+class _SnapshotValues(ValuesView):
+    """Values view reading the columns in row order."""
+
+    def __iter__(self):
+        snapshot = self._mapping
+        for rating, year in zip(snapshot._ratings, snapshot._years):
+            yield {"rating": rating, "year": year}
+
+
+class SnapshotCatalog(Mapping):
+    """
+    Read-only, memory-mapped view of a snapshot file with the same
+    read interface as catalog.MovieCatalog.
+    """
+
+    def __init__(self, path):
+        if sys.byteorder != "little":
+            raise OSError("Snapshots can only be memory-mapped on little-endian machines.")
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a movie snapshot.")
+        view = memoryview(self._mm)
+        start = HEADER.size
+        self._count = count
+        self._ratings = view[start:start + 8 * count].cast('d')
+        start += 8 * count
+        self._offsets = view[start:start + 8 * (count + 1)].cast('Q')
+        start += 8 * (count + 1)
+        self._years = view[start:start + 2 * count].cast('h')
+        start += _padded(2 * count)
+        self._blob = start
+        self._titles = None
+
+    def _title_bytes(self, row):
+        start = self._blob
+        return self._mm[start + self._offsets[row]:start + self._offsets[row + 1]]
+
+    def _find(self, title):
+        """Binary search for a title's row; None if it is missing."""
+        key = title.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            if self._title_bytes(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self._count and self._title_bytes(low) == key:
+            return low
+        return None
+
+    def __getitem__(self, title):
+        row = self._find(title)
+        if row is None:
+            raise KeyError(title)
+        return {"rating": self._ratings[row], "year": self._years[row]}
+
+    def __contains__(self, title):
+        return isinstance(title, str) and self._find(title) is not None
+
+    def __iter__(self):
+        for row in range(self._count):
+            yield self._title_bytes(row).decode("utf-8")
+
+    def __len__(self):
+        return self._count
+
+    def items(self):
+        return _SnapshotItems(self)
+
+    def values(self):
+        return _SnapshotValues(self)
+
+    def rows(self):
+        """Yield (title, rating, year) tuples in title order."""
+        return zip(iter(self), self._ratings, self._years)
+
+    @property
+    def titles(self):
+        """All titles decoded once, aligned with column()."""
+        if self._titles is None:
+            self._titles = list(self)
+        return self._titles
+
+    def column(self, field):
+        """Return the "rating" or "year" column as a zero-copy memoryview."""
+        if field == "rating":
+            return self._ratings
+        if field == "year":
+            return self._years
+        raise KeyError(field)
+
+    def title_at(self, row):
+        """Return the title stored in a row."""
+        return self._title_bytes(row).decode("utf-8")
+
+
+class SnapshotStore(MovieStore):
+    """
+    MovieStore whose data file is a binary snapshot.
+
+    Loading only memory-maps the file, so reads start at once and
+    touch just the pages they need. The first change copies the
+    snapshot into an in-memory MovieCatalog, and saves write a
+    fresh snapshot that replaces the old one atomically.
+    """
+
+    def _read_data(self):
+        return SnapshotCatalog(self.path)
+
+    def _write_data(self, movies):
+        write_snapshot(self.path, movies.rows())
+
+    @staticmethod
+    def _mutable(movies):
+        if isinstance(movies, SnapshotCatalog):
+            return MovieCatalog(movies.rows())
+        return movies
+
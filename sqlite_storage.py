@@ -0,0 +1,290 @@
+import sqlite3
+from contextlib import contextmanager
+
+import instrument
+from catalog import MovieCatalog
+from movie_stats import summarize
+from movie_storage import ChangeFeedGap, StorageBackend
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    title  TEXT PRIMARY KEY,
+    rating REAL NOT NULL,
+    year   INTEGER NOT NULL
+);
+-- Ties are ordered by title, so the indexes hold (value, title)
+DROP INDEX IF EXISTS idx_movies_rating;
+DROP INDEX IF EXISTS idx_movies_year;
+CREATE INDEX IF NOT EXISTS idx_movies_rating_title ON movies (rating, title);
+CREATE INDEX IF NOT EXISTS idx_movies_year_title ON movies (year, title);
+CREATE TABLE IF NOT EXISTS changes (
+    version    INTEGER PRIMARY KEY AUTOINCREMENT,
+    title      TEXT,
+    old_rating REAL,
+    old_year   INTEGER,
+    new_rating REAL,
+    new_year   INTEGER
+);
+"""
+
+# The change feed: triggers record every change to movies in the changes
+# table, numbered by its AUTOINCREMENT version; a row without a title
+# records a reset (the whole table was replaced)
+FEED_TRIGGERS = {
+    "movies_feed_insert": "AFTER INSERT ON movies BEGIN "
+                          "INSERT INTO changes (title, new_rating, new_year) "
+                          "VALUES (NEW.title, NEW.rating, NEW.year); END",
+    "movies_feed_update": "AFTER UPDATE ON movies BEGIN "
+                          "INSERT INTO changes (title, old_rating, old_year, new_rating, new_year) "
+                          "VALUES (NEW.title, OLD.rating, OLD.year, NEW.rating, NEW.year); END",
+    "movies_feed_delete": "AFTER DELETE ON movies BEGIN "
+                          "INSERT INTO changes (title, old_rating, old_year) "
+                          "VALUES (OLD.title, OLD.rating, OLD.year); END",
+}
+# The feed keeps about this many of the latest changes
+FEED_MAX_CHANGES = 100_000
+FEED_TRIM = f"""
+CREATE TRIGGER IF NOT EXISTS changes_trim AFTER INSERT ON changes WHEN NEW.version % 1024 = 0 BEGIN
+    DELETE FROM changes WHERE version <= NEW.version - {FEED_MAX_CHANGES};
+END;
+"""
+
+UPSERT = ("INSERT INTO movies (title, rating, year) VALUES (?, ?, ?) "
+          "ON CONFLICT (title) DO UPDATE SET rating = excluded.rating, year = excluded.year")
+
+# Sortable columns, mapped to the indexed column names
+SORT_COLUMNS = {"rating": "rating", "year": "year"}
+
+
+class SqliteStore(StorageBackend):
+    """
+    Stores the movies in an SQLite database with indexes
+    on rating and year.
+
+    Filters and sorts are pushed down to SQLite so they are
+    answered from the indexes instead of scanning every movie
+    in Python. get_movies() keeps an in-memory copy that is
+    kept until the database changes (tracked through PRAGMA
+    data_version for other connections), then brought up to date
+    from the change feed, or reloaded if the feed does not reach
+    back far enough.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # A serialized SQLite build lets the connection be shared with
+        # another thread (the HTTP server writes from a worker thread)
+        self._conn = sqlite3.connect(path, check_same_thread=sqlite3.threadsafety < 3)
+        self._conn.executescript(SCHEMA + FEED_TRIM + "".join(
+            f"CREATE TRIGGER IF NOT EXISTS {name} {body};\n" for name, body in FEED_TRIGGERS.items()))
+        # Case-insensitive substring test of the query language's ~
+        self._conn.create_function("title_contains", 2, lambda title, term: term in title.lower(),
+                                   deterministic=True)
+        self._movies = None
+        self._data_version = None
+        self._feed_version = None
+        self._batch_depth = 0
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+    def _current_data_version(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def get_movies(self):
+        """
+        Returns all movies as a MovieCatalog, served from memory
+        until the database is modified.
+        """
+        data_version = self._current_data_version()
+        if self._movies is None or (data_version != self._data_version and not self._catch_up()):
+            with instrument.phase("load"):
+                # Read before the rows: replaying a change they already include is harmless
+                version = self.catalog_version()
+                self._movies = MovieCatalog(self._conn.execute("SELECT title, rating, year FROM movies"))
+            self._feed_version = version
+        self._data_version = data_version
+        return self._movies
+
+    def _catch_up(self):
+        """Apply the feed's changes since the cached version to the in-memory copy."""
+        if self._feed_version is None:
+            return False
+        try:
+            changes = self.changes_since(self._feed_version)
+        except ChangeFeedGap:
+            return False
+        if any(change["op"] == "reset" for change in changes):
+            return False
+        for change in changes:
+            self._replay(change)
+        if changes:
+            self._feed_version = changes[-1]["version"]
+        return True
+
+    def catalog_version(self):
+        """Return the version of the last recorded change (the changes table's sequence)."""
+        row = self._conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, version):
+        """Return the changes after version from the changes table, oldest first."""
+        # Read first, so changes committed in between can only add rows
+        current = self.catalog_version()
+        rows = self._conn.execute("SELECT version, title, old_rating, old_year, new_rating, new_year "
+                                  "FROM changes WHERE version > ? ORDER BY version", (version,)).fetchall()
+        if version > current or (rows and rows[0][0] != version + 1) or (not rows and version < current):
+            raise ChangeFeedGap(f"The change feed does not cover version {version}.")
+        changes = []
+        for number, title, old_rating, old_year, new_rating, new_year in rows:
+            if title is None:
+                changes.append({"version": number, "op": "reset"})
+                continue
+            old = None if old_rating is None else {"rating": old_rating, "year": old_year}
+            new = None if new_rating is None else {"rating": new_rating, "year": new_year}
+            op = "add" if old is None else "delete" if new is None else "update"
+            changes.append({"version": number, "op": op, "title": title, "old": old, "new": new})
+        return changes
+
+    def get_movie(self, title):
+        """Look up one movie by its primary key."""
+        if self._movies is not None and self._current_data_version() == self._data_version:
+            return self._movies.get(title)
+        row = self._conn.execute("SELECT rating, year FROM movies WHERE title = ?", (title,)).fetchone()
+        return None if row is None else {"rating": row[0], "year": row[1]}
+
+    @contextmanager
+    def batch(self):
+        """Run the enclosed mutations in a single transaction."""
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._conn.rollback()
+                self._movies = None
+            raise
+        self._batch_depth -= 1
+        if self._batch_depth == 0:
+            self._conn.commit()
+
+    def _write(self, sql, params, many=False):
+        """Execute a statement, committing unless inside a batch."""
+        if many:
+            cursor = self._conn.executemany(sql, params)
+        else:
+            cursor = self._conn.execute(sql, params)
+        if not self._batch_depth:
+            self._conn.commit()
+        return cursor
+
+    def save_movies(self, movies):
+        """Replace every row with the given {title: info} mapping in one transaction."""
+        rows = ((title, info["rating"], info["year"]) for title, info in movies.items())
+        with self.batch():
+            # Recorded as one reset instead of a change per row
+            self._write("INSERT INTO changes (title) VALUES (NULL)", ())
+            for name in FEED_TRIGGERS:
+                self._write(f"DROP TRIGGER {name}", ())
+            self._write("DELETE FROM movies", ())
+            self._write(UPSERT, rows, many=True)
+            for name, body in FEED_TRIGGERS.items():
+                self._write(f"CREATE TRIGGER {name} {body}", ())
+            self._movies = None
+
+    def add_movie(self, title, year, rating):
+        """Add (or replace) a movie."""
+        self._write(UPSERT, (title, rating, year))
+        if self._movies is not None:
+            self._movies.set(title, rating, year)
+            self._reindex_title(title, True)
+
+    def add_movies(self, movies):
+        """Add many (title, year, rating) tuples in one transaction."""
+        rows = ((title, rating, year) for title, year, rating in movies)
+        with self.batch():
+            self._write(UPSERT, rows, many=True)
+            self._movies = None
+
+    def delete_movie(self, title):
+        """Delete a movie; KeyError if it is missing."""
+        cursor = self._write("DELETE FROM movies WHERE title = ?", (title,))
+        if cursor.rowcount == 0:
+            raise KeyError(f"Movie '{title}' does not exist.")
+        if self._movies is not None:
+            self._movies.discard(title)
+            self._reindex_title(title, False)
+
+    def update_movie(self, title, rating):
+        """Update the rating of an existing movie."""
+        cursor = self._write("UPDATE movies SET rating = ? WHERE title = ?", (rating, title))
+        if cursor.rowcount and self._movies is not None and title in self._movies:
+            self._movies.set_rating(title, rating)
+
+    def update_ratings(self, ratings):
+        """Apply a {title: rating} mapping in one transaction."""
+        rows = ((rating, title) for title, rating in ratings.items())
+        with self.batch():
+            self._write("UPDATE movies SET rating = ? WHERE title = ?", rows, many=True)
+            self._movies = None
+
+    def iter_movies(self):
+        """Yield every (title, info) pair straight from a cursor."""
+        for title, rating, year in self._conn.execute("SELECT title, rating, year FROM movies"):
+            yield title, {"rating": rating, "year": year}
+
+    def filter_movies(self, min_rating=None, start_year=None, end_year=None):
+        """Yield (title, info) pairs matching the bounds, using the indexes."""
+        clauses, params = [], []
+        if min_rating is not None:
+            clauses.append("rating >= ?")
+            params.append(min_rating)
+        if start_year is not None:
+            clauses.append("year >= ?")
+            params.append(start_year)
+        if end_year is not None:
+            clauses.append("year <= ?")
+            params.append(end_year)
+        sql = "SELECT title, rating, year FROM movies"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        for title, rating, year in self._conn.execute(sql, params):
+            yield title, {"rating": rating, "year": year}
+
+    def sorted_movies(self, key, reverse=False, limit=None, offset=0):
+        """Yield (title, info) pairs in index order of rating or year, one page if limit is given."""
+        column = SORT_COLUMNS[key]
+        order = "DESC" if reverse else "ASC"
+        # Ties by title, like the other backends
+        sql = f"SELECT title, rating, year FROM movies ORDER BY {column} {order}, title {order} LIMIT ? OFFSET ?"
+        for title, rating, year in self._conn.execute(sql, (-1 if limit is None else limit, offset)):
+            yield title, {"rating": rating, "year": year}
+
+    def query_movies(self, query):
+        """Push a compiled movie_query.Query down to SQLite as WHERE, ORDER BY and LIMIT."""
+        sql = f"SELECT title, rating, year FROM movies WHERE {query.where}"
+        params = list(query.where_params)
+        if query.sort is not None:
+            order = "DESC" if query.reverse else "ASC"
+            # Ties by title, like the in-memory backends
+            sql += f" ORDER BY {query.sort} {order}" + ("" if query.sort == "title" else f", title {order}")
+        if query.limit is not None or query.offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if query.limit is None else query.limit, query.offset]
+        for title, rating, year in self._conn.execute(sql, params):
+            yield title, {"rating": rating, "year": year}
+
+    def rating_stats(self):
+        """Return the rating statistics using aggregate queries on the rating index."""
+        count, total = self._conn.execute("SELECT COUNT(*), TOTAL(rating) FROM movies").fetchone()
+        if not count:
+            return summarize(0, 0, None, None, None)
+        middle = [rating for (rating,) in self._conn.execute(
+            "SELECT rating FROM movies ORDER BY rating LIMIT ? OFFSET ?",
+            (2 - count % 2, (count - 1) // 2))]
+        # Ties by title: the last and first movie in (rating, title) order, as in the sorted index
+        best = self._conn.execute("SELECT title FROM movies ORDER BY rating DESC, title DESC LIMIT 1").fetchone()[0]
+        worst = self._conn.execute("SELECT title FROM movies ORDER BY rating ASC, title ASC LIMIT 1").fetchone()[0]
+        return summarize(count, total, sum(middle) / len(middle), best, worst)
@@ -0,0 +1,61 @@
+"""The analytics report against a brute-force pass, in process and with a pool."""
+import math
+import random
+import statistics
+
+import pytest
+
+import analytics
+import movie_storage
+from catalog import MovieCatalog
+
+
+def _catalog(size):
+    rng = random.Random(size)
+    movies = MovieCatalog()
+    for i in range(size):
+        # Coarse ratings, so that ties (and ties across chunks) are common
+        movies.set(f"Movie {rng.randrange(10 ** 6):06d} {i}", rng.randrange(0, 21) / 2, rng.randint(1950, 2024))
+    return movies
+
+
+def _expected(movies, min_rating, start_year, top):
+    rows = [(title, rating, year) for title, rating, year in movies.rows()
+            if (min_rating is None or rating >= min_rating) and (start_year is None or year >= start_year)]
+    ratings = [rating for _, rating, _ in rows]
+    ranked = sorted(rows, key=lambda row: (row[1], row[0]))
+    as_dicts = [{"title": title, "year": year, "rating": rating} for title, rating, year in ranked]
+    return {"count": len(rows), "average": math.fsum(ratings) / len(rows), "median": statistics.median(ratings),
+            "min": min(ratings), "max": max(ratings), "top": as_dicts[::-1][:top], "bottom": as_dicts[:top]}
+
+
+@pytest.fixture(params=["data.json", "data.snap", "data.db"])
+def data_file(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(movie_storage, "DATA_FILE", str(tmp_path / request.param))
+    return request.param
+
+
+@pytest.mark.parametrize("size", [1, 2, 301, 1000])
+@pytest.mark.parametrize("pooled", [False, True])
+@pytest.mark.parametrize("min_rating, start_year", [(None, None), (4.5, 1990)])
+def test_report_matches_brute_force(data_file, monkeypatch, size, pooled, min_rating, start_year):
+    movies = _catalog(size)
+    movie_storage.get_store().save_movies(movies)
+    if pooled:
+        monkeypatch.setattr(analytics, "ROWS_PER_WORKER", 10)
+    if not any((min_rating or 0) <= r and (start_year or 0) <= y for _, r, y in movies.rows()):
+        assert analytics.report(min_rating, start_year, workers=2)["count"] == 0
+        return
+    result = analytics.report(min_rating, start_year, top=5, workers=2)
+    expected = _expected(movies, min_rating, start_year, 5)
+    histogram = result.pop("histogram")
+    assert result.pop("average") == pytest.approx(expected.pop("average"))
+    assert result == expected
+    assert sum(histogram["counts"]) == expected["count"]
+    assert len(histogram["edges"]) == len(histogram["counts"]) + 1
+
+
+def test_empty_selection(data_file):
+    movie_storage.get_store().save_movies(_catalog(50))
+    result = analytics.report(min_rating=11)
+    assert result["count"] == 0 and result["median"] is None and result["top"] == []
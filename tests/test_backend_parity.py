@@ -0,0 +1,79 @@
+"""Every backend answers filters, sorts, queries and statistics the same way."""
+import random
+
+import pytest
+
+from catalog import MovieCatalog
+from movie_query import compile_query
+from movie_storage import open_store
+
+NAMES = ["data.json", "data.snap", "data.db", "data.shards"]
+QUERIES = [
+    "rating >= 7 and year between 1980 and 2000 sort rating desc limit 10",
+    'title ~ "night" or year < 1960 sort title',
+    "not (rating < 5) and year != 1999 sort year asc limit 7 offset 3",
+    '(year >= 2010 or rating = 10) and title ~ "red" sort rating fields title, rating',
+]
+
+
+def _catalog():
+    rng = random.Random(7)
+    words = "Night Day Red Blue Last First River City Storm Garden".split()
+    movies = MovieCatalog()
+    for i in range(400):
+        movies.set(f"{rng.choice(words)} {rng.choice(words)} {i}", rng.randrange(1, 19) / 2, rng.randint(1950, 2024))
+    return movies
+
+
+@pytest.fixture(scope="module")
+def stores(tmp_path_factory):
+    movies = _catalog()
+    directory = tmp_path_factory.mktemp("parity")
+    result = {}
+    for name in NAMES:
+        store = open_store(str(directory / name))
+        store.save_movies(movies)
+        result[name] = store
+    return result
+
+
+def _reference(stores):
+    return stores["data.json"]
+
+
+@pytest.mark.parametrize("name", NAMES[1:])
+def test_contents_match(stores, name):
+    assert dict(stores[name].get_movies().items()) == dict(_reference(stores).get_movies().items())
+
+
+@pytest.mark.parametrize("name", NAMES[1:])
+@pytest.mark.parametrize("bounds", [(None, None, None), (7.5, None, None), (None, 1970, 1989), (6.0, 2000, 2010)])
+def test_filter_matches(stores, name, bounds):
+    expected = dict(_reference(stores).filter_movies(*bounds))
+    assert dict(stores[name].filter_movies(*bounds)) == expected
+
+
+@pytest.mark.parametrize("name", NAMES[1:])
+@pytest.mark.parametrize("key, reverse, limit, offset", [("rating", True, 10, 0), ("year", False, 15, 5),
+                                                        ("rating", False, None, 0), ("year", True, None, 0)])
+def test_sort_matches(stores, name, key, reverse, limit, offset):
+    def page(store):
+        return list(store.sorted_movies(key, reverse, limit, offset))
+    # Every backend orders ties by title
+    assert page(stores[name]) == page(_reference(stores))
+
+
+@pytest.mark.parametrize("name", NAMES[1:])
+@pytest.mark.parametrize("text", QUERIES)
+def test_query_matches(stores, name, text):
+    query = compile_query(text)
+    assert list(stores[name].query_movies(query)) == list(_reference(stores).query_movies(query))
+
+
+@pytest.mark.parametrize("name", NAMES[1:])
+def test_stats_match(stores, name):
+    expected = _reference(stores).rating_stats()
+    got = stores[name].rating_stats()
+    assert got["count"] == expected["count"]
+    assert got["average"] == pytest.approx(expected["average"])
+    assert (got["median"], got["best"], got["worst"]) == (expected["median"], expected["best"], expected["worst"])
@@ -0,0 +1,59 @@
+"""MovieCatalog columns, and what happens to values that do not fit them."""
+import json
+
+import pytest
+
+from catalog import MovieCatalog
+from movie_storage import MovieStore
+
+
+def test_rows_stay_dense_across_deletes():
+    movies = MovieCatalog([("Alien", 8.5, 1979), ("Heat", 8.3, 1995), ("Ran", 8.2, 1985)])
+    movies.discard("Alien")
+    movies.discard("Missing")
+    assert list(movies.rows()) == [("Ran", 8.2, 1985), ("Heat", 8.3, 1995)]
+    assert movies["Ran"] == {"rating": 8.2, "year": 1985}
+    movies.set_rating("Heat", 9)
+    assert movies.title_at(1) == "Heat" and movies.column("rating")[1] == 9.0
+    with pytest.raises(KeyError):
+        movies.set_rating("Alien", 5.0)
+
+
+def test_years_and_ratings_are_coerced():
+    movies = MovieCatalog()
+    movies.set("Alien", 8, 1979.0)
+    movies.set("Heat", "8.3", "1995")
+    movies.set("Ancient", 5.0, -300)
+    assert list(movies.rows()) == [("Alien", 8.0, 1979), ("Heat", 8.3, 1995), ("Ancient", 5.0, -300)]
+
+
+@pytest.mark.parametrize("rating, year", [(8.0, "abc"), (8.0, 1999.5), (8.0, 70000), (8.0, None),
+                                          ("bad", 1999), (None, 1999)])
+def test_invalid_values_leave_the_catalog_unchanged(rating, year):
+    movies = MovieCatalog([("Alien", 8.5, 1979)])
+    with pytest.raises(ValueError):
+        movies.set("Bad", rating, year)
+    with pytest.raises(ValueError):
+        movies.set("Alien", rating, year)
+    assert list(movies.rows()) == [("Alien", 8.5, 1979)]
+    movies.set("Good", 7.0, 2000)
+    assert len(movies) == len(list(movies.rows())) == 2
+
+
+def test_store_survives_a_rejected_movie(tmp_path):
+    store = MovieStore(str(tmp_path / "data.json"))
+    store.add_movie("Alien", 1979, 8.5)
+    with pytest.raises(ValueError):
+        store.add_movie("Bad", "nineteen", 8.0)
+    store.add_movie("Good", 2000, 7.0)
+    assert dict(store.get_movies().items()) == {"Alien": {"rating": 8.5, "year": 1979},
+                                                "Good": {"rating": 7.0, "year": 2000}}
+    with open(store.path, encoding="utf-8") as f:
+        assert set(json.load(f)) == {"Alien", "Good"}
+
+
+def test_float_and_negative_years_load(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text('{"Alien": {"rating": 8.5, "year": 1979.0}, "Ancient": {"rating": 5, "year": -300}}')
+    assert dict(MovieStore(str(path)).get_movies().items()) == {"Alien": {"rating": 8.5, "year": 1979},
+                                                                "Ancient": {"rating": 5.0, "year": -300}}
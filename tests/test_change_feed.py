@@ -0,0 +1,182 @@
+"""catalog_version() / changes_since(), gaps and resets, and catch-up from the feed."""
+import json
+import multiprocessing
+import os
+import sqlite3
+
+import pytest
+
+import movie_storage
+from movie_storage import ChangeFeedGap, ChangeFeedUnavailable, MovieStore, open_store
+
+
+@pytest.fixture(params=["data.json", "data.db"])
+def path(request, tmp_path):
+    return str(tmp_path / request.param)
+
+
+def test_changes_carry_old_and_new_values(path):
+    store = open_store(path)
+    store.add_movie("Alien", 1979, 8.5)
+    store.update_movie("Alien", 9.0)
+    store.delete_movie("Alien")
+
+    changes = store.changes_since(0)
+    assert [(c["version"], c["op"], c["title"]) for c in changes] == [
+        (1, "add", "Alien"), (2, "update", "Alien"), (3, "delete", "Alien")]
+    assert changes[0]["old"] is None and changes[0]["new"] == {"rating": 8.5, "year": 1979}
+    assert changes[1]["old"] == {"rating": 8.5, "year": 1979}
+    assert changes[1]["new"] == {"rating": 9.0, "year": 1979}
+    assert changes[2]["new"] is None
+    assert store.catalog_version() == 3
+    assert store.changes_since(3) == []
+    assert [c["version"] for c in store.changes_since(1)] == [2, 3]
+
+
+def test_version_ahead_of_the_feed_is_a_gap(path):
+    store = open_store(path)
+    store.add_movie("Alien", 1979, 8.5)
+    with pytest.raises(ChangeFeedGap):
+        store.changes_since(5)
+
+
+def test_trimmed_feed_is_a_gap(tmp_path, monkeypatch):
+    monkeypatch.setattr(movie_storage, "FEED_MAX_BYTES", 4000)
+    store = open_store(str(tmp_path / "data.json"))
+    for i in range(100):
+        store.add_movie(f"Movie {i}", 2000, 5.0)
+        assert os.path.getsize(store.feed_path) <= 4000
+
+    assert store.catalog_version() == 100
+    with pytest.raises(ChangeFeedGap):
+        store.changes_since(0)
+    assert [c["version"] for c in store.changes_since(95)] == [96, 97, 98, 99, 100]
+
+
+def test_trimmed_sqlite_feed_is_a_gap(tmp_path):
+    store = open_store(str(tmp_path / "data.db"))
+    for i in range(30):
+        store.add_movie(f"Movie {i}", 2000, 5.0)
+    # What the changes_trim trigger does once the feed holds FEED_MAX_CHANGES
+    with sqlite3.connect(store.path) as conn:
+        conn.execute("DELETE FROM changes WHERE version <= 20")
+    with pytest.raises(ChangeFeedGap):
+        store.changes_since(0)
+    assert len(store.changes_since(25)) == 5
+
+
+def test_hand_edit_is_recorded_as_a_reset(tmp_path):
+    store = open_store(str(tmp_path / "data.json"))
+    store.add_movie("Alien", 1979, 8.5)
+    with open(store.path, "w", encoding="utf-8") as f:
+        json.dump({"Heat": {"rating": 8.3, "year": 1995}}, f)
+
+    writer = open_store(store.path)
+    writer.add_movie("Ran", 1985, 8.2)
+    assert [c["op"] for c in writer.changes_since(1)] == ["reset", "add"]
+    # A reader that cannot replay past a reset reloads instead
+    assert set(store.get_movies()) == {"Heat", "Ran"}
+
+
+def test_save_movies_is_a_reset(path):
+    store = open_store(path)
+    store.add_movie("Alien", 1979, 8.5)
+    store.save_movies({"Heat": {"rating": 8.3, "year": 1995}})
+    assert [c["op"] for c in store.changes_since(1)] == ["reset"]
+
+
+def test_compaction_is_not_a_reset(tmp_path):
+    writer = MovieStore(str(tmp_path / "data.json"), journal=True)
+    writer.add_movie("Alien", 1979, 8.5)
+    reader = open_store(writer.path)
+    movies = reader.get_movies()
+
+    writer.compact()
+    writer.add_movie("Heat", 1995, 8.3)
+    assert [(c["version"], c["op"]) for c in writer.changes_since(0)] == [(1, "add"), (2, "add")]
+    assert writer.catalog_version() == 2
+    # Followers replay the change across the rewritten files instead of reloading
+    assert reader.get_movies() is movies and set(movies) == {"Alien", "Heat"}
+    writer.compact()
+    assert reader.get_movies() is movies and reader.cache_version == 2
+
+
+def test_automatic_compaction_is_not_a_reset(tmp_path):
+    store = MovieStore(str(tmp_path / "data.json"), journal=True, compact_bytes=500)
+    for i in range(20):
+        store.add_movie(f"Movie {i}", 2000, 5.0)
+    assert [c["op"] for c in store.changes_since(0)] == ["add"] * 20
+
+
+def test_large_batch_is_recorded_as_one_reset(tmp_path, monkeypatch):
+    monkeypatch.setattr(movie_storage, "FEED_BATCH_MAX_CHANGES", 5)
+    store = open_store(str(tmp_path / "data.json"))
+    store.add_movies((f"Small {i}", 2000, 5.0) for i in range(5))
+    assert [c["op"] for c in store.changes_since(0)] == ["add"] * 5
+    store.add_movies((f"Large {i}", 2000, 5.0) for i in range(6))
+    assert [(c["version"], c["op"]) for c in store.changes_since(5)] == [(6, "reset")]
+
+
+def test_reader_catches_up_instead_of_reloading(path):
+    writer = open_store(path)
+    writer.add_movie("Alien", 1979, 8.5)
+    reader = open_store(path)
+    movies = reader.get_movies()
+    assert reader.cache_version == 1
+
+    writer.add_movie("Heat", 1995, 8.3)
+    writer.update_movie("Alien", 9.0)
+    writer.delete_movie("Heat")
+    writer.add_movie("Ran", 1985, 8.2)
+
+    # The cached catalog is updated in place rather than parsed again
+    assert reader.get_movies() is movies
+    assert dict(movies.items()) == {"Alien": {"rating": 9.0, "year": 1979}, "Ran": {"rating": 8.2, "year": 1985}}
+    assert reader.cache_version == 5
+    assert reader.rating_stats()["best"] == "Alien"
+
+
+def test_catch_up_takes_no_lock(tmp_path):
+    writer = open_store(str(tmp_path / "data.json"))
+    writer.add_movie("Alien", 1979, 8.5)
+    reader = open_store(writer.path)
+    reader.get_movies()
+
+    def locked():
+        raise AssertionError("a read took the writer lock")
+    reader._locked = locked
+    writer.add_movie("Heat", 1995, 8.3)
+    assert "Heat" in reader.get_movies()
+
+
+def _add_and_delete(path, worker):
+    store = open_store(path)
+    for i in range(10):
+        store.add_movie(f"w{worker}-{i}", 2000, 5.0)
+    for i in range(0, 10, 2):
+        store.delete_movie(f"w{worker}-{i}")
+
+
+def test_concurrent_writers_number_changes_contiguously(path):
+    processes = [multiprocessing.Process(target=_add_and_delete, args=(path, worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    store = open_store(path)
+    changes = store.changes_since(0)
+    assert [change["version"] for change in changes] == list(range(1, 61))
+    assert all(change["op"] in ("add", "delete") for change in changes)
+    assert store.catalog_version() == 60
+
+
+def test_sharded_store_has_no_catalog_wide_feed(tmp_path):
+    store = open_store(str(tmp_path / "data.shards"))
+    store.add_movie("Alien", 1979, 8.5)
+    with pytest.raises(ChangeFeedUnavailable):
+        store.catalog_version()
+    with pytest.raises(ChangeFeedUnavailable):
+        store.changes_since(0)
+    # Each shard still keeps its own feed
+    assert sum(shard.catalog_version() for shard in store.shards) == 1
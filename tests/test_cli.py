@@ -0,0 +1,61 @@
+"""Non-interactive subcommands: JSON on stdout, errors on stderr."""
+import json
+
+import pytest
+
+import cli
+import movie_storage
+
+
+@pytest.fixture(autouse=True)
+def data_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(movie_storage, "DATA_FILE", str(tmp_path / "data.json"))
+    movie_storage.add_movies([("Alien", 1979, 8.5), ("Heat", 1995, 8.3), ("Ran", 1985, 8.2)])
+
+
+def _run(capsys, *argv):
+    status = cli.run(list(argv))
+    captured = capsys.readouterr()
+    return status, [json.loads(line) for line in captured.out.splitlines()], captured.err
+
+
+def test_point_commands(capsys):
+    assert _run(capsys, "add", "Dune", "--year", "2021", "--rating", "8") == \
+        (0, [{"title": "Dune", "year": 2021, "rating": 8.0}], "")
+    assert _run(capsys, "update", "Dune", "--rating", "7.5")[1] == [{"title": "Dune", "year": 2021, "rating": 7.5}]
+    assert _run(capsys, "delete", "Dune")[1] == [{"deleted": "Dune"}]
+    stats = _run(capsys, "stats")[1][0]
+    assert (stats["count"], stats["best"], stats["worst"]) == (3, "Alien", "Ran")
+
+
+def test_listings_are_json_lines(capsys):
+    assert [m["title"] for m in _run(capsys, "list")[1]] == ["Alien", "Heat", "Ran"]
+    assert [m["title"] for m in _run(capsys, "sort", "year", "--order", "asc", "--limit", "2")[1]] == ["Alien", "Ran"]
+    assert [m["title"] for m in _run(capsys, "sort", "rating", "--offset", "1")[1]] == ["Heat", "Ran"]
+    assert [m["title"] for m in _run(capsys, "filter", "--min-rating", "8.3", "--start-year", "1990")[1]] == ["Heat"]
+    matches = _run(capsys, "search", "alein")[1][0]["matches"]
+    assert matches[0]["title"] == "Alien" and set(matches[0]) == {"title", "year", "rating", "score"}
+
+
+@pytest.mark.parametrize("argv, message", [
+    (["update", "Missing", "--rating", "5"], "does not exist"),
+    (["delete", "Missing"], "does not exist"),
+])
+def test_errors_go_to_stderr(capsys, argv, message):
+    status, out, err = _run(capsys, *argv)
+    assert status == 1 and out == [] and message in err
+
+
+@pytest.mark.parametrize("argv", [
+    ["search", "alien", "--limit", "-1"],
+    ["list", "--offset", "x"],
+    ["add", "Dune", "--year", "abc", "--rating", "8"],
+    ["add", "Dune", "--year", "2021", "--rating", "11"],
+    [],
+])
+def test_invalid_arguments_are_rejected(capsys, argv):
+    with pytest.raises(SystemExit) as exc:
+        cli.run(argv)
+    assert exc.value.code == 2
+    assert capsys.readouterr().out == ""
+    assert len(movie_storage.get_movies()) == 3
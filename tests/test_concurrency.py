@@ -0,0 +1,36 @@
+"""Several processes writing to the same catalog must not lose each other's changes."""
+import multiprocessing
+
+import pytest
+
+from movie_storage import open_store
+
+WORKERS = 4
+MOVIES_PER_WORKER = 20
+
+
+def _write(path, journal, worker):
+    """Add this worker's movies one by one, then delete every other one."""
+    store = open_store(path, journal=journal)
+    for i in range(MOVIES_PER_WORKER):
+        store.add_movie(f"w{worker}-{i}", 2000 + i, float(i % 10))
+    for i in range(0, MOVIES_PER_WORKER, 2):
+        store.delete_movie(f"w{worker}-{i}")
+
+
+@pytest.mark.parametrize("name, journal", [("data.json", False), ("data.json", True), ("data.snap", False),
+                                           ("data.db", False), ("data.shards", False)])
+def test_concurrent_writers_lose_nothing(tmp_path, name, journal):
+    path = str(tmp_path / name)
+    processes = [multiprocessing.Process(target=_write, args=(path, journal, worker)) for worker in range(WORKERS)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    movies = open_store(path).get_movies()
+    expected = {f"w{worker}-{i}" for worker in range(WORKERS) for i in range(1, MOVIES_PER_WORKER, 2)}
+    assert set(movies) == expected
+    assert movies["w0-3"] == {"rating": 3.0, "year": 2003}
+
@@ -0,0 +1,43 @@
+"""Headless histogram rendering and its cache key."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+import histogram
+
+pytest.importorskip("matplotlib")
+
+
+def test_rendering_is_skipped_while_the_data_is_unchanged(tmp_path):
+    path = str(tmp_path / "ratings.png")
+    assert histogram.save_rating_histogram([8.5, 7.0, 7.0, 3.2], path) is True
+    with open(path, "rb") as f:
+        assert f.read(8) == b"\x89PNG\r\n\x1a\n"
+    assert histogram.save_rating_histogram(iter([3.2, 7.0, 8.5, 7.0]), path) is False
+    assert histogram.save_rating_histogram([8.5, 7.0, 3.2], path) is True
+    (tmp_path / "ratings.png").unlink()
+    assert histogram.save_rating_histogram([8.5, 7.0, 3.2], path) is True
+
+
+def test_the_figure_is_reused(tmp_path):
+    histogram.save_rating_histogram([1.0, 2.0], str(tmp_path / "a.png"))
+    figure = histogram._figure
+    histogram.save_rating_histogram([5.0, 9.0], str(tmp_path / "b.png"))
+    assert histogram._figure is figure and len(figure.axes) == 1
+
+
+def test_key_depends_on_the_bins():
+    counts, edges = histogram.bin_ratings([1.0, 2.0, 2.0, 9.5])
+    assert counts.sum() == 4 and len(edges) == histogram.BINS + 1
+    assert histogram.histogram_key(counts, edges) == histogram.histogram_key(*histogram.bin_ratings([2.0, 9.5, 1.0, 2.0]))
+    assert histogram.histogram_key(counts, edges) != histogram.histogram_key(*histogram.bin_ratings([1.0, 2.0, 9.5]))
+
+
+def test_no_gui_backend_is_loaded(tmp_path):
+    code = ("import sys, histogram; histogram.save_rating_histogram([1.0, 2.0], sys.argv[1]);"
+            "print(sorted(m for m in sys.modules if m.startswith(('matplotlib.pyplot', 'tkinter', 'PyQt'))))")
+    out = subprocess.run([sys.executable, "-c", code, str(tmp_path / "h.png")], capture_output=True, text=True,
+                         check=True, cwd=os.path.dirname(histogram.__file__)).stdout
+    assert out.strip() == "[]"
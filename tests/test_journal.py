@@ -0,0 +1,87 @@
+"""Journal mode: appends instead of rewrites, replay on load, compaction."""
+import json
+import os
+
+from movie_storage import MovieStore
+
+
+def _journal_store(tmp_path, compact_bytes=1024 * 1024):
+    return MovieStore(str(tmp_path / "data.json"), journal=True, compact_bytes=compact_bytes)
+
+
+def test_journal_is_replayed_on_load(tmp_path):
+    store = _journal_store(tmp_path)
+    store.add_movie("Alien", 1979, 8.5)
+    store.add_movie("Heat", 1995, 8.3)
+    store.update_movie("Alien", 9.0)
+    store.delete_movie("Heat")
+
+    assert os.path.exists(store.log_path)
+    # A store without journal mode still replays a leftover log
+    movies = MovieStore(store.path).get_movies()
+    assert dict(movies.items()) == {"Alien": {"rating": 9.0, "year": 1979}}
+
+
+def test_appends_do_not_rewrite_the_data_file(tmp_path):
+    store = _journal_store(tmp_path)
+    store.add_movie("Alien", 1979, 8.5)
+    store.compact()
+    data = os.stat(store.path)
+    for i in range(20):
+        store.add_movie(f"Movie {i}", 2000, 5.0)
+    assert (os.stat(store.path).st_ino, os.stat(store.path).st_size) == (data.st_ino, data.st_size)
+    assert len(MovieStore(store.path).get_movies()) == 21
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    store = _journal_store(tmp_path)
+    store.add_movie("Alien", 1979, 8.5)
+    with open(store.log_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "title": "Half')
+    assert list(MovieStore(store.path).get_movies()) == ["Alien"]
+
+
+def test_log_is_compacted_past_the_threshold(tmp_path):
+    store = _journal_store(tmp_path, compact_bytes=2000)
+    for i in range(100):
+        store.add_movie(f"Movie {i}", 2000, 5.0)
+
+    if os.path.exists(store.log_path):
+        assert os.path.getsize(store.log_path) < 2000
+    with open(store.path, encoding="utf-8") as f:
+        on_disk = json.load(f)
+    assert len(on_disk) > 50
+    assert len(MovieStore(store.path).get_movies()) == 100
+
+
+def test_compact_folds_the_log_into_the_data_file(tmp_path):
+    store = _journal_store(tmp_path)
+    store.add_movie("Alien", 1979, 8.5)
+    store.update_movie("Alien", 9.0)
+    store.compact()
+
+    assert not os.path.exists(store.log_path)
+    with open(store.path, encoding="utf-8") as f:
+        assert json.load(f) == {"Alien": {"rating": 9.0, "year": 1979}}
+
+
+def test_load_survives_the_log_being_compacted_away(tmp_path):
+    writer = _journal_store(tmp_path)
+    writer.add_movie("Alien", 1979, 8.5)
+    writer.compact()
+    writer.add_movie("Heat", 1995, 8.3)
+    reader = MovieStore(writer.path)
+    read_data = reader._read_data
+    calls = []
+
+    def read_then_compact():
+        movies = read_data()
+        if not calls:
+            # Another process compacts between the reader's stat and its replay
+            writer.compact()
+        calls.append(None)
+        return movies
+    reader._read_data = read_then_compact
+    assert set(reader.get_movies()) == {"Alien", "Heat"}
+    assert len(calls) == 2
+    assert reader.version == writer.version
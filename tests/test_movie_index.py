@@ -0,0 +1,75 @@
+"""Sorted rating/year indexes, kept up to date across mutations."""
+import random
+
+import pytest
+
+import movie_index
+from catalog import MovieCatalog
+from movie_index import SortedIndex, top_titles
+from movie_storage import MovieStore
+
+
+def _catalog(size=300, seed=3):
+    rng = random.Random(seed)
+    return MovieCatalog((f"Movie {i:04d}", rng.randrange(0, 21) / 2, rng.randint(1950, 2024)) for i in range(size))
+
+
+def _keys(index):
+    return [(value, index.title_at(i)) for i, value in enumerate(index.values)]
+
+
+@pytest.mark.parametrize("field", ["rating", "year"])
+def test_incremental_updates_match_a_rebuild(field):
+    movies = _catalog()
+    index = SortedIndex(field, movies)
+    rng = random.Random(5)
+    for i in range(200):
+        title = movies.title_at(rng.randrange(len(movies)))
+        index.remove(title, movies[title][field])
+        movies.discard(title)
+        new = f"New {i:04d}"
+        movies.set(new, rng.randrange(0, 21) / 2, rng.randint(1950, 2024))
+        index.add(new, movies[new][field])
+    assert _keys(index) == _keys(SortedIndex(field, movies))
+    assert _keys(index) == sorted((info[field], title) for title, info in movies.items())
+
+
+def test_ranges_and_pages():
+    movies = _catalog()
+    index = SortedIndex("year", movies)
+    expected = sorted((y, t) for t, _, y in movies.rows() if 1980 <= y <= 1990)
+    assert list(index.titles(1980, 1990)) == [t for _, t in expected]
+    assert list(index.titles(1980, 1990, reverse=True)) == [t for _, t in reversed(expected)]
+    everything = [t for _, t in sorted((y, t) for t, _, y in movies.rows())]
+    assert index.titles_between(10, 20) == everything[10:20]
+    assert index.titles_between(10, 20, reverse=True) == everything[::-1][10:20]
+    assert index.bounds(3000) == (len(movies), len(movies))
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+@pytest.mark.parametrize("numpy_min", [10 ** 9, 1])
+def test_top_titles_match_the_index(monkeypatch, reverse, numpy_min):
+    monkeypatch.setattr(movie_index, "NUMPY_TOP_MIN", numpy_min)
+    movies = _catalog()
+    index = SortedIndex("rating", movies)
+    for k in (0, 1, 7, 50, len(movies) + 1):
+        assert top_titles(movies, "rating", k, reverse) == index.titles_between(0, k, reverse)
+
+
+def test_store_keeps_its_indexes_in_step(tmp_path):
+    store = MovieStore(str(tmp_path / "data.json"))
+    store.save_movies(_catalog(100))
+    list(store.filter_movies(min_rating=5, start_year=1990))
+    indexes = dict(store._indexes)
+    assert set(indexes) == {"rating", "year"}
+    store.add_movie("Zzz", 2001, 9.5)
+    store.update_movie("Movie 0003", 0.5)
+    store.delete_movie("Movie 0004")
+    movies = store.get_movies()
+    for field, index in store._indexes.items():
+        assert index is indexes[field]
+        assert _keys(index) == _keys(SortedIndex(field, movies))
+    expected = {t for t, r, y in movies.rows() if r >= 5 and 1990 <= y <= 2000}
+    assert {t for t, _ in store.filter_movies(min_rating=5, start_year=1990, end_year=2000)} == expected
+    assert [t for t, _ in store.sorted_movies("rating", reverse=True, limit=3)] == \
+        [t for _, t in sorted(((r, t) for t, r, _ in movies.rows()), reverse=True)[:3]]
@@ -0,0 +1,62 @@
+"""Bulk CSV/JSONL import and export."""
+import json
+
+import pytest
+
+import movie_io
+import movie_storage
+
+
+@pytest.fixture(autouse=True)
+def data_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(movie_storage, "DATA_FILE", str(tmp_path / "data.json"))
+
+
+def test_csv_import_skips_invalid_rows(tmp_path):
+    path = tmp_path / "in.csv"
+    path.write_text("title,year,rating\n"
+                    "Alien,1979,8.5\n"
+                    ",1990,5\n"
+                    "Heat,nineteen,8.3\n"
+                    "Ran,1985,11\n"
+                    '"Crouching Tiger, Hidden Dragon",2000,7.9\n', encoding="utf-8")
+    imported, errors = movie_io.import_movies(str(path))
+    assert imported == 2
+    assert [line for line, _ in errors] == [3, 4, 5]
+    assert dict(movie_storage.get_movies().items()) == {
+        "Alien": {"rating": 8.5, "year": 1979},
+        "Crouching Tiger, Hidden Dragon": {"rating": 7.9, "year": 2000}}
+
+
+def test_jsonl_import_reports_broken_lines(tmp_path):
+    path = tmp_path / "in.jsonl"
+    path.write_text('{"title": "Alien", "year": 1979, "rating": 8.5}\n'
+                    "\n"
+                    "{not json\n"
+                    '["a list"]\n'
+                    '{"title": "Amélie", "year": "2001", "rating": "8.3"}\n', encoding="utf-8")
+    imported, errors = movie_io.import_movies(str(path))
+    assert imported == 2
+    assert errors == [(3, "Invalid JSON line."), (4, "Invalid JSON line.")]
+    assert movie_storage.get_movies()["Amélie"] == {"rating": 8.3, "year": 2001}
+
+
+@pytest.mark.parametrize("name", ["out.csv", "out.jsonl"])
+def test_export_round_trips(tmp_path, monkeypatch, name):
+    movie_storage.add_movies([("Alien", 1979, 8.5), ("Heat, the movie", 1995, 8.3), ("Amélie", 2001, 8.0)])
+    expected = dict(movie_storage.get_movies().items())
+    path = str(tmp_path / name)
+    assert movie_io.export_movies(path) == 3
+    if name.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            assert json.loads(f.readline()).keys() == {"title", "year", "rating"}
+    monkeypatch.setattr(movie_storage, "DATA_FILE", str(tmp_path / "copy.json"))
+    assert movie_io.import_movies(path) == (3, [])
+    assert dict(movie_storage.get_movies().items()) == expected
+
+
+def test_unknown_extension_needs_a_format():
+    with pytest.raises(ValueError):
+        movie_io.detect_format("movies.txt")
+    assert movie_io.detect_format("movies.txt", "csv") == "csv"
+    assert movie_io.detect_format("movies.NDJSON") == "jsonl"
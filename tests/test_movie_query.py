@@ -0,0 +1,79 @@
+"""Query parsing, compilation and evaluation against plain Python."""
+import random
+
+import pytest
+
+from catalog import MovieCatalog
+from movie_query import QueryError, compile_query
+from movie_storage import MovieStore
+
+
+def _rows():
+    rng = random.Random(2)
+    words = ["Night", "Day", "Red", "Part II"]
+    return [(f"{rng.choice(words)} {i}", rng.randrange(0, 21) / 2, rng.randint(1950, 2024)) for i in range(300)]
+
+
+CASES = [
+    ("rating >= 8", lambda t, r, y: r >= 8),
+    ("year between 1980 and 1990 and rating > 5", lambda t, r, y: 1980 <= y <= 1990 and r > 5),
+    ('title ~ "NIGHT" or year = 1999', lambda t, r, y: "night" in t.lower() or y == 1999),
+    ('not (rating < 5 or year <= 1970) and title != "Day 3"', lambda t, r, y: not (r < 5 or y <= 1970) and t != "Day 3"),
+    ("rating == 10 or rating = 0", lambda t, r, y: r in (10, 0)),
+    ("year > 2000 and year < 1990", lambda t, r, y: False),
+    ("", lambda t, r, y: True),
+]
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    store = MovieStore(str(tmp_path_factory.mktemp("query") / "data.json"))
+    store.save_movies(MovieCatalog(_rows()))
+    return store
+
+
+@pytest.mark.parametrize("text, predicate", CASES)
+@pytest.mark.parametrize("suffix", ["", " sort rating desc limit 7 offset 2", " sort year", " sort title desc limit 5"])
+@pytest.mark.parametrize("indexed", [False, True])
+def test_results_match_plain_python(store, text, predicate, suffix, indexed):
+    if indexed:
+        list(store.filter_movies(min_rating=0, start_year=0))
+    else:
+        store._indexes = {}
+    query = compile_query(text + suffix)
+    rows = [row for row in store.get_movies().rows() if predicate(*row)]
+    if query.sort is not None:
+        position = {"title": 0, "rating": 1, "year": 2}[query.sort]
+        rows.sort(key=lambda row: (row[position], row[0]), reverse=query.reverse)
+        rows = rows[query.offset:None if query.limit is None else query.offset + query.limit]
+    got = [(title, info["rating"], info["year"]) for title, info in store.query_movies(query)]
+    if query.sort is None:
+        assert sorted(got) == sorted(rows)
+    else:
+        assert got == rows
+
+
+def test_ranges_and_fields():
+    query = compile_query("rating >= 6 and rating < 9 and year between 1980 and 2000 and year >= 1990 "
+                          "and (year = 1800 or rating = 1) fields title, rating")
+    assert query.ranges == {"rating": [6.0, 9.0], "year": [1990, 2000]}
+    assert query.fields == ("title", "rating")
+    assert query.project("Alien", {"rating": 8.5, "year": 1979}) == {"title": "Alien", "rating": 8.5}
+    assert compile_query("year < 1990 or rating > 5").ranges == {}
+
+
+def test_strings_and_keywords():
+    query = compile_query("TITLE ~ 'it\\'s' AND Year >= 1990 SORT Rating DESC")
+    assert query.predicate("It's Alive", 5.0, 1995) and not query.predicate("Its", 5.0, 1995)
+    assert (query.sort, query.reverse) == ("rating", True)
+    assert compile_query("rating >= 8") is compile_query("rating >= 8")
+
+
+@pytest.mark.parametrize("text", [
+    "rating >=", "rating >= 'high'", "year = 1999.5", "title > 5", "rating ~ \"x\"", "genre = 1",
+    "(rating > 5", "rating > 5)", "rating > 5 limit -1", "rating > 5 limit 2.5", "rating > 5 sort", "rating $ 5",
+    "rating > 5 fields", "and rating > 5",
+])
+def test_invalid_queries_raise(text):
+    with pytest.raises(QueryError):
+        compile_query(text)
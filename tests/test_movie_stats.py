@@ -0,0 +1,52 @@
+"""Running rating statistics against a recompute."""
+import statistics
+
+import pytest
+
+from movie_stats import median_of
+from movie_storage import open_store
+
+
+def _recomputed(movies):
+    rows = list(movies.rows())
+    if not rows:
+        return {"count": 0, "average": None, "median": None, "best": None, "worst": None}
+    ratings = [rating for _, rating, _ in rows]
+    return {"count": len(rows), "average": statistics.fmean(ratings), "median": statistics.median(ratings),
+            "best": max(rows, key=lambda row: (row[1], row[0]))[0],
+            "worst": min(rows, key=lambda row: (row[1], row[0]))[0]}
+
+
+def _check(store):
+    stats = store.rating_stats()
+    expected = _recomputed(store.get_movies())
+    if expected["count"]:
+        assert stats.pop("average") == pytest.approx(expected.pop("average"))
+    assert stats == expected
+
+
+@pytest.mark.parametrize("name", ["data.json", "data.snap", "data.db"])
+def test_stats_follow_every_mutation(tmp_path, name):
+    store = open_store(str(tmp_path / name))
+    _check(store)
+    store.add_movie("Alien", 1979, 8.5)
+    _check(store)
+    store.add_movies([("Heat", 1995, 8.5), ("Ran", 1985, 8.2), ("Cats", 2019, 2.8)])
+    _check(store)
+    store.update_movie("Cats", 9.0)
+    _check(store)
+    store.delete_movie("Alien")
+    _check(store)
+    with store.batch():
+        store.add_movie("Dune", 2021, 8.0)
+        store.delete_movie("Heat")
+    _check(store)
+    for title in list(store.get_movies()):
+        store.delete_movie(title)
+    _check(store)
+
+
+def test_median_of():
+    assert median_of([]) is None
+    assert median_of([3.0]) == 3.0
+    assert median_of([1.0, 2.0, 4.0, 9.0]) == 3.0
@@ -0,0 +1,117 @@
+"""Trigram-pruned and batched fuzzy title search against scoring every title."""
+import json
+import random
+
+import pytest
+from rapidfuzz import fuzz, process
+
+import cli
+import movie_storage
+import search_index
+from movie_storage import MovieStore
+from search_index import TitleSearchIndex, normalize, trigrams
+
+WORDS = "night day red blue last first river city storm garden house of the king queen dark".split()
+TERMS = ["the dark night", "Red River", "kin queen", "storm", "gardn of the city", "xyz", "a", "HOUSE!"]
+
+
+def _titles(count, seed=11):
+    rng = random.Random(seed)
+    return list({" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title() + f" {i % 7 or ''}".rstrip()
+                 for i in range(count)})
+
+
+def _brute_force(titles, term, cutoff=search_index.SCORE_CUTOFF):
+    matches = process.extract(normalize(term), [normalize(t) for t in titles], scorer=fuzz.ratio,
+                              processor=None, limit=None, score_cutoff=cutoff)
+    return {(titles[i], score) for _, score, i in matches}
+
+
+def _check_pruned(index, titles, term):
+    """Pruning only drops titles sharing no trigram with the term; the rest score as in a full scan."""
+    found = set(index.search(term, limit=None))
+    expected = _brute_force(titles, term)
+    grams = trigrams(normalize(term))
+    assert found <= expected
+    assert {(t, s) for t, s in expected if grams & trigrams(normalize(t))} <= found
+
+
+def test_pruning_only_drops_titles_sharing_no_trigram(monkeypatch):
+    titles = _titles(600)
+    index = TitleSearchIndex(titles)
+    for term in TERMS:
+        _check_pruned(index, titles, term)
+    # Without pruning (no posting is rare enough) every title is scored
+    monkeypatch.setattr(search_index, "MAX_POSTING", 0)
+    for term in TERMS:
+        assert set(index.search(term, limit=None)) == _brute_force(titles, term)
+
+
+def test_results_are_ranked_and_limited():
+    index = TitleSearchIndex(_titles(600))
+    results = index.search("the dark night", limit=5)
+    assert len(results) == 5
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+def test_add_and_remove():
+    titles = _titles(300)
+    index = TitleSearchIndex(titles)
+    removed, kept = titles[:150], titles[150:]
+    for title in removed:
+        index.remove(title)
+    index.remove("Not Indexed")
+    index.add(kept[0])
+    index.add("The Dark Knight")
+    assert len(index) == len(kept) + 1
+    for term in TERMS + ["dark knight"]:
+        _check_pruned(index, kept + ["The Dark Knight"], term)
+    assert index.search("dark knight", limit=1)[0][0] == "The Dark Knight"
+
+
+def test_removals_trigger_a_rebuild():
+    index = TitleSearchIndex(f"Movie {i}" for i in range(3000))
+    for i in range(2500):
+        index.remove(f"Movie {i}")
+    assert len(index._titles) < 3000
+    assert index.search("movie 2999", limit=1) == [("Movie 2999", 100.0)]
+    assert index.search("movie 42", limit=1, score_cutoff=100) == []
+@pytest.mark.parametrize("limit", [1, 3])
+def test_batch_search_matches_a_full_scan(monkeypatch, limit):
+    titles = _titles(400)
+    index = TitleSearchIndex(titles)
+    index.remove(titles[0])
+    monkeypatch.setattr(search_index, "CDIST_CELLS", 1000)  # several cdist chunks
+    for term, batch in zip(TERMS, index.batch_search(TERMS, limit=limit, workers=1)):
+        expected = sorted(_brute_force(titles[1:], term), key=lambda match: -match[1])
+        assert [score for _, score in batch] == pytest.approx([score for _, score in expected[:limit]])
+        scores = dict(expected)
+        assert [score for _, score in batch] == pytest.approx([scores[title] for title, _ in batch])
+
+
+def test_batch_search_on_an_empty_index():
+    assert TitleSearchIndex().batch_search(["anything", "else"]) == [[], []]
+
+
+def test_store_batch_search_matches_search(tmp_path):
+    store = MovieStore(str(tmp_path / "data.json"))
+    store.add_movies([("The Dark Knight", 2008, 9.0), ("Dark City", 1998, 7.6), ("Red River", 1948, 7.8)])
+    terms = ["dark knight", "red rivr", "nothing alike at all"]
+    batch = store.batch_search_movies(terms, limit=2)
+    for term, matches in zip(terms, batch):
+        single = store.search_movies(term, limit=2)
+        assert [t for t, _ in matches] == [t for t, _ in single]
+        assert [s for _, s in matches] == pytest.approx([s for _, s in single])
+
+
+def test_match_command(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(movie_storage, "DATA_FILE", str(tmp_path / "data.json"))
+    movie_storage.add_movies([("The Dark Knight", 2008, 9.0), ("Red River", 1948, 7.8)])
+    terms = tmp_path / "terms.txt"
+    terms.write_text("dark knight\n\nred rivr\n", encoding="utf-8")
+    assert cli.run(["match", str(terms), "--limit", "1"]) == 0
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(line["query"], [m["title"] for m in line["matches"]]) for line in lines] == [
+        ("dark knight", ["The Dark Knight"]), ("red rivr", ["Red River"])]
+    with pytest.raises(SystemExit):
+        cli.run(["match", str(terms), "--limit", "-1"])
@@ -0,0 +1,84 @@
+"""JSON data files in every style, codec and compression."""
+import io
+import json
+
+import pytest
+
+import serialization
+from catalog import MovieCatalog
+from movie_storage import MovieStore
+
+ROWS = [("Alien", 8.5, 1979), ('Quote " and \\ slash', 7.25, 2001), ("Amélie 🎬", 8.0, 2001),
+        ("Ancient", 5.0, -300), ("Zero", 0.0, 1950)]
+INSTALLED = [codec for codec in serialization.CODECS if serialization._available(codec)]
+COMPRESSIONS = [None, "gzip", pytest.param("zstd", marks=pytest.mark.skipif(
+    not serialization._available("zstandard"), reason="zstandard is not installed"))]
+
+
+def _round_trip(movies, compression=None, style=None, codec=None, decoder=None):
+    buffer = io.BytesIO()
+    serialization.write_catalog(buffer, movies, compression, style, codec)
+    data = buffer.getvalue()
+    return data, serialization.read_catalog(io.BytesIO(data), compression, decoder)
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+@pytest.mark.parametrize("style", serialization.STYLES)
+@pytest.mark.parametrize("codec", INSTALLED)
+@pytest.mark.parametrize("decoder", INSTALLED)
+def test_round_trip(monkeypatch, compression, style, codec, decoder):
+    monkeypatch.setattr(serialization, "WRITE_CHUNK_ROWS", 2)  # several chunks
+    _, movies = _round_trip(MovieCatalog(ROWS), compression, style, codec, decoder)
+    assert list(movies.rows()) == ROWS
+
+
+@pytest.mark.parametrize("codec", INSTALLED)
+def test_styles(codec):
+    movies = MovieCatalog(ROWS)
+    compact, _ = _round_trip(movies, style="compact", codec=codec)
+    pretty, _ = _round_trip(movies, style="pretty", codec=codec)
+    expected = {t: {"rating": r, "year": y} for t, r, y in ROWS}
+    assert compact == json.dumps(expected, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    assert pretty == json.dumps(expected, ensure_ascii=False, indent=4).encode("utf-8")
+
+
+def test_codecs_write_identical_files():
+    files = {codec: _round_trip(MovieCatalog(ROWS), codec=codec)[0] for codec in INSTALLED}
+    assert len(set(files.values())) == 1
+
+
+@pytest.mark.parametrize("style", serialization.STYLES)
+def test_empty_catalog(style):
+    data, movies = _round_trip(MovieCatalog(), style=style)
+    assert data == b"{}" and len(movies) == 0
+
+
+@pytest.mark.parametrize("decoder", INSTALLED)
+def test_extra_fields_are_dropped(decoder):
+    data = b'{"Alien": {"year": 1979, "director": {"name": "Scott"}, "rating": 8.5, "tags": ["sf"]}}'
+    movies = serialization.decode(data, decoder)
+    assert list(movies.rows()) == [("Alien", 8.5, 1979)]
+
+
+def test_gzip_saves_are_reproducible():
+    first, _ = _round_trip(MovieCatalog(ROWS), "gzip")
+    second, _ = _round_trip(MovieCatalog(ROWS), "gzip")
+    assert first == second and first[:2] == b"\x1f\x8b"
+
+
+def test_unknown_settings_are_rejected():
+    with pytest.raises(ValueError):
+        serialization.codec_name("yaml")
+    with pytest.raises(ValueError):
+        serialization.write_catalog(io.BytesIO(), MovieCatalog(ROWS), style="wide")
+    if not serialization._available("msgspec"):
+        with pytest.raises(ValueError):
+            serialization.codec_name("msgspec")
+
+
+def test_store_picks_the_compression_from_the_suffix(tmp_path):
+    store = MovieStore(str(tmp_path / "data.json.gz"))
+    store.save_movies(MovieCatalog(ROWS))
+    with open(store.path, "rb") as f:
+        assert f.read(2) == b"\x1f\x8b"
+    assert list(MovieStore(store.path).get_movies().rows()) == ROWS
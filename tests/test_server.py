@@ -0,0 +1,161 @@
+"""The HTTP/JSON API, served on localhost."""
+import asyncio
+import http.client
+import json
+import threading
+from urllib.parse import quote
+
+import pytest
+
+import movie_storage
+import server
+
+
+@pytest.fixture(params=["data.json", "data.db"])
+def api(request, tmp_path, monkeypatch):
+    """Serve a fresh catalog on a free port; yields a request(method, path, body) function."""
+    monkeypatch.setattr(movie_storage, "DATA_FILE", str(tmp_path / request.param))
+    started = threading.Event()
+    state = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        state["loop"] = loop
+        state["task"] = loop.create_task(server.serve("127.0.0.1", 0, ready))
+        try:
+            loop.run_until_complete(state["task"])
+        except asyncio.CancelledError:
+            pass
+        finally:
+            loop.close()
+
+    def ready(listener):
+        state["port"] = listener.sockets[0].getsockname()[1]
+        started.set()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert started.wait(10)
+
+    def request(method, path, body=None):
+        conn = http.client.HTTPConnection("127.0.0.1", state["port"], timeout=10)
+        try:
+            conn.request(method, path, json.dumps(body) if body is not None else None)
+            response = conn.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            conn.close()
+
+    yield request
+    state["loop"].call_soon_threadsafe(state["task"].cancel)
+    thread.join(10)
+
+
+def test_movie_lifecycle(api):
+    assert api("POST", "/movies", {"title": "Alien", "year": 1979, "rating": 8.5}) == (
+        201, {"title": "Alien", "year": 1979, "rating": 8.5})
+    api("POST", "/movies", {"title": "Blade Runner", "year": 1982, "rating": 8.1})
+    assert api("GET", "/movies/Alien") == (200, {"title": "Alien", "year": 1979, "rating": 8.5})
+    assert api("GET", "/movies/" + quote("Blade Runner"))[1]["year"] == 1982
+
+    status, body = api("PATCH", "/movies/Alien", {"rating": 9.0})
+    assert (status, body["rating"]) == (200, 9.0)
+    assert api("DELETE", "/movies/" + quote("Blade Runner")) == (200, {"deleted": "Blade Runner"})
+    assert api("GET", "/movies/" + quote("Blade Runner"))[0] == 404
+    assert api("GET", "/movies")[1] == {"total": 1, "movies": [{"title": "Alien", "year": 1979, "rating": 9.0}]}
+
+
+def test_reads(api):
+    for title, year, rating in [("Alien", 1979, 8.5), ("Heat", 1995, 8.3), ("Ran", 1985, 8.2), ("Cats", 2019, 2.8)]:
+        api("POST", "/movies", {"title": title, "year": year, "rating": rating})
+
+    status, body = api("GET", "/movies?sort=rating&order=desc&limit=2")
+    assert [m["title"] for m in body["movies"]] == ["Alien", "Heat"]
+    status, body = api("GET", "/filter?min_rating=8&start_year=1980")
+    assert {m["title"] for m in body["movies"]} == {"Heat", "Ran"}
+    status, body = api("GET", "/query?q=" + quote("year < 2000 sort year fields title"))
+    assert body["movies"] == [{"title": "Alien"}, {"title": "Ran"}, {"title": "Heat"}]
+    status, body = api("GET", "/search?q=alein")
+    assert status == 200 and body["matches"][0]["title"] == "Alien"
+    status, body = api("GET", "/stats")
+    assert (body["count"], body["best"], body["worst"]) == (4, "Alien", "Cats")
+
+
+def test_changes(api, monkeypatch):
+    api("POST", "/movies", {"title": "Alien", "year": 1979, "rating": 8.5})
+    api("PATCH", "/movies/Alien", {"rating": 9.0})
+    status, body = api("GET", "/changes?since=0")
+    assert status == 200 and body["version"] == 2
+    assert [(c["version"], c["op"]) for c in body["changes"]] == [(1, "add"), (2, "update")]
+    assert api("GET", "/changes?since=2")[1] == {"version": 2, "changes": []}
+    assert api("GET", "/changes?since=9")[0] == 410
+    assert api("GET", "/changes")[0] == 400
+
+
+def test_changes_of_a_sharded_catalog_are_not_implemented(api, tmp_path, monkeypatch):
+    monkeypatch.setattr(movie_storage, "DATA_FILE", str(tmp_path / "data.shards"))
+    assert api("GET", "/changes?since=0")[0] == 501
+
+
+def test_errors(api):
+    assert api("GET", "/nowhere")[0] == 404
+    assert api("PUT", "/movies")[0] == 405
+    assert api("POST", "/movies", {"title": "Alien"})[0] == 400
+    assert api("POST", "/movies", {"title": "Alien", "year": 1979, "rating": 11})[0] == 400
+    assert api("PATCH", "/movies/Missing", {"rating": 5})[0] == 404
+    assert api("GET", "/movies?limit=-1")[0] == 400
+    assert api("GET", "/query?q=" + quote("rating >>"))[0] == 400
+
+
+def test_reads_go_on_while_a_write_is_saved(api, monkeypatch):
+    api("POST", "/movies", {"title": "Alien", "year": 1979, "rating": 8.5})
+    store = movie_storage.get_store()
+    if not isinstance(store, movie_storage.MovieStore):
+        pytest.skip("SQLite commits its own way")
+    saving, release = threading.Event(), threading.Event()
+    write_data = store._write_data
+
+    def slow_write(movies):
+        saving.set()
+        assert release.wait(10)
+        write_data(movies)
+    monkeypatch.setattr(store, "_write_data", slow_write)
+
+    posted = {}
+    poster = threading.Thread(target=lambda: posted.update(
+        result=api("POST", "/movies", {"title": "Heat", "year": 1995, "rating": 8.3})))
+    poster.start()
+    assert saving.wait(10)
+    # Answered from the cache while the save is still held up
+    assert api("GET", "/movies/Alien")[0] == 200
+    assert api("GET", "/stats")[1]["count"] == 2
+    release.set()
+    poster.join(10)
+    assert posted["result"][0] == 201
+    assert set(movie_storage.MovieStore(store.path).get_movies()) == {"Alien", "Heat"}
+
+
+def test_writes_keep_the_indexes(api):
+    for title, year, rating in [("Alien", 1979, 8.5), ("Heat", 1995, 8.3)]:
+        api("POST", "/movies", {"title": title, "year": year, "rating": rating})
+    api("GET", "/search?q=alien")
+    api("GET", "/filter?min_rating=8")
+    store = movie_storage.get_store()
+    indexes = (store._search, getattr(store, "_indexes", {}).get("rating"))
+
+    api("POST", "/movies", {"title": "Ran", "year": 1985, "rating": 8.2})
+    api("PATCH", "/movies/Heat", {"rating": 8.4})
+    assert (store._search, getattr(store, "_indexes", {}).get("rating")) == indexes
+    assert api("GET", "/search?q=ran")[1]["matches"][0]["title"] == "Ran"
+    assert {m["title"] for m in api("GET", "/filter?min_rating=8.3")[1]["movies"]} == {"Alien", "Heat"}
+
+
+@pytest.mark.parametrize("body", [{"title": None, "year": 1979, "rating": 8.5},
+                                  {"title": 42, "year": 1979, "rating": 8.5},
+                                  {"title": "Alien", "year": 1979.5, "rating": 8.5},
+                                  {"title": "Alien", "year": None, "rating": 8.5},
+                                  {"title": "Alien", "year": 1979, "rating": True},
+                                  {"title": "Alien", "year": 1979, "rating": [8.5]}])
+def test_fields_of_the_wrong_type_are_rejected(api, body):
+    assert api("POST", "/movies", body)[0] == 400
+    assert api("GET", "/movies")[1]["total"] == 0
@@ -0,0 +1,66 @@
+"""Binary snapshots: lookups on the mapped file and the snapshot store."""
+import pytest
+
+from catalog import MovieCatalog
+from movie_storage import open_store
+from snapshot import SnapshotCatalog, SnapshotStore, write_snapshot
+
+ROWS = [("Ran", 8.2, 1985), ("Amélie", 8.3, 2001), ("Alien", 8.5, 1979), ("Zoo", 1.0, -50),
+        ("", 5.0, 2000), ("Ōkami", 7.0, 32767), ("alien", 6.0, 1980)]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = str(tmp_path / "data.snap")
+    write_snapshot(path, ROWS)
+    return SnapshotCatalog(path)
+
+
+def test_titles_are_in_byte_order(snapshot):
+    titles = sorted(ROWS, key=lambda row: row[0].encode("utf-8"))
+    assert list(snapshot.rows()) == titles
+    assert [snapshot.title_at(row) for row in range(len(snapshot))] == [title for title, _, _ in titles]
+    assert list(snapshot.column("rating")) == [rating for _, rating, _ in titles]
+    assert list(snapshot.column("year")) == [year for _, _, year in titles]
+
+
+def test_lookups(snapshot):
+    for title, rating, year in ROWS:
+        assert title in snapshot
+        assert snapshot[title] == {"rating": rating, "year": year}
+    for missing in ("Aliens", "Alie", "Zzz", " ", "ALIEN"):
+        assert missing not in snapshot
+        with pytest.raises(KeyError):
+            snapshot[missing]
+    assert 42 not in snapshot
+    assert snapshot.get("Missing") is None
+    assert dict(snapshot.items()) == {title: {"rating": r, "year": y} for title, r, y in ROWS}
+
+
+def test_empty_snapshot(tmp_path):
+    path = str(tmp_path / "empty.snap")
+    write_snapshot(path, [])
+    snapshot = SnapshotCatalog(path)
+    assert len(snapshot) == 0 and "Alien" not in snapshot and list(snapshot.rows()) == []
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "data.snap"
+    path.write_bytes(b"NOTASNAP" + bytes(8))
+    with pytest.raises(ValueError):
+        SnapshotCatalog(str(path))
+
+
+def test_store_round_trip(tmp_path):
+    path = str(tmp_path / "data.snap")
+    store = open_store(path)
+    assert isinstance(store, SnapshotStore)
+    store.save_movies(MovieCatalog(ROWS))
+    assert isinstance(open_store(path).get_movies(), SnapshotCatalog)
+    store.add_movie("Dune", 2021, 8.0)
+    store.update_movie("Alien", 9.0)
+    store.delete_movie("Zoo")
+    expected = {title: {"rating": r, "year": y} for title, r, y in ROWS if title != "Zoo"}
+    expected.update({"Dune": {"rating": 8.0, "year": 2021}, "Alien": {"rating": 9.0, "year": 1979}})
+    assert dict(store.get_movies().items()) == expected
+    assert dict(SnapshotCatalog(path).items()) == expected
@@ -0,0 +1,28 @@
+"""Validation rules shared by the interactive prompts and bulk import."""
+
+
+def parse_title(value):
+    """Return the stripped title; ValueError if it is empty."""
+    title = str(value).strip()
+    if not title:
+        raise ValueError("Title cannot be empty.")
+    return title
+
+
+def parse_rating(value):
+    """Return the rating as a float between 0.0 and 10.0; ValueError otherwise."""
+    try:
+        rating = float(str(value).strip())
+    except ValueError:
+        raise ValueError("Invalid rating format.") from None
+    if not 0.0 <= rating <= 10.0:
+        raise ValueError("Rating must be between 0.0 and 10.0.")
+    return rating
+
+
+def parse_year(value):
+    """Return a four-digit year as an int; ValueError otherwise."""
+    s = str(value).strip()
+    if s.isdigit() and len(s) == 4:
+        return int(s)
+    raise ValueError("Year must be a four-digit number.")